@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for MindToon
+Times API endpoints of a running server (lists) or service calls against the database (analytics)
+and prints p50/p95 per case.
+Usage: python benchmark.py --token <access token> lists --base-url http://localhost:8000
+       python benchmark.py analytics  (creates the bench_<size> users and their comics on first run)
+Analytics latencies should stay flat from 1k to 100k comics (summary, dashboard, creativity,
+recent-activity and debug-comics are all aggregated or limited in Postgres).
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+
+PAGE_SIZES = (20, 100, 500)
+LIBRARY_SIZES = (10, 1000, 100000)
+GENRES = ["adventure", "Drama", "comedy", "sci-fi", "Fantasy", "horror", "romance", "mystery"]
+ART_STYLES = ["manga", "comic book", "Watercolor", "noir", "cartoon", "pixel art"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def time_request(session, method, url, runs, **kwargs):
+    """Time `runs` requests (after one warm-up); returns the latencies in ms and the item count of the last response"""
+    session.request(method, url, **kwargs).raise_for_status()
+    latencies = []
+    items = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = session.request(method, url, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        items = len(response.json())
+    return latencies, items
+
+
+def report(name, size, latencies, items):
+    print(
+        f"{name:<16} size={size:<6} items={items:<6} "
+        f"p50={percentile(latencies, 50):8.1f}ms p95={percentile(latencies, 95):8.1f}ms "
+        f"mean={statistics.mean(latencies):8.1f}ms"
+    )
+
+
+def bench_lists(args):
+    """The paginated list endpoints at each page size"""
+    if not args.token:
+        sys.exit("lists needs --token")
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {args.token}"
+    api = args.base_url.rstrip("/")
+
+    # Sparse fieldsets of the comic lists (None leaves the endpoint defaults)
+    fieldset = {"fields": args.fields, "include": args.include}
+
+    for size in args.sizes:
+        endpoints = [
+            ("my-comics", "GET", f"{api}/api/chats/my-comics", {"params": {"limit": size, **fieldset}}),
+            ("public-comics", "GET", f"{api}/api/chats/public-comics", {"params": {"limit": size, **fieldset}}),
+            ("world-comics", "POST", f"{api}/api/chats/world-comics", {"json": {"world_type": args.world, "per_page": size, **fieldset}}),
+            ("scenarios/user", "GET", f"{api}/api/chats/scenarios/user", {"params": {"limit": size}}),
+        ]
+        for name, method, url, kwargs in endpoints:
+            latencies, items = time_request(session, method, url, args.runs, **kwargs)
+            report(name, size, latencies, items)
+
+
+def seed_library(size: int) -> int:
+    """User bench_<size> with `size` synthetic comics spread over the last 90 days (created once)"""
+    from sqlalchemy import insert
+    from sqlmodel import Session, select, func
+    from api.db import engine
+    from api.auth.models import User
+    from api.chat.models import ComicsPage, WorldType
+    from api.chat.stats import reconcile_world_stats
+    from api.ai.rollups import _upsert_rollups
+
+    username = f"bench_{size}"
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == username)).first()
+        if not user:
+            user = User(username=username, email=f"{username}@bench.mindtoon.com", hashed_password="!")
+            session.add(user)
+            session.commit()
+        missing = size - session.exec(select(func.count(ComicsPage.id)).where(ComicsPage.user_id == user.id)).one()
+        last_id = session.exec(select(func.coalesce(func.max(ComicsPage.id), 0))).one()
+
+        now = datetime.utcnow()
+        worlds = list(WorldType)
+        for start in range(0, max(missing, 0), 5000):
+            session.exec(insert(ComicsPage).values([
+                {
+                    "title": f"Bench comic {start + i}",
+                    "concept": f"A benchmark concept number {start + i}",
+                    "genre": random.choice(GENRES),
+                    "art_style": random.choice(ART_STYLES),
+                    "world_type": random.choice(worlds),
+                    "panels_data": "[]",
+                    "user_id": user.id,
+                    "created_at": now - timedelta(minutes=random.randint(0, 90 * 24 * 60)),
+                }
+                for i in range(min(5000, missing - start))
+            ]))
+            session.commit()
+
+        if missing > 0:
+            # Bulk inserts skip the save hooks: count the new comics like saved ones
+            _upsert_rollups(session, select(ComicsPage.id).where(ComicsPage.user_id == user.id, ComicsPage.id > last_id), 1)
+            session.commit()
+            reconcile_world_stats()
+        return user.id
+
+
+async def time_call(fn, runs):
+    await fn()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def bench_analytics(args):
+    """Analytics service calls for users with 10, 1k and 100k comics"""
+    sys.path.append(str(Path(__file__).parent / "src"))
+    from api.db import async_session_factory, async_engine
+    from api.ai.analyses import AnalyticsService
+    from api.ai.routing import debug_user_comics, get_user_creativity_score, get_user_recent_activity
+
+    users = {size: seed_library(size) for size in args.sizes}
+
+    async def run():
+        async with async_session_factory() as session:
+            for size, user_id in users.items():
+                latencies = await time_call(lambda: AnalyticsService.get_user_analytics_summary(session, user_id), args.runs)
+                report("summary", size, latencies, size)
+                latencies = await time_call(lambda: AnalyticsService.get_user_analytics_breakdown(session, user_id), args.runs)
+                report("dashboard", size, latencies, size)
+                # Route functions called directly: no HTTP and no response cache
+                latencies = await time_call(lambda: get_user_creativity_score(user_id, None, session), args.runs)
+                report("creativity", size, latencies, size)
+                latencies = await time_call(lambda: get_user_recent_activity(user_id, None, 10, session), args.runs)
+                report("recent-activity", size, latencies, 10)
+                latencies = await time_call(lambda: debug_user_comics(user_id, None, session), args.runs)
+                report("debug-comics", size, latencies, size)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MindToon API latency benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", help="Access token of the user to benchmark as (lists)")
+    parser.add_argument("--runs", type=int, default=50, help="Timed requests per endpoint")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    lists = commands.add_parser("lists", help="List endpoints at page sizes 20/100/500")
+    lists.add_argument("--sizes", type=int, nargs="+", default=list(PAGE_SIZES))
+    lists.add_argument("--world", default="imagination_world")
+    lists.add_argument("--fields", help="Comma-separated fields of the comic lists (e.g. id,title,image_url)")
+    lists.add_argument("--include", help="Fields added to the comic list defaults (e.g. panels_data)")
+    lists.set_defaults(run=bench_lists)
+
+    analytics = commands.add_parser("analytics", help="Analytics service calls for libraries of 10/1k/100k comics (needs DATABASE_URL)")
+    analytics.add_argument("--sizes", type=int, nargs="+", default=list(LIBRARY_SIZES))
+    analytics.set_defaults(run=bench_analytics)
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    except requests.RequestException as e:
+        print(f"Benchmark failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Query plan check for MindToon
+Runs EXPLAIN on the hot query paths and fails when one of them stops using its index.
+Run against a migrated database: python check_query_plans.py
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add src directory to path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from sqlalchemy import text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select, func
+
+from api.db import engine, init_db
+from api.migrations import run_migrations
+from api.chat.models import ComicsPage, ComicCollectionItem, DetailedScenario, PublicFeedRank, WorldType
+from api.ai.analyses import AnalyticsInsight
+
+# (name, statement, expected index, whether the index must also provide the ORDER BY)
+HOT_QUERIES = [
+    (
+        "my-comics",
+        select(ComicsPage).where(ComicsPage.user_id == 1).order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc()).limit(21),
+        "ix_comicspage_user_created",
+        True
+    ),
+    (
+        "world-comics",
+        select(ComicsPage)
+        .where(ComicsPage.user_id == 1, ComicsPage.world_type == WorldType.IMAGINATION_WORLD)
+        .order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc()).limit(21),
+        "ix_comicspage_user_world_created",
+        True
+    ),
+    (
+        "world-comics favorites",
+        select(ComicsPage)
+        .where(ComicsPage.user_id == 1, ComicsPage.world_type == WorldType.IMAGINATION_WORLD, ComicsPage.is_favorite == True)
+        .order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc()).limit(21),
+        "ix_comicspage_user_world_favorites",
+        True
+    ),
+    (
+        "public-comics",
+        select(ComicsPage.id, PublicFeedRank.score)
+        .join(PublicFeedRank, PublicFeedRank.comic_id == ComicsPage.id)
+        .where(ComicsPage.is_public == True, tuple_(PublicFeedRank.score, PublicFeedRank.comic_id) < tuple_(0.5, 1000))
+        .order_by(PublicFeedRank.score.desc(), PublicFeedRank.comic_id.desc()).limit(21),
+        "ix_publicfeedrank_score_comic",
+        True
+    ),
+    (
+        "my-comics next page (cursor)",
+        select(ComicsPage)
+        .where(ComicsPage.user_id == 1, tuple_(ComicsPage.created_at, ComicsPage.id) < tuple_(datetime(2025, 1, 1), 1000))
+        .order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc()).limit(21),
+        "ix_comicspage_user_created",
+        True
+    ),
+    (
+        "scenarios/user",
+        select(DetailedScenario).where(DetailedScenario.user_id == 1)
+        .order_by(DetailedScenario.created_at.desc(), DetailedScenario.id.desc()).limit(21),
+        "ix_detailedscenario_user_created",
+        True
+    ),
+    (
+        "scenario by comic",
+        select(DetailedScenario.id).where(DetailedScenario.comic_id == 1),
+        "ix_detailedscenario_comic_id",
+        False
+    ),
+    (
+        "collection item count",
+        select(func.count()).select_from(ComicCollectionItem).where(ComicCollectionItem.collection_id == 1),
+        "ix_comiccollectionitem_collection_id",
+        False
+    ),
+    (
+        "insights by type",
+        select(AnalyticsInsight).where(AnalyticsInsight.user_id == 1, AnalyticsInsight.insight_type == "pattern_analysis"),
+        "ix_analyticsinsight_user_type",
+        False
+    ),
+]
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def plan_nodes(plan: dict):
+    """Every node of an EXPLAIN (FORMAT JSON) plan tree"""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def check_plan(conn, name: str, statement, expected_index: str, ordered: bool) -> bool:
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+    nodes = list(plan_nodes(plan))
+    indexes = {node.get("Index Name") for node in nodes if node["Node Type"] in INDEX_NODES}
+    sorted_in_memory = any(node["Node Type"] in ("Sort", "Incremental Sort") for node in nodes)
+
+    ok = expected_index in indexes and not (ordered and sorted_in_memory)
+    scans = ", ".join(f"{node['Node Type']} ({node.get('Index Name') or node.get('Relation Name', '-')})" for node in nodes)
+    print(f"{'✅' if ok else '❌'} {name}: {scans}")
+    return ok
+
+
+def main() -> int:
+    init_db()
+    run_migrations()
+    with engine.connect() as conn:
+        # Test databases are tiny; without this the planner would rightly prefer sequential scans
+        conn.execute(text("SET enable_seqscan = off"))
+        results = [check_plan(conn, *query) for query in HOT_QUERIES]
+        conn.rollback()
+
+    failed = results.count(False)
+    print(f"{len(results) - failed}/{len(results)} hot queries use their index")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
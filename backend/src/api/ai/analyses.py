@@ -1,6 +1,8 @@
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any
-from sqlmodel import SQLModel, Field, Relationship, select
+from sqlmodel import SQLModel, Field, Relationship, select, func
+from sqlalchemy import BigInteger, Column, Date, UniqueConstraint, cast, union_all
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from enum import Enum
 from api.chat.models import WorldType, ComicsPage
@@ -46,6 +48,53 @@ class AnalyticsEntry(SQLModel, table=True):
     class Config:
         from_attributes = True
 
+class ComicDailyRollup(SQLModel, table=True):
+    """Comics of a user per (world, genre, art style, day), maintained by api.ai.rollups"""
+    __table_args__ = (
+        UniqueConstraint("user_id", "world_type", "genre", "art_style", "day", name="uq_comicdailyrollup_key"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    world_type: WorldType = Field()
+    genre: str = Field(max_length=100)  # lower(trim(genre))
+    art_style: str = Field(max_length=100)  # lower(trim(art_style))
+    day: date = Field(sa_column=Column(Date, nullable=False))
+    
+    comics: int = Field(default=0)
+    concept_chars: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))  # sum of len(concept)
+    last_created_at: datetime = Field(default_factory=datetime.utcnow)  # newest comic seen (not lowered on delete)
+
+class ConceptDigest(SQLModel, table=True):
+    """Fixed-size LLM summary of a user's comic concepts in one world, folded forward by api.ai.digest"""
+    __table_args__ = (UniqueConstraint("user_id", "world_type", name="uq_conceptdigest_user_world"),)
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    world_type: WorldType = Field()
+    summary: str = Field(default="")
+    covered_id: int = Field(default=0)  # comics up to this id are in the summary (or older than the first build)
+    digested_comics: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    lease_until: Optional[datetime] = Field(default=None)  # a worker is folding the digest until then
+
+class AnalyticsRollupState(SQLModel, table=True):
+    """Progress of the ComicDailyRollup backfill (a single row)"""
+    id: int = Field(default=1, primary_key=True)
+    high_water_id: int = Field(default=0)  # comics up to this id are counted by the backfill, newer ones by the hooks
+    backfilled_id: int = Field(default=0)  # the backfill has counted comics up to this id
+    completed_at: Optional[datetime] = Field(default=None)
+    verified_at: Optional[datetime] = Field(default=None)  # per-user totals matched the comics after the rollout settled
+
+class InsightPrecomputeJob(SQLModel, table=True):
+    """Pending background precomputation of a user's insights and recommendations (api.ai.precompute)"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", unique=True, index=True)
+    requested_at: datetime = Field(default_factory=datetime.utcnow)  # bumped when more comics cross a threshold
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_error: Optional[str] = Field(default=None, max_length=1000)
+
 class AnalyticsInsight(SQLModel, table=True):
     """Model for storing user insights and patterns"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -61,6 +110,8 @@ class AnalyticsInsight(SQLModel, table=True):
     
     # Insight data (JSON)
     data: str = Field()  # JSON string containing insight data
+    # Set on cached LLM results (api.ai.insight_cache): the hash of the prompt they answer
+    fingerprint: Optional[str] = Field(default=None, max_length=64, index=True)
     
     # Timestamps
     created_at: datetime = Field(default_factory=get_utc_now)
@@ -174,31 +225,49 @@ class ComicRecommendationsResponse(BaseModel):
     based_on: Dict[str, Any]  # What the recommendations are based on
     total_recommendations: int
 
-# Analytics Service Functions
-class AnalyticsService:
-    """Service class for handling analytics operations based on existing comics data"""
-    
-    @staticmethod
-    def get_user_comics_for_analytics(session, user_id: int, world_type: Optional[WorldType] = None) -> List[ComicsPage]:
-        """Get user's comics for analytics analysis, optionally filtered by world type"""
-        query = select(ComicsPage).where(ComicsPage.user_id == user_id)
-        
-        # Filter by world type if specified
-        if world_type:
-            query = query.where(ComicsPage.world_type == world_type)
-        
-        # Order by creation date for time series analysis
-        query = query.order_by(ComicsPage.created_at.desc())
-        
-        return session.exec(query).all()
-    
+class AnalyticsBreakdown:
+    """
+    A user's comic counts by (world_type, genre, art_style, day) plus their latest prompts per world.
+    Every summary and chart view is derived from these rows (ComicDailyRollup rows once the backfill is done)
+    instead of rescanning the comics.
+    """
+
+    def __init__(self, rows: List[Any], recent: List[Any]):
+        # (world_type, genre, art_style, day, comics, concept_chars, last_created_at), names normalized
+        self.rows = rows
+        self.recent = recent  # (world_type, concept, created_at), newest 10 per world
+
+    def select(self, world_type: Optional[WorldType] = None, since: Optional[date] = None) -> List[Any]:
+        """Rows of one world (or all) from the day `since` on (or all time)"""
+        return [
+            row for row in self.rows
+            if (world_type is None or row.world_type == world_type) and (since is None or row.day >= since)
+        ]
+
     @staticmethod
-    def get_user_analytics_summary(session, user_id: int, world_type: Optional[WorldType] = None) -> AnalyticsSummary:
-        """Get comprehensive analytics summary for a user based on existing comics, optionally filtered by world type"""
-        # Get user's comics for analysis
-        comics = AnalyticsService.get_user_comics_for_analytics(session, user_id, world_type)
-        
-        if not comics:
+    def counts(rows: List[Any], key) -> Dict[Any, int]:
+        counts: Dict[Any, int] = {}
+        for row in rows:
+            counts[key(row)] = counts.get(key(row), 0) + row.comics
+        return counts
+
+    def recent_concepts(self, world_type: Optional[WorldType] = None, limit: int = 10) -> List[str]:
+        """Newest concepts of one world (or all), newest first"""
+        recent = sorted(
+            (prompt for prompt in self.recent if world_type is None or prompt.world_type == world_type),
+            key=lambda prompt: prompt.created_at, reverse=True
+        )
+        return [prompt.concept for prompt in recent[:limit]]
+
+    def top(self, rows: List[Any], key, limit: int) -> List[tuple]:
+        """(name, comics) of the `limit` most used names, most used first"""
+        return sorted(self.counts(rows, key).items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def summary(self, world_type: Optional[WorldType] = None) -> AnalyticsSummary:
+        """AnalyticsSummary of one world, or of all of them"""
+        rows = self.select(world_type)
+        total = sum(row.comics for row in rows)
+        if not total:
             return AnalyticsSummary(
                 total_entries=0,
                 genre_distribution=[],
@@ -208,112 +277,211 @@ class AnalyticsService:
                 recent_prompts=[],
                 insights_available=False
             )
-        
-        # Calculate genre distribution
-        genre_counts = {}
-        for comic in comics:
-            # Normalize genre to lowercase to prevent duplicates like 'drama' and 'Drama'
-            normalized_genre = comic.genre.lower().strip()
-            genre_counts[normalized_genre] = genre_counts.get(normalized_genre, 0) + 1
-        
-        total = len(comics)
+
+        def distribution(key):
+            # Most recently used first, like the old newest-first scan
+            latest = {}
+            for row in rows:
+                latest[key(row)] = max(latest.get(key(row), row.last_created_at), row.last_created_at)
+            return sorted(self.counts(rows, key).items(), key=lambda item: latest[item[0]], reverse=True)
+
+        def percentage(count):
+            return round((count / total) * 100, 2)
+
         genre_distribution = [
-            GenreStats(
-                genre=genre,
-                count=count,
-                percentage=round((count / total) * 100, 2)
-            )
-            for genre, count in genre_counts.items()
+            GenreStats(genre=genre, count=count, percentage=percentage(count))
+            for genre, count in distribution(lambda row: row.genre)
         ]
-        
-        # Calculate art style distribution
-        style_counts = {}
-        for comic in comics:
-            # Normalize art style to lowercase to prevent duplicates
-            normalized_style = comic.art_style.lower().strip()
-            style_counts[normalized_style] = style_counts.get(normalized_style, 0) + 1
-        
         art_style_distribution = [
-            ArtStyleStats(
-                art_style=style,
-                count=count,
-                percentage=round((count / total) * 100, 2)
-            )
-            for style, count in style_counts.items()
+            ArtStyleStats(art_style=style, count=count, percentage=percentage(count))
+            for style, count in distribution(lambda row: row.art_style)
         ]
-        
-        # Calculate world distribution (only if not filtered by world)
-        world_distribution = []
         if not world_type:
-            world_counts = {}
-            for comic in comics:
-                world_counts[comic.world_type] = world_counts.get(comic.world_type, 0) + 1
-    
             world_distribution = [
-                WorldStats(
-                    world_type=world_type,
-                    count=count,
-                    percentage=round((count / total) * 100, 2)
-                )
-                for world_type, count in world_counts.items()
+                WorldStats(world_type=world, count=count, percentage=percentage(count))
+                for world, count in distribution(lambda row: row.world_type)
             ]
         else:
             # If filtered by world, show 100% for that world
-            world_distribution = [
-                WorldStats(
-                    world_type=world_type,
-                    count=total,
-                    percentage=100.0
-                )
-            ]
-        
-        # Generate time series data (last 30 days)
-        from datetime import timedelta
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        
+            world_distribution = [WorldStats(world_type=world_type, count=total, percentage=100.0)]
+
+        # Time series of the last 30 days, one entry per day with comics (genres/styles of its comics, newest first)
+        days: Dict[date, List[Any]] = {}
+        for row in self.select(world_type, since=(datetime.now() - timedelta(days=30)).date()):
+            days.setdefault(row.day, []).append(row)
         time_series = []
-        current_date = start_date
-        while current_date <= end_date:
-            day_comics = [
-                comic for comic in comics 
-                if comic.created_at.date() == current_date.date()
-            ]
-            
-            if day_comics:
-                time_series.append(TimeSeriesData(
-                    date=current_date.strftime("%Y-%m-%d"),
-                    count=len(day_comics),
-                    genres=[comic.genre for comic in day_comics],
-                    art_styles=[comic.art_style for comic in day_comics]
-                ))
-            
-            current_date += timedelta(days=1)
-        
-        # Get recent prompts (last 10)
-        recent_prompts = [comic.concept for comic in comics[:10]]
-        
-        # Check if insights are available (every 5 comics)
-        insights_available = len(comics) % 5 == 0 and len(comics) > 0
-        
+        for day in sorted(days):
+            day_rows = sorted(days[day], key=lambda row: row.last_created_at, reverse=True)
+            time_series.append(TimeSeriesData(
+                date=day.strftime("%Y-%m-%d"),
+                count=sum(row.comics for row in day_rows),
+                genres=[row.genre for row in day_rows for _ in range(row.comics)],
+                art_styles=[row.art_style for row in day_rows for _ in range(row.comics)]
+            ))
+
         return AnalyticsSummary(
             total_entries=total,
             genre_distribution=genre_distribution,
             art_style_distribution=art_style_distribution,
             world_distribution=world_distribution,
             time_series=time_series,
-            recent_prompts=recent_prompts,
-            insights_available=insights_available
+            recent_prompts=self.recent_concepts(world_type),
+            # Insights are available every 5 comics
+            insights_available=total % 5 == 0
+        )
+
+
+# Set once the rollups are seen complete and verified (it never goes back)
+_rollups_complete = False
+
+# Analytics Service Functions
+class AnalyticsService:
+    """Service class for handling analytics operations based on existing comics data"""
+    
+    @staticmethod
+    async def rollups_complete(session: AsyncSession) -> bool:
+        """
+        Whether ComicDailyRollup covers every comic: the backfill of api.ai.rollups is done and its verification
+        found no user whose rollups disagree with their comics (e.g. comics saved by instances without the hooks).
+        """
+        global _rollups_complete
+        if not _rollups_complete:
+            state = await session.get(AnalyticsRollupState, 1)
+            _rollups_complete = state is not None and state.verified_at is not None
+        return _rollups_complete
+    
+    @staticmethod
+    async def get_user_analytics_breakdown(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None) -> AnalyticsBreakdown:
+        """
+        The grouped rows of a user's comics (optionally one world) that all analytics views are built from.
+        Read from the daily rollups (O(days), whatever the library size) once they are backfilled.
+        """
+        if await AnalyticsService.rollups_complete(session):
+            query = (
+                select(
+                    ComicDailyRollup.world_type,
+                    ComicDailyRollup.genre,
+                    ComicDailyRollup.art_style,
+                    ComicDailyRollup.day,
+                    ComicDailyRollup.comics,
+                    ComicDailyRollup.concept_chars,
+                    ComicDailyRollup.last_created_at
+                )
+                .where(ComicDailyRollup.user_id == user_id, ComicDailyRollup.comics > 0)
+            )
+            if world_type:
+                query = query.where(ComicDailyRollup.world_type == world_type)
+        else:
+            # Same grain as the rollups, grouped on the fly
+            # Normalize names to lowercase to prevent duplicates like 'drama' and 'Drama'
+            genre = func.lower(func.trim(ComicsPage.genre)).label("genre")
+            art_style = func.lower(func.trim(ComicsPage.art_style)).label("art_style")
+            day = cast(ComicsPage.created_at, Date).label("day")
+            query = (
+                select(
+                    ComicsPage.world_type,
+                    genre,
+                    art_style,
+                    day,
+                    func.count(ComicsPage.id).label("comics"),
+                    func.coalesce(func.sum(func.length(ComicsPage.concept)), 0).label("concept_chars"),
+                    func.max(ComicsPage.created_at).label("last_created_at")
+                )
+                .where(ComicsPage.user_id == user_id)
+                .group_by(ComicsPage.world_type, genre, art_style, day)
+            )
+            if world_type:
+                query = query.where(ComicsPage.world_type == world_type)
+        rows = (await session.exec(query)).all()
+        
+        # Newest 10 prompts of each world, each an index range scan
+        newest = union_all(*(
+            select(ComicsPage.world_type, ComicsPage.concept, ComicsPage.created_at)
+            .where(ComicsPage.user_id == user_id, ComicsPage.world_type == world)
+            .order_by(ComicsPage.created_at.desc())
+            .limit(10)
+            for world in ([world_type] if world_type else list(WorldType))
+        )).subquery()
+        recent = (await session.exec(select(newest.c.world_type, newest.c.concept, newest.c.created_at))).all()
+        
+        return AnalyticsBreakdown(rows, recent)
+    
+    @staticmethod
+    async def get_user_creativity_stats(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None) -> Any:
+        """One row (comics, unique_genres, unique_art_styles, avg_concept_length), aggregated in Postgres"""
+        if await AnalyticsService.rollups_complete(session):
+            source = ComicDailyRollup
+            query = select(
+                func.coalesce(func.sum(ComicDailyRollup.comics), 0).label("comics"),
+                func.count(func.distinct(ComicDailyRollup.genre)).label("unique_genres"),
+                func.count(func.distinct(ComicDailyRollup.art_style)).label("unique_art_styles"),
+                (func.sum(ComicDailyRollup.concept_chars) / func.nullif(func.sum(ComicDailyRollup.comics), 0)).label("avg_concept_length")
+            ).where(ComicDailyRollup.comics > 0)
+        else:
+            source = ComicsPage
+            query = select(
+                func.count(ComicsPage.id).label("comics"),
+                func.count(func.distinct(func.lower(func.trim(ComicsPage.genre)))).label("unique_genres"),
+                func.count(func.distinct(func.lower(func.trim(ComicsPage.art_style)))).label("unique_art_styles"),
+                func.avg(func.length(ComicsPage.concept)).label("avg_concept_length")
+            )
+        query = query.where(source.user_id == user_id)
+        if world_type:
+            query = query.where(source.world_type == world_type)
+        return (await session.exec(query)).one()
+    
+    @staticmethod
+    async def get_user_recent_comics(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None, limit: int = 10) -> List[Any]:
+        """The user's newest comics (activity columns only), newest first"""
+        query = (
+            select(
+                ComicsPage.id,
+                ComicsPage.title,
+                ComicsPage.concept,
+                ComicsPage.genre,
+                ComicsPage.art_style,
+                ComicsPage.world_type,
+                ComicsPage.created_at,
+                ComicsPage.is_favorite,
+                ComicsPage.is_public,
+                ComicsPage.view_count
+            )
+            .where(ComicsPage.user_id == user_id)
+            .order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc())
+            .limit(limit)
         )
+        if world_type:
+            query = query.where(ComicsPage.world_type == world_type)
+        return (await session.exec(query)).all()
+    
+    @staticmethod
+    async def get_user_analytics_summary(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None) -> AnalyticsSummary:
+        """Get comprehensive analytics summary for a user based on existing comics, optionally filtered by world type"""
+        breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id, world_type)
+        return breakdown.summary(world_type)
+    
+    @staticmethod
+    async def world_prompt_data(breakdown: AnalyticsBreakdown, user_id: int, world_type: WorldType) -> Dict[str, Any]:
+        """Bounded LLM input for one world: the concept digest, the newest concepts and the top genres"""
+        from api.ai.digest import concept_digests, clip
+        
+        rows = breakdown.select(world_type)
+        return {
+            "digest": await concept_digests.get(user_id, world_type) if rows else "",
+            "concepts": [clip(concept) for concept in breakdown.recent_concepts(world_type)],
+            "genres": dict(breakdown.top(rows, lambda row: row.genre, 10)),
+            "count": sum(row.comics for row in rows)
+        }
     
     @staticmethod
-    async def analyze_prompt_themes(concepts: List[str]) -> PromptAnalysis:
-        """Use LLM to analyze comic concepts and patterns"""
+    async def analyze_prompt_themes(user_id: int, concepts: List[str], scope: str = "all") -> PromptAnalysis:
+        """Use LLM to analyze comic concepts and patterns (cached per scope and set of concepts)"""
+        from api.ai.insight_cache import insight_cache
+        from api.ai.digest import clip
+        
         try:
-            llm = get_openai_llm()
-            
             # Combine recent concepts for analysis
-            combined_concepts = "\n".join([f"- {concept}" for concept in concepts[:20]])  # Last 20 concepts
+            combined_concepts = "\n".join([f"- {clip(concept)}" for concept in concepts[:20]])  # Last 20 concepts
             
             analysis_prompt = f"""
             Analyze the following comic concepts from a user. Focus on:
@@ -337,9 +505,11 @@ class AnalyticsService:
             Focus on the user's creative intent and expression, not the content of the comics themselves.
             """
             
-            response = await llm.ainvoke(analysis_prompt)
-            analysis_data = json.loads(response.content)
+            async def invoke_llm():
+                response = await get_openai_llm().ainvoke(analysis_prompt)
+                return json.loads(response.content)
             
+            analysis_data = await insight_cache.get_or_compute(user_id, f"llm_prompt_themes_{scope}", analysis_prompt, invoke_llm)
             return PromptAnalysis(**analysis_data)
             
         except Exception as e:
@@ -353,13 +523,15 @@ class AnalyticsService:
             )
     
     @staticmethod
-    async def generate_weekly_insight(session, user_id: int, world_type: Optional[WorldType] = None) -> WeeklyInsight:
+    async def generate_weekly_insight(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None) -> WeeklyInsight:
         """Legacy function for backward compatibility - uses weekly period"""
         return await AnalyticsService.generate_insight_by_period(session, user_id, DigestPeriod.WEEKLY, world_type)
     
     @staticmethod
-    async def generate_psychological_assumptions(session, user_id: int, world_type: Optional[WorldType] = None) -> CrossWorldPsychologicalAssumption:
+    async def generate_psychological_assumptions(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None) -> CrossWorldPsychologicalAssumption:
         """Generate psychological assumptions based on user's comic prompts for a specific world or all worlds"""
+        from api.ai.insight_cache import insight_cache
+        
         try:
             print(f"🔍 DEBUG: Starting psychological analysis for user {user_id}, world_type: {world_type}")
             llm = get_openai_llm()
@@ -367,28 +539,15 @@ class AnalyticsService:
             if world_type:
                 # Analyze specific world only
                 print(f"🔍 DEBUG: Fetching comics for specific world: {world_type.value}")
-                world_comics = AnalyticsService.get_user_comics_for_analytics(session, user_id, world_type)
-                print(f"🔍 DEBUG: Found {len(world_comics)} comics for {world_type.value}")
+                breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id, world_type)
+                world_data = {world_type.value: await AnalyticsService.world_prompt_data(breakdown, user_id, world_type)}
+                print(f"🔍 DEBUG: Found {world_data[world_type.value]['count']} comics for {world_type.value}")
                 
-                if not world_comics:
+                if not world_data[world_type.value]["count"]:
                     print(f"❌ DEBUG: No comics found for {world_type.value}")
                     raise ValueError(f"No comic data available for {world_type.value}")
                 
-                # Log sample comics for debugging
-                print(f"🔍 DEBUG: Sample comics for {world_type.value}:")
-                for i, comic in enumerate(world_comics[:5]):  # Show first 5
-                    print(f"  Comic {i+1}: '{comic.concept[:50]}...' (Genre: {comic.genre})")
-                
-                # Prepare data for single world analysis
-                world_data = {
-                    world_type.value: {
-                        "concepts": [comic.concept for comic in world_comics],
-                        "genres": [comic.genre for comic in world_comics],
-                        "count": len(world_comics)
-                    }
-                }
-                
-                print(f"🔍 DEBUG: Prepared data for {world_type.value}: {len(world_data[world_type.value]['concepts'])} concepts, {len(world_data[world_type.value]['genres'])} genres")
+                print(f"🔍 DEBUG: Prepared data for {world_type.value}: digest of {len(world_data[world_type.value]['digest'])} characters, {len(world_data[world_type.value]['concepts'])} recent concepts, {len(world_data[world_type.value]['genres'])} genres")
                 
                 # Create analysis prompt for single world
                 analysis_prompt = f"""
@@ -402,8 +561,9 @@ class AnalyticsService:
                 Then synthesize a psychologically informed assumption about the user based on their patterns in this specific world.
 
                 **{world_type.value.replace('_', ' ').title()} Data:**
-                Concepts: {world_data[world_type.value]['concepts']}
-                Genres: {world_data[world_type.value]['genres']}
+                Digest of all concepts: {world_data[world_type.value]['digest']}
+                Recent concepts: {world_data[world_type.value]['concepts']}
+                Genres (comics per genre): {world_data[world_type.value]['genres']}
                 Count: {world_data[world_type.value]['count']}
 
                 Provide your analysis in the following JSON format:
@@ -439,40 +599,19 @@ class AnalyticsService:
             else:
                 # Analyze all worlds (original functionality)
                 print(f"🔍 DEBUG: Fetching comics for all worlds")
-                imagination_comics = AnalyticsService.get_user_comics_for_analytics(
-                    session, user_id, WorldType.IMAGINATION_WORLD
-                )
-                mind_comics = AnalyticsService.get_user_comics_for_analytics(
-                    session, user_id, WorldType.MIND_WORLD
-                )
-                dream_comics = AnalyticsService.get_user_comics_for_analytics(
-                    session, user_id, WorldType.DREAM_WORLD
-                )
-                
-                print(f"🔍 DEBUG: Found comics - Imagination: {len(imagination_comics)}, Mind: {len(mind_comics)}, Dream: {len(dream_comics)}")
+                breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id)
                 
                 # Prepare data for analysis
                 world_data = {
-                    "imagination_world": {
-                        "concepts": [comic.concept for comic in imagination_comics],
-                        "genres": [comic.genre for comic in imagination_comics],
-                        "count": len(imagination_comics)
-                    },
-                    "mind_world": {
-                        "concepts": [comic.concept for comic in mind_comics],
-                        "genres": [comic.genre for comic in mind_comics],
-                        "count": len(mind_comics)
-                    },
-                    "dream_world": {
-                        "concepts": [comic.concept for comic in dream_comics],
-                        "genres": [comic.genre for comic in dream_comics],
-                        "count": len(dream_comics)
-                    }
+                    world.value: await AnalyticsService.world_prompt_data(breakdown, user_id, world)
+                    for world in (WorldType.IMAGINATION_WORLD, WorldType.MIND_WORLD, WorldType.DREAM_WORLD)
                 }
                 
+                print(f"🔍 DEBUG: Found comics - Imagination: {world_data['imagination_world']['count']}, Mind: {world_data['mind_world']['count']}, Dream: {world_data['dream_world']['count']}")
+                
                 print(f"🔍 DEBUG: Prepared data for all worlds:")
                 for world, data in world_data.items():
-                    print(f"  {world}: {data['count']} comics, {len(data['concepts'])} concepts")
+                    print(f"  {world}: {data['count']} comics, {len(data['concepts'])} recent concepts")
                 
                 # Create analysis prompt for all worlds
                 analysis_prompt = f"""
@@ -486,18 +625,21 @@ class AnalyticsService:
                 Then synthesize a single, psychologically informed assumption about the user based on cross-world patterns.
 
                 **Imagination World Data:**
-                Concepts: {world_data['imagination_world']['concepts']}
-                Genres: {world_data['imagination_world']['genres']}
+                Digest of all concepts: {world_data['imagination_world']['digest']}
+                Recent concepts: {world_data['imagination_world']['concepts']}
+                Genres (comics per genre): {world_data['imagination_world']['genres']}
                 Count: {world_data['imagination_world']['count']}
 
                 **Mind World Data:**
-                Concepts: {world_data['mind_world']['concepts']}
-                Genres: {world_data['mind_world']['genres']}
+                Digest of all concepts: {world_data['mind_world']['digest']}
+                Recent concepts: {world_data['mind_world']['concepts']}
+                Genres (comics per genre): {world_data['mind_world']['genres']}
                 Count: {world_data['mind_world']['count']}
 
                 **Dream World Data:**
-                Concepts: {world_data['dream_world']['concepts']}
-                Genres: {world_data['dream_world']['genres']}
+                Digest of all concepts: {world_data['dream_world']['digest']}
+                Recent concepts: {world_data['dream_world']['concepts']}
+                Genres (comics per genre): {world_data['dream_world']['genres']}
                 Count: {world_data['dream_world']['count']}
 
                 Provide your analysis in the following JSON format:
@@ -544,32 +686,37 @@ class AnalyticsService:
                 
                 print(f"🔍 DEBUG: Created analysis prompt for all worlds (length: {len(analysis_prompt)} characters)")
             
-            print(f"🔍 DEBUG: Calling LLM with prompt...")
-            try:
-                response = await llm.ainvoke(analysis_prompt)
-                print(f"🔍 DEBUG: LLM response received (length: {len(response.content)} characters)")
-                print(f"🔍 DEBUG: LLM response preview: {response.content[:200]}...")
-                
-                import re
-                raw_content = response.content.strip()
-                # Remove code block markers (```json or ``` at start, ``` at end)
-                lines = raw_content.splitlines()
-                if lines and lines[0].strip().startswith('```'):
-                    lines = lines[1:]
-                if lines and lines[-1].strip() == '```':
-                    lines = lines[:-1]
-                cleaned_content = '\n'.join(lines).strip()
-                analysis_data = json.loads(cleaned_content)
-                print(f"🔍 DEBUG: Successfully parsed LLM response as JSON")
-                print(f"🔍 DEBUG: Analysis data keys: {list(analysis_data.keys())}")
-                
-            except json.JSONDecodeError as e:
-                print(f"❌ DEBUG: Failed to parse LLM response as JSON: {e}")
-                print(f"❌ DEBUG: Raw LLM response: {response.content}")
-                raise Exception(f"LLM returned invalid JSON: {e}")
-            except Exception as e:
-                print(f"❌ DEBUG: LLM call failed: {e}")
-                raise e
+            async def invoke_llm():
+                print(f"🔍 DEBUG: Calling LLM with prompt...")
+                try:
+                    response = await llm.ainvoke(analysis_prompt)
+                    print(f"🔍 DEBUG: LLM response received (length: {len(response.content)} characters)")
+                    print(f"🔍 DEBUG: LLM response preview: {response.content[:200]}...")
+                    
+                    raw_content = response.content.strip()
+                    # Remove code block markers (```json or ``` at start, ``` at end)
+                    lines = raw_content.splitlines()
+                    if lines and lines[0].strip().startswith('```'):
+                        lines = lines[1:]
+                    if lines and lines[-1].strip() == '```':
+                        lines = lines[:-1]
+                    cleaned_content = '\n'.join(lines).strip()
+                    analysis_data = json.loads(cleaned_content)
+                    print(f"🔍 DEBUG: Successfully parsed LLM response as JSON")
+                    print(f"🔍 DEBUG: Analysis data keys: {list(analysis_data.keys())}")
+                    return analysis_data
+                    
+                except json.JSONDecodeError as e:
+                    print(f"❌ DEBUG: Failed to parse LLM response as JSON: {e}")
+                    print(f"❌ DEBUG: Raw LLM response: {response.content}")
+                    raise Exception(f"LLM returned invalid JSON: {e}")
+                except Exception as e:
+                    print(f"❌ DEBUG: LLM call failed: {e}")
+                    raise e
+            
+            # Failures are not cached: the fallback below is returned and the next request tries again
+            insight_type = f"llm_psychological_assumptions_{world_type.value}" if world_type else "llm_psychological_assumptions_all"
+            analysis_data = await insight_cache.get_or_compute(user_id, insight_type, analysis_prompt, invoke_llm)
             
             # Create world profiles
             world_profiles = {}
@@ -630,7 +777,7 @@ class AnalyticsService:
             )
     
     @staticmethod
-    async def generate_insight_by_period(session, user_id: int, period: DigestPeriod = DigestPeriod.WEEKLY, world_type: Optional[WorldType] = None) -> WeeklyInsight:
+    async def generate_insight_by_period(session: AsyncSession, user_id: int, period: DigestPeriod = DigestPeriod.WEEKLY, world_type: Optional[WorldType] = None) -> WeeklyInsight:
         """Generate insight based on user's comic generation patterns for specified period"""
         from datetime import timedelta
         
@@ -646,37 +793,18 @@ class AnalyticsService:
             start_date = datetime.min.replace(tzinfo=timezone.utc)
             period_name = "All Time"
         
-        # Get comics from the specified period
-        query = select(ComicsPage).where(ComicsPage.user_id == user_id)
+        # Period stats from the grouped breakdown; the day grain makes the period whole days
+        since = None if period == DigestPeriod.ALL_TIME else start_date.date()
+        breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id, world_type)
+        rows = breakdown.select(world_type, since=since)
+        total = sum(row.comics for row in rows)
         
-        if period != DigestPeriod.ALL_TIME:
-            query = query.where(ComicsPage.created_at >= start_date)
-            
-        if world_type:
-            query = query.where(ComicsPage.world_type == world_type)
-            
-        period_comics = session.exec(query).all()
-        
-        if not period_comics:
+        if not total:
             raise ValueError(f"No data available for {period.value} insight")
         
-        # Calculate period stats
-        genre_counts = {}
-        style_counts = {}
-        world_counts = {}
-        
-        for comic in period_comics:
-            # Normalize genre to lowercase to prevent duplicates like 'drama' and 'Drama'
-            normalized_genre = comic.genre.lower().strip()
-            genre_counts[normalized_genre] = genre_counts.get(normalized_genre, 0) + 1
-            
-            # Normalize art style as well
-            normalized_style = comic.art_style.lower().strip()
-            style_counts[normalized_style] = style_counts.get(normalized_style, 0) + 1
-            
-            world_counts[comic.world_type] = world_counts.get(comic.world_type, 0) + 1
-        
-        total = len(period_comics)
+        genre_counts = breakdown.counts(rows, lambda row: row.genre)
+        style_counts = breakdown.counts(rows, lambda row: row.art_style)
+        world_counts = breakdown.counts(rows, lambda row: row.world_type)
         
         # Top genres
         top_genres = [
@@ -696,9 +824,21 @@ class AnalyticsService:
             for world_type, count in world_counts.items()
         ]
         
-        # Analyze concept patterns
-        concepts = [comic.concept for comic in period_comics]
-        prompt_patterns = await AnalyticsService.analyze_prompt_themes(concepts)
+        # Analyze concept patterns (only the 20 newest of the period go to the LLM)
+        query = (
+            select(ComicsPage.concept)
+            .where(ComicsPage.user_id == user_id)
+            .order_by(ComicsPage.created_at.desc())
+            .limit(20)
+        )
+        if since:
+            query = query.where(ComicsPage.created_at >= datetime.combine(since, datetime.min.time()))
+        if world_type:
+            query = query.where(ComicsPage.world_type == world_type)
+        concepts = (await session.exec(query)).all()
+        prompt_patterns = await AnalyticsService.analyze_prompt_themes(
+            user_id, concepts, scope=f"{period.value}_{world_type.value if world_type else 'all'}"
+        )
         
         # Calculate period start and end dates
         if period == DigestPeriod.ALL_TIME:
@@ -719,7 +859,7 @@ class AnalyticsService:
         )
     
     @staticmethod
-    def save_insight(session, user_id: int, insight_type: str, title: str, description: str, data: Dict[str, Any]) -> AnalyticsInsight:
+    async def save_insight(session: AsyncSession, user_id: int, insight_type: str, title: str, description: str, data: Dict[str, Any]) -> AnalyticsInsight:
         """Save an insight to the database"""
         insight = AnalyticsInsight(
             user_id=user_id,
@@ -729,50 +869,48 @@ class AnalyticsService:
             data=json.dumps(data)
         )
         session.add(insight)
-        session.commit()
-        session.refresh(insight)
+        await session.commit()
+        await session.refresh(insight)
         return insight
     
     @staticmethod
-    def get_user_insights(session, user_id: int, insight_type: Optional[str] = None) -> List[AnalyticsInsight]:
+    async def get_user_insights(session: AsyncSession, user_id: int, insight_type: Optional[str] = None) -> List[AnalyticsInsight]:
         """Get insights for a user"""
-        query = select(AnalyticsInsight).where(AnalyticsInsight.user_id == user_id)
+        # Cached LLM results (with a fingerprint) are not user-facing insights
+        query = select(AnalyticsInsight).where(AnalyticsInsight.user_id == user_id, AnalyticsInsight.fingerprint.is_(None))
         if insight_type:
             query = query.where(AnalyticsInsight.insight_type == insight_type)
         
-        return session.exec(query).all()
+        return (await session.exec(query)).all()
 
     @staticmethod
-    async def generate_comic_recommendations(session, user_id: int, world_type: Optional[WorldType] = None, limit: int = 5) -> ComicRecommendationsResponse:
+    async def generate_comic_recommendations(session: AsyncSession, user_id: int, world_type: Optional[WorldType] = None, limit: int = 5) -> ComicRecommendationsResponse:
         """Generate comic recommendations based on user's genre, art style, and prompt patterns"""
+        from api.ai.insight_cache import insight_cache
+        from api.ai.digest import concept_digests, clip
+        
         try:
             llm = get_openai_llm()
             
-            # Get user's comics for analysis
-            if world_type:
-                user_comics = AnalyticsService.get_user_comics_for_analytics(session, user_id, world_type)
-            else:
-                user_comics = AnalyticsService.get_user_comics_for_analytics(session, user_id)
+            # Get user's comic patterns for analysis (bounded, whatever the size of the history)
+            breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id, world_type)
+            rows = breakdown.select(world_type)
+            total_comics = sum(row.comics for row in rows)
             
-            if not user_comics:
+            if not total_comics:
                 raise ValueError(f"No comic data available for recommendations")
             
-            # Analyze user patterns
-            genres = [comic.genre for comic in user_comics]
-            art_styles = [comic.art_style for comic in user_comics]
-            concepts = [comic.concept for comic in user_comics]
-            
             # Get most common preferences
-            genre_counts = {}
-            for genre in genres:
-                genre_counts[genre] = genre_counts.get(genre, 0) + 1
-            
-            art_style_counts = {}
-            for style in art_styles:
-                art_style_counts[style] = art_style_counts.get(style, 0) + 1
+            top_genres = breakdown.top(rows, lambda row: row.genre, 3)
+            top_art_styles = breakdown.top(rows, lambda row: row.art_style, 3)
+            concepts = [clip(concept) for concept in breakdown.recent_concepts(world_type)]
             
-            top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            top_art_styles = sorted(art_style_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+            # Digest of every concept, per world
+            worlds = [world_type] if world_type else list(WorldType)
+            digests = {
+                world.value: await concept_digests.get(user_id, world)
+                for world in worlds if breakdown.select(world)
+            }
             
             # Create recommendation prompt
             analysis_prompt = f"""
@@ -783,7 +921,8 @@ class AnalyticsService:
             User's Patterns:
             - Most used genres: {[genre for genre, count in top_genres]}
             - Most used art styles: {[style for style, count in top_art_styles]}
-            - Recent concepts: {concepts[:10]}
+            - Recent concepts: {concepts}
+            - Digest of all their concepts, per world: {digests}
 
             Instructions:
             - Recommend real, published comics (no AI-generated content)
@@ -824,12 +963,10 @@ class AnalyticsService:
             """
 
             
-            # Generate recommendations using LLM
-            response = await llm.ainvoke(analysis_prompt)
-            
-            # Parse the response
-            try:
-                import json
+            async def invoke_llm():
+                # Generate recommendations using LLM
+                response = await llm.ainvoke(analysis_prompt)
+                
                 # Handle different response types
                 if isinstance(response, str):
                     response_text = response
@@ -846,7 +983,17 @@ class AnalyticsService:
                     response_text = str(response)
                 
                 # Extract JSON from the response
-                recommendations_data = AnalyticsService._extract_json_from_response(response_text)
+                try:
+                    return AnalyticsService._extract_json_from_response(response_text)
+                except ValueError:
+                    print(f"❌ DEBUG: Response type: {type(response)}")
+                    print(f"❌ DEBUG: Response content: {response}")
+                    raise
+            
+            # Parse the response
+            try:
+                insight_type = f"llm_comic_recommendations_{world_type.value if world_type else 'all'}_{limit}"
+                recommendations_data = await insight_cache.get_or_compute(user_id, insight_type, analysis_prompt, invoke_llm)
                 
                 recommendations = []
                 for rec_data in recommendations_data.get("recommendations", []):
@@ -869,7 +1016,7 @@ class AnalyticsService:
                 
                 # Create response
                 based_on = {
-                    "total_comics_analyzed": len(user_comics),
+                    "total_comics_analyzed": total_comics,
                     "top_genres": [{"genre": genre, "count": count} for genre, count in top_genres],
                     "top_art_styles": [{"style": style, "count": count} for style, count in top_art_styles],
                     "world_type": world_type.value if world_type else "all_worlds",
@@ -885,8 +1032,6 @@ class AnalyticsService:
                 
             except Exception as parse_error:
                 print(f"❌ DEBUG: Error parsing LLM response: {parse_error}")
-                print(f"❌ DEBUG: Response type: {type(response)}")
-                print(f"❌ DEBUG: Response content: {response}")
                 # Fallback: generate simple recommendations
                 return AnalyticsService._generate_fallback_recommendations(user_id, top_genres, top_art_styles, limit, world_type)
                 
@@ -0,0 +1,199 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.db import async_session_factory
+from api.chat.models import ComicsPage, WorldType
+from api.ai.analyses import ConceptDigest
+from api.ai.llms import get_openai_llm
+from api.utils.metrics import metrics
+
+# Size bounds of everything the analytics prompts take from a user's concepts
+CONCEPT_DIGEST_MAX_CHARS = int(os.environ.get("CONCEPT_DIGEST_MAX_CHARS", "2000"))
+CONCEPT_PROMPT_CHARS = int(os.environ.get("CONCEPT_PROMPT_CHARS", "300"))  # per concept
+# New concepts folded into the digest per LLM call
+CONCEPT_DIGEST_BATCH_SIZE = int(os.environ.get("CONCEPT_DIGEST_BATCH_SIZE", "50"))
+# The first build of a digest starts from this many newest comics; older ones are only in the counts
+CONCEPT_DIGEST_BACKFILL_COMICS = int(os.environ.get("CONCEPT_DIGEST_BACKFILL_COMICS", "200"))
+CONCEPT_DIGEST_CONCURRENCY = int(os.environ.get("CONCEPT_DIGEST_CONCURRENCY", "2"))
+# A claimed digest is left to its worker for this long; if that worker dies another one takes over afterwards
+CONCEPT_DIGEST_LEASE_SECONDS = float(os.environ.get("CONCEPT_DIGEST_LEASE_SECONDS", "300"))
+
+
+def clip(text: str, limit: int = CONCEPT_PROMPT_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+async def reduce_concepts(world_type: WorldType, summary: str, concepts: List[str]) -> str:
+    """One reduce step: the previous digest plus a batch of new concepts in, the new digest out"""
+    new_concepts = "\n".join(f"- {clip(concept)}" for concept in concepts)
+    prompt = f"""
+    You maintain a compact digest of the comic concepts a user created in the {world_type.value.replace('_', ' ')}.
+    Update the digest with the new concepts below. Keep recurring themes, emotional tones, symbols, settings and
+    character roles, and how often they come up; drop one-off details. Write at most {CONCEPT_DIGEST_MAX_CHARS // 6} words.
+    Return only the updated digest text.
+
+    Current digest:
+    {summary or "(empty)"}
+
+    New concepts:
+    {new_concepts}
+    """
+    response = await get_openai_llm().ainvoke(prompt)
+    return clip(str(response.content).strip(), CONCEPT_DIGEST_MAX_CHARS)
+
+
+async def _claim_digest(session: AsyncSession, user_id: int, world_type: WorldType) -> Optional[Tuple[int, str, int]]:
+    """Lease the digest row for one fold: (id, summary, covered_id), None while another worker holds it (commits)"""
+    now = datetime.utcnow()
+    claimed = (await session.exec(
+        update(ConceptDigest)
+        .where(
+            ConceptDigest.user_id == user_id,
+            ConceptDigest.world_type == world_type,
+            or_(ConceptDigest.lease_until.is_(None), ConceptDigest.lease_until < now)
+        )
+        .values(lease_until=now + timedelta(seconds=CONCEPT_DIGEST_LEASE_SECONDS))
+        .returning(ConceptDigest.id, ConceptDigest.summary, ConceptDigest.covered_id)
+    )).first()
+    await session.commit()
+    return tuple(claimed) if claimed else None
+
+
+async def _release_digest(session: AsyncSession, digest_id: int, covered_id: int, **values) -> bool:
+    """Store a fold (or just drop the lease) unless the digest moved past covered_id meanwhile (commits)"""
+    stored = (await session.exec(
+        update(ConceptDigest)
+        .where(ConceptDigest.id == digest_id, ConceptDigest.covered_id == covered_id)
+        .values(lease_until=None, **values)
+    )).rowcount
+    await session.commit()
+    return bool(stored)
+
+
+async def fold_concept_digest(user_id: int, world_type: WorldType) -> str:
+    """
+    Fold the user's comics of world_type that are not in their digest yet into it, one batch per LLM call.
+    The row is leased for each batch and the LLM is called outside any transaction; the result is only stored
+    if the digest still covers what it covered when claimed. Returns the digest; a failed LLM call leaves the
+    previous one in place.
+    """
+    async with async_session_factory() as session:
+        await session.exec(
+            insert(ConceptDigest)
+            .values(user_id=user_id, world_type=world_type, summary="", covered_id=0, digested_comics=0,
+                    updated_at=datetime.utcnow())
+            .on_conflict_do_nothing(constraint="uq_conceptdigest_user_world")
+        )
+        await session.commit()
+
+        while True:
+            claimed = await _claim_digest(session, user_id, world_type)
+            if claimed is None:
+                metrics.incr("digest.busy")
+                break
+            digest_id, summary, covered_id = claimed
+            start = covered_id
+            if covered_id == 0:
+                # First build: skip all but the newest comics, so a large history costs a bounded number of calls
+                start = (await session.exec(
+                    select(ComicsPage.id)
+                    .where(ComicsPage.user_id == user_id, ComicsPage.world_type == world_type)
+                    .order_by(ComicsPage.id.desc())
+                    .offset(CONCEPT_DIGEST_BACKFILL_COMICS)
+                    .limit(1)
+                )).first() or 0
+
+            batch = (await session.exec(
+                select(ComicsPage.id, ComicsPage.concept)
+                .where(
+                    ComicsPage.user_id == user_id,
+                    ComicsPage.world_type == world_type,
+                    ComicsPage.id > start
+                )
+                .order_by(ComicsPage.id)
+                .limit(CONCEPT_DIGEST_BATCH_SIZE)
+            )).all()
+            # Ends the read transaction: no connection is held while the LLM runs
+            await session.commit()
+            if not batch:
+                await _release_digest(session, digest_id, covered_id)
+                break
+
+            try:
+                summary = await reduce_concepts(world_type, summary, [row.concept for row in batch])
+            except Exception as e:
+                await _release_digest(session, digest_id, covered_id)
+                metrics.incr("digest.failures")
+                print(f"⚠️ Concept digest of user {user_id} ({world_type.value}) not updated: {e}")
+                break
+
+            stored = await _release_digest(
+                session, digest_id, covered_id,
+                summary=summary,
+                covered_id=batch[-1].id,
+                digested_comics=ConceptDigest.digested_comics + len(batch),
+                updated_at=datetime.utcnow()
+            )
+            if not stored:
+                # Our lease expired and another worker folded these comics first
+                metrics.incr("digest.conflicts")
+                break
+            metrics.incr("digest.folds")
+            if len(batch) < CONCEPT_DIGEST_BATCH_SIZE:
+                break
+
+        summary = (await session.exec(
+            select(ConceptDigest.summary)
+            .where(ConceptDigest.user_id == user_id, ConceptDigest.world_type == world_type)
+        )).first()
+        return summary or ""
+
+
+class ConceptDigests:
+    """Up-to-date concept digests: concurrent requests for one (user, world) in this worker share a fold"""
+
+    def __init__(self, concurrency: int = CONCEPT_DIGEST_CONCURRENCY):
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[Tuple[int, WorldType], "asyncio.Task[str]"] = {}
+
+    async def get(self, user_id: int, world_type: WorldType) -> str:
+        """The user's digest of a world, with their newest comics folded in"""
+        key = (user_id, world_type)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fold(user_id, world_type))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def schedule(self, user_id: int, world_type: WorldType) -> None:
+        """Fold a just-saved comic in the background, so analytics calls find the digest up to date"""
+        asyncio.ensure_future(self.get(user_id, world_type)).add_done_callback(self._report)
+
+    async def _fold(self, user_id: int, world_type: WorldType) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await fold_concept_digest(user_id, world_type)
+
+    @staticmethod
+    def _report(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            print(f"⚠️ Background concept digest failed: {task.exception()}")
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+# Global instance
+concept_digests = ConceptDigests()
+
+metrics.register_gauge("digest.inflight", lambda: len(concept_digests))
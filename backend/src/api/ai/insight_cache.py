@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict
+
+from sqlmodel import select, delete
+
+from api.db import async_session_factory
+from api.ai.analyses import AnalyticsInsight, get_utc_now
+from api.utils.metrics import metrics
+
+# LLM insight results are reused while the comics they were computed from are unchanged, for at most this long
+INSIGHT_CACHE_SECONDS = float(os.environ.get("INSIGHT_CACHE_SECONDS", str(7 * 24 * 3600)))
+
+
+def fingerprint(prompt: str) -> str:
+    """Key of an LLM input: the prompt embeds the comic set, so a changed comic gives a new key"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    """
+    LLM results stored in AnalyticsInsight (rows with a fingerprint, expiring after ttl_seconds).
+    Concurrent requests for the same result in this worker share one LLM call.
+    """
+
+    def __init__(self, ttl_seconds: float = INSIGHT_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._inflight: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+    async def get_or_compute(
+        self,
+        user_id: int,
+        insight_type: str,
+        prompt: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """The cached result of `compute` (an LLM call returning JSON data) for this prompt"""
+        key = fingerprint(prompt)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_or_compute(user_id, insight_type, key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            metrics.incr("insights.coalesced")
+        # Shielded: a client that disconnects does not cancel the call the others are waiting for
+        return await asyncio.shield(task)
+
+    async def _load_or_compute(
+        self,
+        user_id: int,
+        insight_type: str,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        # Own primary session: callers may hold a replica session, and their session is not shared across tasks
+        async with async_session_factory() as session:
+            cached = (await session.exec(
+                select(AnalyticsInsight)
+                .where(
+                    AnalyticsInsight.user_id == user_id,
+                    AnalyticsInsight.insight_type == insight_type,
+                    AnalyticsInsight.fingerprint == key,
+                    AnalyticsInsight.expires_at > get_utc_now()
+                )
+                .order_by(AnalyticsInsight.created_at.desc())
+                .limit(1)
+            )).first()
+            if cached is not None:
+                metrics.incr("insights.cache_hits")
+                return json.loads(cached.data)
+
+            metrics.incr("insights.llm_calls")
+            data = await compute()
+
+            # Results for older comic sets are never read again
+            await session.exec(
+                delete(AnalyticsInsight).where(
+                    AnalyticsInsight.user_id == user_id,
+                    AnalyticsInsight.insight_type == insight_type,
+                    AnalyticsInsight.fingerprint.is_not(None)
+                )
+            )
+            session.add(AnalyticsInsight(
+                user_id=user_id,
+                insight_type=insight_type,
+                title="Cached LLM result",
+                description=f"{insight_type} result for comic set {key[:12]}",
+                data=json.dumps(data),
+                fingerprint=key,
+                expires_at=get_utc_now() + timedelta(seconds=self.ttl_seconds)
+            ))
+            await session.commit()
+            return data
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+# Global instance
+insight_cache = InsightCache()
+
+metrics.register_gauge("insights.inflight", lambda: len(insight_cache))
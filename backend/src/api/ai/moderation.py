@@ -0,0 +1,141 @@
+import os
+import re
+from typing import Dict, Optional
+
+from api.ai.llms import get_openai_llm
+from api.utils.metrics import metrics
+
+# Terms that tend to trip Stability AI content moderation.
+# Each entry is (risk weight, safe replacement). A replacement of None removes the term.
+FLAGGED_TERMS: Dict[str, tuple] = {
+    # High risk - almost always moderated
+    'nude': (0.9, None),
+    'naked': (0.9, None),
+    'erotic': (0.9, None),
+    'explicit': (0.9, None),
+    'gore': (0.9, None),
+    'sexy': (0.6, 'stylish'),
+    # Medium risk
+    'blood': (0.5, 'red liquid'),
+    'bloody': (0.5, 'battered'),
+    'murder': (0.5, 'conflict'),
+    'kill': (0.5, 'defeat'),
+    'violence': (0.4, 'action'),
+    'violent': (0.4, 'dynamic'),
+    'death': (0.3, 'ending'),
+    'drug': (0.4, None),
+    # Low risk - only a problem in combination
+    'weapon': (0.2, 'tool'),
+    'gun': (0.2, 'device'),
+    'knife': (0.2, 'blade'),
+    'sword': (0.1, 'blade'),
+    'fight': (0.1, 'confrontation'),
+    'battle': (0.1, 'encounter'),
+    'war': (0.2, 'conflict'),
+    'adult': (0.2, None),
+    'alcohol': (0.2, None),
+    'smoking': (0.2, None),
+    'cigarette': (0.2, None),
+    'beer': (0.1, None),
+    'wine': (0.1, None),
+    'hate': (0.2, None),
+    'racism': (0.3, None),
+    'discrimination': (0.2, None),
+    'offensive': (0.2, None),
+    'disturbing': (0.2, None),
+    'political': (0.2, None),
+    'religion': (0.1, None),
+    'religious': (0.1, None),
+    'scary': (0.05, 'mysterious'),
+    'horror': (0.05, 'suspense'),
+    'nightmare': (0.05, 'dream'),
+}
+
+# Prompts scoring at or above these thresholds are sanitized / rewritten before being sent
+SANITIZE_THRESHOLD = float(os.environ.get("PROMPT_SANITIZE_THRESHOLD", "0.35"))
+REWRITE_THRESHOLD = float(os.environ.get("PROMPT_REWRITE_THRESHOLD", "0.85"))
+# Terms at or above this weight are the ones Stability practically always rejects (the blocklist)
+BLOCKLIST_WEIGHT = 0.9
+
+
+class PromptModerator:
+    """
+    Scores image prompts for moderation risk and makes them safe before they reach Stability AI.
+    All flagged terms are matched by a single precompiled alternation regex.
+    """
+
+    def __init__(self, terms: Dict[str, tuple] = FLAGGED_TERMS):
+        self.weights = {term: weight for term, (weight, _) in terms.items()}
+        self.replacements = {term: replacement or '' for term, (_, replacement) in terms.items()}
+        # Longest terms first so e.g. 'bloody' wins over 'blood'
+        alternation = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b({alternation})\b", re.IGNORECASE)
+        blocked = "|".join(re.escape(term) for term, weight in self.weights.items() if weight >= BLOCKLIST_WEIGHT)
+        self.blocklist_pattern = re.compile(rf"\b({blocked})\b", re.IGNORECASE)
+
+    def score(self, prompt: str) -> float:
+        """Moderation risk in [0, 1] - combines the weight of every flagged term occurrence"""
+        safe_probability = 1.0
+        for match in self.pattern.finditer(prompt or ""):
+            safe_probability *= 1.0 - self.weights[match.group(1).lower()]
+        return round(1.0 - safe_probability, 4)
+
+    def sanitize(self, prompt: str) -> str:
+        """Replace (or drop) every flagged term in one pass"""
+        sanitized = self.pattern.sub(lambda match: self.replacements[match.group(1).lower()], prompt)
+        return " ".join(sanitized.split())
+
+    async def rewrite(self, prompt: str) -> Optional[str]:
+        """Ask the LLM to rewrite a high-risk prompt once. Returns None if the rewrite fails."""
+        try:
+            llm = get_openai_llm()
+            response = await llm.ainvoke([
+                ("system",
+                 "You rewrite image generation prompts so they pass strict content moderation. "
+                 "Keep the characters, setting, composition, art style and mood. Replace nudity, gore, "
+                 "graphic violence and drugs with tasteful, family-friendly equivalents. "
+                 "Return only the rewritten prompt, at most 2000 characters."),
+                ("human", prompt)
+            ])
+            rewritten = (response.content or "").strip()
+            return rewritten or None
+        except Exception as e:
+            print(f"⚠️ Prompt rewrite failed, falling back to sanitization: {e}")
+            return None
+
+    async def prepare(self, prompt: str) -> str:
+        """
+        Moderation stage run before generate_image_from_prompt:
+        - low risk prompts are sent unchanged
+        - medium risk prompts are sanitized with the replacement map
+        - high risk prompts are rewritten once by the LLM (and sanitized as a safety net)
+        """
+        # Local import: services imports this module
+        from api.ai.services import validate_and_clean_prompt
+
+        metrics.incr("moderation.prompts_checked")
+        risk = self.score(prompt)
+        if risk < SANITIZE_THRESHOLD:
+            return prompt
+
+        original = prompt
+        if risk >= REWRITE_THRESHOLD:
+            rewritten = await self.rewrite(prompt)
+            if rewritten:
+                metrics.incr("moderation.prompts_rewritten")
+                prompt = rewritten
+            else:
+                metrics.incr("moderation.rewrite_failures")
+
+        # The LLM's output gets the same checks as any prompt: flagged terms, then Stability's length/content rules
+        cleaned = validate_and_clean_prompt(self.sanitize(prompt))
+        metrics.incr("moderation.prompts_sanitized")
+        # Only a prompt with a blocklisted term would certainly have come back as a moderated placeholder
+        if self.blocklist_pattern.search(original) and not self.blocklist_pattern.search(cleaned):
+            metrics.incr("moderation.round_trips_saved")
+        print(f"🛡️ Prompt moderation: risk {risk:.2f}, sent cleaned prompt ({len(cleaned)} chars)")
+        return cleaned
+
+
+# Global instance
+prompt_moderator = PromptModerator()
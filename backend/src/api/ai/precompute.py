@@ -0,0 +1,188 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, update, delete, func
+
+from api.db import engine, async_engine, async_session_factory, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from api.chat.models import ComicsPage, WorldStats
+from api.ai.analyses import AnalyticsService, InsightPrecomputeJob
+from api.utils.metrics import metrics, cached_gauge
+
+# Insights are precomputed each time a user's comic count reaches a multiple of this (when insights_available flips)
+PRECOMPUTE_EVERY_COMICS = int(os.environ.get("INSIGHT_PRECOMPUTE_EVERY_COMICS", "5"))
+PRECOMPUTE_CONCURRENCY = int(os.environ.get("INSIGHT_PRECOMPUTE_CONCURRENCY", "2"))
+# Jobs only start while the async pool is less busy than this, so request traffic always comes first
+PRECOMPUTE_MAX_POOL_UTILIZATION = float(os.environ.get("INSIGHT_PRECOMPUTE_MAX_POOL_UTILIZATION", "0.5"))
+PRECOMPUTE_MAX_ATTEMPTS = int(os.environ.get("INSIGHT_PRECOMPUTE_MAX_ATTEMPTS", "3"))
+PRECOMPUTE_RETRY_SECONDS = float(os.environ.get("INSIGHT_PRECOMPUTE_RETRY_SECONDS", "60"))
+PRECOMPUTE_POLL_SECONDS = float(os.environ.get("INSIGHT_PRECOMPUTE_POLL_SECONDS", "30"))
+# A claimed job is hidden from other workers for this long; if we crash it becomes due again
+PRECOMPUTE_LEASE_SECONDS = 600
+
+
+def enqueue_insight_precompute(session: Session, comic: ComicsPage) -> bool:
+    """
+    Queue the precomputation of the comic owner's insights when the new comic crosses a threshold
+    (caller commits, after record_comic_added). Returns whether a job was queued.
+    """
+    total = session.exec(select(func.sum(WorldStats.total_comics)).where(WorldStats.user_id == comic.user_id)).one()
+    if not total or total % PRECOMPUTE_EVERY_COMICS:
+        return False
+    statement = insert(InsightPrecomputeJob).values(user_id=comic.user_id, requested_at=datetime.utcnow())
+    # A job that is already queued or running is only marked as requested again (see _mark_done)
+    session.exec(statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"requested_at": statement.excluded.requested_at}
+    ))
+    metrics.incr("insights.precompute_queued")
+    return True
+
+
+def pool_utilization() -> float:
+    return async_engine.pool.checkedout() / (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+
+class InsightPrecomputer:
+    """
+    Runs queued insight precomputations in the background with bounded concurrency, when the server is idle.
+    Results land in the insight cache, so the analytics endpoints answer from it without an LLM call.
+    """
+
+    def __init__(self, concurrency: int = PRECOMPUTE_CONCURRENCY):
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        print(f"🧠 Insight precomputer started (concurrency {self.concurrency})")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        print("🧠 Insight precomputer stopped")
+
+    def notify(self) -> None:
+        """Wake the precomputer right away instead of waiting for the next poll"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                if pool_utilization() < PRECOMPUTE_MAX_POOL_UTILIZATION:
+                    jobs = await asyncio.to_thread(self._claim_due, self.concurrency)
+                    if jobs:
+                        await asyncio.gather(*(self._precompute(*job) for job in jobs))
+                        continue
+                else:
+                    metrics.incr("insights.precompute_deferred")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Insight precomputer loop error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=PRECOMPUTE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim_due(self, limit: int) -> List[Tuple[int, int, datetime, int]]:
+        """Lease due jobs so concurrent workers never precompute the same user twice"""
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            rows = session.exec(
+                select(InsightPrecomputeJob)
+                .where(InsightPrecomputeJob.next_attempt_at <= now)
+                .order_by(InsightPrecomputeJob.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            ).all()
+            jobs = [(row.id, row.user_id, row.requested_at, row.attempts) for row in rows]
+            for row in rows:
+                row.next_attempt_at = now + timedelta(seconds=PRECOMPUTE_LEASE_SECONDS)
+                session.add(row)
+            session.commit()
+        return jobs
+
+    async def _precompute(self, job_id: int, user_id: int, requested_at: datetime, attempts: int) -> None:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                # The same calls (and so the same cache keys) as the default recommendations and weekly insight views
+                async with async_session_factory() as session:
+                    await AnalyticsService.generate_comic_recommendations(session, user_id)
+                    try:
+                        await AnalyticsService.generate_weekly_insight(session, user_id)
+                    except ValueError:
+                        pass  # no comics this week
+                metrics.incr("insights.precomputed")
+                await asyncio.to_thread(self._mark_done, job_id, requested_at)
+            except Exception as e:
+                metrics.incr("insights.precompute_failures")
+                print(f"⚠️ Insight precompute for user {user_id} failed (attempt {attempts + 1}): {e}")
+                await asyncio.to_thread(self._mark_failed, job_id, attempts + 1, str(e))
+            finally:
+                self.in_flight -= 1
+
+    def _mark_done(self, job_id: int, requested_at: datetime) -> None:
+        with Session(engine) as session:
+            done = session.exec(
+                delete(InsightPrecomputeJob)
+                .where(InsightPrecomputeJob.id == job_id, InsightPrecomputeJob.requested_at == requested_at)
+            ).rowcount
+            if not done:
+                # Requested again while running: the new comics need another pass
+                session.exec(
+                    update(InsightPrecomputeJob)
+                    .where(InsightPrecomputeJob.id == job_id)
+                    .values(attempts=0, last_error=None, next_attempt_at=datetime.utcnow())
+                )
+            session.commit()
+        if not done:
+            self.notify()
+
+    def _mark_failed(self, job_id: int, attempts: int, error: str) -> None:
+        with Session(engine) as session:
+            if attempts >= PRECOMPUTE_MAX_ATTEMPTS:
+                # The endpoints still compute on demand
+                session.exec(delete(InsightPrecomputeJob).where(InsightPrecomputeJob.id == job_id))
+                metrics.incr("insights.precompute_abandoned")
+            else:
+                session.exec(
+                    update(InsightPrecomputeJob)
+                    .where(InsightPrecomputeJob.id == job_id)
+                    .values(
+                        attempts=attempts,
+                        last_error=error[:1000],
+                        next_attempt_at=datetime.utcnow() + timedelta(seconds=PRECOMPUTE_RETRY_SECONDS * 2 ** (attempts - 1))
+                    )
+                )
+            session.commit()
+
+
+def pending_precompute_count() -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count(InsightPrecomputeJob.id))).one()
+
+
+# Global instance
+insight_precomputer = InsightPrecomputer()
+metrics.register_gauge("insights.precompute_in_flight", lambda: insight_precomputer.in_flight)
+metrics.register_gauge("insights.precompute_queue_depth", cached_gauge(pending_precompute_count))
@@ -0,0 +1,178 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import Date, cast, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, func
+
+from api.db import engine
+from api.chat.models import ComicsPage
+from api.auth.models import User
+from api.ai.analyses import ComicDailyRollup, AnalyticsRollupState
+from api.utils.metrics import metrics
+from api.utils.scheduler import scheduler
+
+ROLLUP_BACKFILL_BATCH_SIZE = int(os.environ.get("ROLLUP_BACKFILL_BATCH_SIZE", "5000"))
+ROLLUP_BACKFILL_SECONDS = float(os.environ.get("ROLLUP_BACKFILL_SECONDS", "30"))
+# Each run of the job stops starting new batches after this long; the next run resumes where it stopped
+ROLLUP_BACKFILL_RUN_SECONDS = float(os.environ.get("ROLLUP_BACKFILL_RUN_SECONDS", "10"))
+# The rollups are only trusted once they have matched the comics this long after the backfill completed,
+# so comics saved (or deleted) by instances still running without the hooks during a rollout get repaired
+ROLLUP_VERIFY_AFTER_SECONDS = float(os.environ.get("ROLLUP_VERIFY_AFTER_SECONDS", "3600"))
+ROLLUP_REPAIR_BATCH_SIZE = int(os.environ.get("ROLLUP_REPAIR_BATCH_SIZE", "100"))
+
+ROLLUP_KEY = ["user_id", "world_type", "genre", "art_style", "day"]
+
+
+def _upsert_rollups(session: Session, comics, sign: int) -> None:
+    """Add (sign=1) or subtract (sign=-1) the comics whose ids `comics` selects (a subquery or a list), in one statement"""
+    key = [
+        ComicsPage.user_id,
+        ComicsPage.world_type,
+        func.lower(func.trim(ComicsPage.genre)),
+        func.lower(func.trim(ComicsPage.art_style)),
+        cast(ComicsPage.created_at, Date)
+    ]
+    grouped = (
+        select(
+            *key,
+            sign * func.count(ComicsPage.id),
+            sign * func.coalesce(func.sum(func.length(ComicsPage.concept)), 0),
+            func.max(ComicsPage.created_at)
+        )
+        .where(ComicsPage.id.in_(comics))
+        .group_by(*key)
+    )
+    statement = insert(ComicDailyRollup).from_select(
+        ROLLUP_KEY + ["comics", "concept_chars", "last_created_at"], grouped
+    )
+    statement = statement.on_conflict_do_update(
+        constraint="uq_comicdailyrollup_key",
+        set_={
+            "comics": ComicDailyRollup.comics + statement.excluded.comics,
+            "concept_chars": ComicDailyRollup.concept_chars + statement.excluded.concept_chars,
+            "last_created_at": func.greatest(ComicDailyRollup.last_created_at, statement.excluded.last_created_at)
+                if sign > 0 else ComicDailyRollup.last_created_at
+        }
+    )
+    session.exec(statement)
+
+
+def record_comic_rollup(session: Session, comic: ComicsPage) -> None:
+    """Count a new comic in its day's rollup (caller commits)"""
+    _upsert_rollups(session, [comic.id], 1)
+
+
+def record_comics_rollup_removed(session: Session, comics) -> None:
+    """
+    Take the comics about to be deleted (a subquery of ids) out of their rollups (caller commits).
+    While the backfill runs, only comics it has already counted (or newer than it) are subtracted.
+    """
+    # FOR SHARE: a backfill batch never runs between reading its progress and deleting the comics
+    state = session.exec(select(AnalyticsRollupState).with_for_update(read=True)).first()
+    if state is None:
+        return
+    if not state.completed_at:
+        comics = (
+            select(ComicsPage.id)
+            .where(ComicsPage.id.in_(comics))
+            .where(or_(ComicsPage.id <= state.backfilled_id, ComicsPage.id > state.high_water_id))
+        )
+    _upsert_rollups(session, comics, -1)
+
+
+def backfill_rollups(batch_size: int = ROLLUP_BACKFILL_BATCH_SIZE) -> int:
+    """
+    Count existing comics into the rollups in id batches, one transaction per batch, so an interrupted
+    backfill resumes from the last committed batch, then verify them until they are trusted.
+    Returns the number of comic ids covered by this run.
+    """
+    covered = 0
+    verify = False
+    started = time.monotonic()
+    while time.monotonic() - started < ROLLUP_BACKFILL_RUN_SECONDS:
+        with Session(engine) as session:
+            # SKIP LOCKED: another worker is running a batch (or a deletion holds the row), try again next run
+            state = session.exec(select(AnalyticsRollupState).with_for_update(skip_locked=True)).first()
+            if state is None or state.completed_at:
+                verify = state is not None and not state.verified_at
+                break
+            start, end = state.backfilled_id, min(state.backfilled_id + batch_size, state.high_water_id)
+            _upsert_rollups(session, select(ComicsPage.id).where(ComicsPage.id > start, ComicsPage.id <= end), 1)
+            state.backfilled_id = end
+            if end >= state.high_water_id:
+                state.completed_at = datetime.utcnow()
+            session.add(state)
+            session.commit()
+            covered += end - start
+            if state.completed_at:
+                print(f"📊 Analytics rollup backfill complete (comics up to id {end})")
+                verify = True
+                break
+
+    metrics.incr("rollups.backfilled_ids", covered)
+    if verify:
+        verify_rollups()
+    return covered
+
+
+def _mismatched_users(session: Session, limit: int) -> List[int]:
+    """Users whose rollups do not add up to their number of comics"""
+    comics = select(ComicsPage.user_id, func.count(ComicsPage.id).label("comics")).group_by(ComicsPage.user_id).subquery()
+    rolled = (
+        select(ComicDailyRollup.user_id, func.sum(ComicDailyRollup.comics).label("comics"))
+        .group_by(ComicDailyRollup.user_id)
+        .subquery()
+    )
+    query = (
+        select(func.coalesce(comics.c.user_id, rolled.c.user_id))
+        .select_from(comics.join(rolled, comics.c.user_id == rolled.c.user_id, full=True))
+        .where(func.coalesce(comics.c.comics, 0) != func.coalesce(rolled.c.comics, 0))
+        .limit(limit)
+    )
+    return list(session.exec(query).all())
+
+
+def rebuild_user_rollups(session: Session, user_id: int) -> None:
+    """Recount a user's rollups from their comics (caller commits)"""
+    # FOR UPDATE conflicts with the key-share lock of comic inserts: none of the user's comics is saved meanwhile
+    session.exec(select(User.id).where(User.id == user_id).with_for_update())
+    session.exec(ComicDailyRollup.__table__.delete().where(ComicDailyRollup.user_id == user_id))
+    _upsert_rollups(session, select(ComicsPage.id).where(ComicsPage.user_id == user_id), 1)
+
+
+def verify_rollups(batch_size: int = ROLLUP_REPAIR_BATCH_SIZE) -> int:
+    """
+    Catch-up pass after the backfill: rebuild the rollups of users whose totals disagree with their comics,
+    one transaction per user, and mark the rollups verified once none do after the rollout window.
+    Returns the number of users repaired.
+    """
+    with Session(engine) as session:
+        user_ids = _mismatched_users(session, batch_size)
+
+    for user_id in user_ids:
+        with Session(engine) as session:
+            rebuild_user_rollups(session, user_id)
+            session.commit()
+    if user_ids:
+        print(f"📊 Rebuilt analytics rollups of {len(user_ids)} users that did not match their comics")
+        metrics.incr("rollups.repaired_users", len(user_ids))
+        return len(user_ids)
+
+    with Session(engine) as session:
+        state = session.exec(
+            select(AnalyticsRollupState)
+            .where(AnalyticsRollupState.completed_at <= func.now() - timedelta(seconds=ROLLUP_VERIFY_AFTER_SECONDS))
+            .with_for_update(skip_locked=True)
+        ).first()
+        if state is not None and not state.verified_at:
+            state.verified_at = datetime.utcnow()
+            session.add(state)
+            session.commit()
+            print("📊 Analytics rollups verified against the comics")
+    return 0
+
+
+scheduler.add("rollup_backfill", ROLLUP_BACKFILL_SECONDS, backfill_rollups)
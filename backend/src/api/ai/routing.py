@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 import json
 
-from api.db import get_session
+from api.db import get_async_session, get_async_read_session
 from api.auth.models import User
 from api.ai.analyses import (
     AnalyticsService,
+    AnalyticsBreakdown,
     AnalyticsEntryCreate,
     AnalyticsSummary,
     WeeklyInsight,
@@ -19,20 +22,57 @@ from api.ai.analyses import (
     ComicRecommendationsResponse,
     DigestPeriod
 )
-from api.chat.models import WorldType, ComicsPage
+from api.chat.models import WorldType, ComicsPage, WorldStats
+from api.chat.versions import data_versions
+from api.utils.consistency import recently_wrote
+from api.utils.pagination import page_limit
+from api.utils.response_cache import response_cache
 
-router = APIRouter()
+
+class AnalyticsCacheRoute(APIRoute):
+    """
+    GET /analytics/... routes of a user answer from the response cache while the user's data version is unchanged,
+    with a strong ETag (304 on revalidation). Keys also carry today's date: the weekly/monthly periods and the
+    30-day time series start from it, so a response never outlives the day it was computed for.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if "GET" not in self.methods or "/analytics/" not in self.path or "user_id" not in self.param_convertors:
+            return handler
+
+        async def cached_handler(request: Request) -> Response:
+            try:
+                user_id = int(request.path_params["user_id"])
+            except ValueError:
+                return await handler(request)  # 422 from the route's own validation
+            version = await data_versions.get(user_id, fresh=recently_wrote(request))
+            # Same clock as AnalyticsService's period start dates
+            key = f"{request.url.path}?{sorted(request.query_params.multi_items())}@{version}@{datetime.now().date()}"
+            entry = response_cache.get(key)
+            if entry is None:
+                response = await handler(request)
+                if response.status_code != status.HTTP_200_OK or not hasattr(response, "body"):
+                    return response
+                entry = response_cache.build(response.body, response.media_type)
+                response_cache.put(key, entry)
+            return entry.to_response(request)
+
+        return cached_handler
+
+
+router = APIRouter(route_class=AnalyticsCacheRoute)
 
 @router.get("/analytics/summary/{user_id}", response_model=AnalyticsSummary)
 async def get_analytics_summary(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get comprehensive analytics summary for a specific user based on existing comics, optionally filtered by world type"""
     try:
         # Check if user exists
-        user = session.exec(select(User).where(User.id == user_id)).first()
+        user = (await session.exec(select(User).where(User.id == user_id))).first()
         if not user:
             # Return a default summary if user does not exist
             return AnalyticsSummary(
@@ -44,7 +84,7 @@ async def get_analytics_summary(
                 recent_prompts=[],
                 insights_available=False
             )
-        summary = AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
+        summary = await AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
         return summary
     except Exception as e:
         # Always return a valid AnalyticsSummary on error
@@ -62,7 +102,7 @@ async def get_analytics_summary(
 async def get_weekly_insight(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get weekly insight based on a specific user's comic generation patterns, optionally filtered by world type"""
     try:
@@ -84,7 +124,7 @@ async def get_insight_by_period(
     user_id: int,
     period: DigestPeriod = DigestPeriod.WEEKLY,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get insight for a specific user based on period (weekly, monthly, all_time) and optionally filtered by world type"""
     try:
@@ -105,18 +145,18 @@ async def get_insight_by_period(
 async def generate_pattern_insight(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Generate pattern analysis insight using LLM for a specific user, optionally filtered by world type"""
     try:
         # Get user's recent comics for analysis
-        recent_comics = session.exec(
+        recent_comics = (await session.exec(
             select(ComicsPage)
             .where(ComicsPage.user_id == user_id)
             .where(ComicsPage.world_type == world_type if world_type else True)
             .order_by(ComicsPage.created_at.desc())
             .limit(20)
-        ).all()
+        )).all()
         
         if not recent_comics:
             raise HTTPException(
@@ -126,7 +166,9 @@ async def generate_pattern_insight(
         
         # Analyze concept patterns
         concepts = [comic.concept for comic in recent_comics]
-        prompt_analysis = await AnalyticsService.analyze_prompt_themes(concepts)
+        prompt_analysis = await AnalyticsService.analyze_prompt_themes(
+            user_id, concepts, scope=world_type.value if world_type else "all"
+        )
         
         # Create insight data
         insight_data = {
@@ -141,7 +183,7 @@ async def generate_pattern_insight(
         }
         
         # Save insight to database
-        insight = AnalyticsService.save_insight(
+        insight = await AnalyticsService.save_insight(
             session=session,
             user_id=user_id,
             insight_type="pattern_analysis",
@@ -173,26 +215,19 @@ async def generate_comic_recommendations(
     user_id: int,
     world_type: Optional[WorldType] = None,
     limit: int = 5,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Generate comic recommendations based on user's genre, art style, and prompt patterns"""
     try:
         print(f"🔍 DEBUG ROUTER: Starting comic recommendations for user {user_id}, world_type: {world_type}")
         
         # Check if user has comics
+        query = select(ComicsPage.id).where(ComicsPage.user_id == user_id)
         if world_type:
-            total_comics = session.exec(
-                select(ComicsPage).where(
-                    ComicsPage.user_id == user_id,
-                    ComicsPage.world_type == world_type
-                )
-            ).all()
-        else:
-            total_comics = session.exec(
-                select(ComicsPage).where(ComicsPage.user_id == user_id)
-            ).all()
+            query = query.where(ComicsPage.world_type == world_type)
+        has_comics = (await session.exec(query.limit(1))).first()
         
-        if not total_comics:
+        if not has_comics:
             world_name = world_type.value if world_type else "any world"
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -225,7 +260,7 @@ async def generate_comic_recommendations(
         title = f"Your Comic Recommendations - {world_type.value.replace('_', ' ').title()}" if world_type else "Your Comic Recommendations"
         description = f"AI-generated comic recommendations based on your creation patterns in {world_type.value.replace('_', ' ')}" if world_type else "AI-generated comic recommendations based on your creation patterns across all worlds"
         
-        AnalyticsService.save_insight(
+        await AnalyticsService.save_insight(
             session=session,
             user_id=user_id,
             insight_type=insight_type,
@@ -249,7 +284,7 @@ async def generate_comic_recommendations(
 async def generate_imagination_world_comic_recommendations(
     user_id: int,
     limit: int = 5,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Generate comic recommendations based on user's patterns in Imagination World only"""
     try:
@@ -266,7 +301,7 @@ async def generate_imagination_world_comic_recommendations(
 async def generate_mind_world_comic_recommendations(
     user_id: int,
     limit: int = 5,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Generate comic recommendations based on user's patterns in Mind World only"""
     try:
@@ -283,7 +318,7 @@ async def generate_mind_world_comic_recommendations(
 async def generate_dream_world_comic_recommendations(
     user_id: int,
     limit: int = 5,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Generate comic recommendations based on user's patterns in Dream World only"""
     try:
@@ -301,7 +336,7 @@ async def generate_dream_world_comic_recommendations(
 async def generate_psychological_assumptions_compat(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Compatibility endpoint - redirects to comic recommendations"""
     return await generate_comic_recommendations(user_id, world_type, 5, session)
@@ -310,11 +345,11 @@ async def generate_psychological_assumptions_compat(
 async def get_user_insights(
     user_id: int,
     insight_type: Optional[str] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get all insights for a specific user"""
     try:
-        insights = AnalyticsService.get_user_insights(session, user_id, insight_type)
+        insights = await AnalyticsService.get_user_insights(session, user_id, insight_type)
         
         insight_responses = []
         for insight in insights:
@@ -340,30 +375,93 @@ async def get_user_insights(
             detail=f"Failed to get insights: {str(e)}"
         )
 
+def genre_chart(summary: AnalyticsSummary, world_type: Optional[WorldType]) -> dict:
+    # Format for bar chart
+    return {
+        "success": True,
+        "chart_type": "bar",
+        "title": "Your Genre Preferences",
+        "world_type": world_type.value if world_type else "all",
+        "data": {
+            "labels": [genre.genre for genre in summary.genre_distribution],
+            "data": [genre.count for genre in summary.genre_distribution],
+            "percentages": [genre.percentage for genre in summary.genre_distribution]
+        }
+    }
+
+def art_style_chart(summary: AnalyticsSummary, world_type: Optional[WorldType]) -> dict:
+    # Format for pie chart
+    return {
+        "success": True,
+        "chart_type": "pie",
+        "title": "Your Art Style Preferences",
+        "world_type": world_type.value if world_type else "all",
+        "data": {
+            "labels": [style.art_style for style in summary.art_style_distribution],
+            "data": [style.count for style in summary.art_style_distribution],
+            "percentages": [style.percentage for style in summary.art_style_distribution]
+        }
+    }
+
+def world_chart(summary: AnalyticsSummary) -> dict:
+    # Format for pie chart (of an unfiltered summary)
+    return {
+        "success": True,
+        "chart_type": "pie",
+        "title": "Your World Preferences",
+        "data": {
+            "labels": [world.world_type.value for world in summary.world_distribution],
+            "data": [world.count for world in summary.world_distribution],
+            "percentages": [world.percentage for world in summary.world_distribution]
+        }
+    }
+
+def time_series_chart(summary: AnalyticsSummary, world_type: Optional[WorldType]) -> dict:
+    # Format for line chart
+    return {
+        "success": True,
+        "chart_type": "line",
+        "title": "Your Comic Generation Trends",
+        "world_type": world_type.value if world_type else "all",
+        "data": {
+            "labels": [day.date for day in summary.time_series],
+            "data": [day.count for day in summary.time_series],
+            "genres": [day.genres for day in summary.time_series],
+            "art_styles": [day.art_styles for day in summary.time_series]
+        }
+    }
+
+def world_overview(summary: AnalyticsSummary) -> dict:
+    return {
+        "total_comics": summary.total_entries,
+        "top_genre": summary.genre_distribution[0].genre if summary.genre_distribution else "None",
+        "top_art_style": summary.art_style_distribution[0].art_style if summary.art_style_distribution else "None"
+    }
+
+def analytics_overview(user_id: int, breakdown: AnalyticsBreakdown) -> dict:
+    """Per-world and overall totals/favorites, all from one breakdown"""
+    all_summary = breakdown.summary()
+    return {
+        "user_id": user_id,
+        "total_comics": all_summary.total_entries,
+        "worlds": {world.value: world_overview(breakdown.summary(world)) for world in WorldType},
+        "overall_stats": {
+            "top_genre": all_summary.genre_distribution[0].genre if all_summary.genre_distribution else "None",
+            "top_art_style": all_summary.art_style_distribution[0].art_style if all_summary.art_style_distribution else "None",
+            "insights_available": all_summary.insights_available
+        }
+    }
+
 @router.get("/analytics/charts/genre-distribution/{user_id}")
 async def get_genre_chart_data(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get genre distribution data for chart rendering for a specific user, optionally filtered by world type"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
-        
-        # Format for bar chart
-        chart_data = {
-            "labels": [genre.genre for genre in summary.genre_distribution],
-            "data": [genre.count for genre in summary.genre_distribution],
-            "percentages": [genre.percentage for genre in summary.genre_distribution]
-        }
-        
-        return {
-            "success": True,
-            "chart_type": "bar",
-            "title": "Your Genre Preferences",
-            "world_type": world_type.value if world_type else "all",
-            "data": chart_data
-        }
+        summary = await AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
+        return genre_chart(summary, world_type)
         
     except Exception as e:
         raise HTTPException(
@@ -375,26 +473,12 @@ async def get_genre_chart_data(
 async def get_art_style_chart_data(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get art style distribution data for chart rendering for a specific user, optionally filtered by world type"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
-        
-        # Format for pie chart
-        chart_data = {
-            "labels": [style.art_style for style in summary.art_style_distribution],
-            "data": [style.count for style in summary.art_style_distribution],
-            "percentages": [style.percentage for style in summary.art_style_distribution]
-        }
-        
-        return {
-            "success": True,
-            "chart_type": "pie",
-            "title": "Your Art Style Preferences",
-            "world_type": world_type.value if world_type else "all",
-            "data": chart_data
-        }
+        summary = await AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
+        return art_style_chart(summary, world_type)
         
     except Exception as e:
         raise HTTPException(
@@ -405,25 +489,12 @@ async def get_art_style_chart_data(
 @router.get("/analytics/charts/world-distribution/{user_id}")
 async def get_world_distribution_chart_data(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get world distribution data for chart rendering for a specific user"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(session, user_id)
-        
-        # Format for pie chart
-        chart_data = {
-            "labels": [world.world_type.value for world in summary.world_distribution],
-            "data": [world.count for world in summary.world_distribution],
-            "percentages": [world.percentage for world in summary.world_distribution]
-        }
-        
-        return {
-            "success": True,
-            "chart_type": "pie",
-            "title": "Your World Preferences",
-            "data": chart_data
-        }
+        summary = await AnalyticsService.get_user_analytics_summary(session, user_id)
+        return world_chart(summary)
         
     except Exception as e:
         raise HTTPException(
@@ -435,27 +506,12 @@ async def get_world_distribution_chart_data(
 async def get_time_series_chart_data(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get time series data for trend chart rendering for a specific user, optionally filtered by world type"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
-        
-        # Format for line chart
-        chart_data = {
-            "labels": [day.date for day in summary.time_series],
-            "data": [day.count for day in summary.time_series],
-            "genres": [day.genres for day in summary.time_series],
-            "art_styles": [day.art_styles for day in summary.time_series]
-        }
-        
-        return {
-            "success": True,
-            "chart_type": "line",
-            "title": "Your Comic Generation Trends",
-            "world_type": world_type.value if world_type else "all",
-            "data": chart_data
-        }
+        summary = await AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
+        return time_series_chart(summary, world_type)
         
     except Exception as e:
         raise HTTPException(
@@ -467,11 +523,11 @@ async def get_time_series_chart_data(
 async def check_insights_available(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Check if insights are available for a specific user (every 5 comics), optionally filtered by world type"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
+        summary = await AnalyticsService.get_user_analytics_summary(session, user_id, world_type)
         
         return {
             "insights_available": summary.insights_available,
@@ -490,11 +546,11 @@ async def check_insights_available(
 @router.get("/analytics/imagination-world/{user_id}")
 async def get_imagination_world_analytics(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get analytics summary for Imagination World comics only for a specific user"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(
+        summary = await AnalyticsService.get_user_analytics_summary(
             session, user_id, WorldType.IMAGINATION_WORLD
         )
         return {
@@ -510,11 +566,11 @@ async def get_imagination_world_analytics(
 @router.get("/analytics/mind-world/{user_id}")
 async def get_mind_world_analytics(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get analytics summary for Mind World comics only for a specific user"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(
+        summary = await AnalyticsService.get_user_analytics_summary(
             session, user_id, WorldType.MIND_WORLD
         )
         return {
@@ -530,11 +586,11 @@ async def get_mind_world_analytics(
 @router.get("/analytics/dream-world/{user_id}")
 async def get_dream_world_analytics(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get analytics summary for Dream World comics only for a specific user"""
     try:
-        summary = AnalyticsService.get_user_analytics_summary(
+        summary = await AnalyticsService.get_user_analytics_summary(
             session, user_id, WorldType.DREAM_WORLD
         )
         return {
@@ -551,52 +607,48 @@ async def get_dream_world_analytics(
 @router.get("/analytics/user/{user_id}/overview")
 async def get_user_analytics_overview(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get a comprehensive overview of user's analytics across all worlds"""
     try:
-        # Get analytics for each world
-        imagination_summary = AnalyticsService.get_user_analytics_summary(
-            session, user_id, WorldType.IMAGINATION_WORLD
-        )
-        mind_summary = AnalyticsService.get_user_analytics_summary(
-            session, user_id, WorldType.MIND_WORLD
-        )
-        dream_summary = AnalyticsService.get_user_analytics_summary(
-            session, user_id, WorldType.DREAM_WORLD
+        # One grouped pass for all worlds instead of a summary per world plus one overall
+        breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id)
+        return analytics_overview(user_id, breakdown)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get user analytics overview: {str(e)}"
         )
-        all_summary = AnalyticsService.get_user_analytics_summary(session, user_id)
-        
+
+@router.get("/analytics/dashboard/{user_id}")
+async def get_analytics_dashboard(
+    user_id: int,
+    world_type: Optional[WorldType] = None,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """
+    Everything the analytics screen shows in one round-trip: the summary, the four charts and the per-world
+    overview, all derived from a single grouped query over the user's comics
+    """
+    try:
+        breakdown = await AnalyticsService.get_user_analytics_breakdown(session, user_id)
+        summary = breakdown.summary(world_type)
         return {
             "user_id": user_id,
-            "total_comics": all_summary.total_entries,
-            "worlds": {
-                "imagination_world": {
-                    "total_comics": imagination_summary.total_entries,
-                    "top_genre": imagination_summary.genre_distribution[0].genre if imagination_summary.genre_distribution else "None",
-                    "top_art_style": imagination_summary.art_style_distribution[0].art_style if imagination_summary.art_style_distribution else "None"
-                },
-                "mind_world": {
-                    "total_comics": mind_summary.total_entries,
-                    "top_genre": mind_summary.genre_distribution[0].genre if mind_summary.genre_distribution else "None",
-                    "top_art_style": mind_summary.art_style_distribution[0].art_style if mind_summary.art_style_distribution else "None"
-                },
-                "dream_world": {
-                    "total_comics": dream_summary.total_entries,
-                    "top_genre": dream_summary.genre_distribution[0].genre if dream_summary.genre_distribution else "None",
-                    "top_art_style": dream_summary.art_style_distribution[0].art_style if dream_summary.art_style_distribution else "None"
-                }
+            "world_type": world_type.value if world_type else "all",
+            "summary": summary,
+            "charts": {
+                "genre_distribution": genre_chart(summary, world_type),
+                "art_style_distribution": art_style_chart(summary, world_type),
+                "world_distribution": world_chart(breakdown.summary()),
+                "time_series": time_series_chart(summary, world_type)
             },
-            "overall_stats": {
-                "top_genre": all_summary.genre_distribution[0].genre if all_summary.genre_distribution else "None",
-                "top_art_style": all_summary.art_style_distribution[0].art_style if all_summary.art_style_distribution else "None",
-                "insights_available": all_summary.insights_available
-            }
+            "overview": analytics_overview(user_id, breakdown)
         }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get user analytics overview: {str(e)}"
+            detail=f"Failed to get analytics dashboard: {str(e)}"
         )
 
 @router.get("/analytics/user/{user_id}/recent-activity")
@@ -604,14 +656,20 @@ async def get_user_recent_activity(
     user_id: int,
     world_type: Optional[WorldType] = None,
     limit: int = 10,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get user's recent comic creation activity"""
     try:
-        comics = AnalyticsService.get_user_comics_for_analytics(session, user_id, world_type)
+        comics = await AnalyticsService.get_user_recent_comics(session, user_id, world_type, page_limit(limit))
+        
+        # Maintained per-world counters instead of counting the comics
+        total_query = select(func.coalesce(func.sum(WorldStats.total_comics), 0)).where(WorldStats.user_id == user_id)
+        if world_type:
+            total_query = total_query.where(WorldStats.world_type == world_type)
+        total_comics = (await session.exec(total_query)).one()
         
         recent_activity = []
-        for comic in comics[:limit]:
+        for comic in comics:
             recent_activity.append({
                 "id": comic.id,
                 "title": comic.title,
@@ -627,7 +685,7 @@ async def get_user_recent_activity(
         return {
             "user_id": user_id,
             "world_type": world_type.value if world_type else "all",
-            "total_comics": len(comics),
+            "total_comics": total_comics,
             "recent_activity": recent_activity
         }
     except Exception as e:
@@ -640,13 +698,14 @@ async def get_user_recent_activity(
 async def get_user_creativity_score(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Calculate a creativity score based on user's comic diversity and patterns"""
     try:
-        comics = AnalyticsService.get_user_comics_for_analytics(session, user_id, world_type)
+        stats = await AnalyticsService.get_user_creativity_stats(session, user_id, world_type)
+        total_comics = stats.comics
         
-        if not comics:
+        if not total_comics:
             return {
                 "user_id": user_id,
                 "creativity_score": 0,
@@ -659,13 +718,10 @@ async def get_user_creativity_score(
                 "message": "No comics found for analysis"
             }
         
-        # Calculate diversity factors
-        unique_genres = len(set(comic.genre for comic in comics))
-        unique_art_styles = len(set(comic.art_style for comic in comics))
-        total_comics = len(comics)
-        
-        # Calculate concept complexity (average length of concepts)
-        avg_concept_length = sum(len(comic.concept) for comic in comics) / total_comics
+        # Diversity factors and concept complexity (average length of concepts)
+        unique_genres = stats.unique_genres
+        unique_art_styles = stats.unique_art_styles
+        avg_concept_length = float(stats.avg_concept_length or 0)
         
         # Calculate scores (0-100 scale)
         genre_diversity_score = min(unique_genres * 20, 100)  # 5+ genres = 100
@@ -709,39 +765,29 @@ async def get_user_creativity_score(
 async def debug_user_comics(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Debug endpoint to check what comics are available for a user"""
     try:
         print(f"🔍 DEBUG ENDPOINT: Checking comics for user {user_id}, world_type: {world_type}")
         
+        # Comics per world, grouped in Postgres
+        counts_query = (
+            select(ComicsPage.world_type, func.count(ComicsPage.id))
+            .where(ComicsPage.user_id == user_id)
+            .group_by(ComicsPage.world_type)
+        )
         if world_type:
-            comics = session.exec(
-                select(ComicsPage).where(
-                    ComicsPage.user_id == user_id,
-                    ComicsPage.world_type == world_type
-                ).order_by(ComicsPage.created_at.desc())
-            ).all()
-        else:
-            comics = session.exec(
-                select(ComicsPage).where(ComicsPage.user_id == user_id)
-                .order_by(ComicsPage.created_at.desc())
-            ).all()
-        
-        print(f"🔍 DEBUG ENDPOINT: Found {len(comics)} comics")
-        
-        # Group by world type
-        world_counts = {}
-        for comic in comics:
-            world = comic.world_type.value
-            if world not in world_counts:
-                world_counts[world] = 0
-            world_counts[world] += 1
+            counts_query = counts_query.where(ComicsPage.world_type == world_type)
+        world_counts = {world.value: comics for world, comics in (await session.exec(counts_query)).all()}
+        total_comics = sum(world_counts.values())
+        
+        print(f"🔍 DEBUG ENDPOINT: Found {total_comics} comics")
         
-        # Sample comics for each world
+        # Sample comics for each world: the 5 newest, one ORDER BY ... LIMIT per world
         sample_comics = {}
         for world in world_counts.keys():
-            world_comics = [c for c in comics if c.world_type.value == world]
+            world_comics = await AnalyticsService.get_user_recent_comics(session, user_id, WorldType(world), 5)
             sample_comics[world] = [
                 {
                     "id": comic.id,
@@ -752,13 +798,13 @@ async def debug_user_comics(
                     "is_favorite": comic.is_favorite,
                     "is_public": comic.is_public
                 }
-                for comic in world_comics[:5]  # First 5 comics
+                for comic in world_comics
             ]
         
         return {
             "user_id": user_id,
             "world_type_filter": world_type.value if world_type else "all",
-            "total_comics": len(comics),
+            "total_comics": total_comics,
             "world_counts": world_counts,
             "sample_comics": sample_comics,
             "debug_info": {
@@ -790,7 +836,7 @@ async def debug_user_comics(
 async def get_weekly_insight_compat(
     user_id: int,
     world_type: Optional[WorldType] = None,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     return await get_weekly_insight(user_id, world_type, session)
 
@@ -798,6 +844,6 @@ async def get_weekly_insight_compat(
 @router.post("/analytics/psychological-assumptions/imagination_world/{user_id}", response_model=CrossWorldPsychologicalAssumption)
 async def generate_imagination_world_psychological_assumptions_compat(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    return await generate_imagination_world_psychological_assumptions(user_id, session)
+    return await AnalyticsService.generate_psychological_assumptions(session, user_id, WorldType.IMAGINATION_WORLD)
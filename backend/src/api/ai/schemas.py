@@ -152,7 +152,10 @@ class WorldComicsRequest(BaseModel):
     world_type: WorldType
     page: int = 1
     per_page: int = 10
+    cursor: Optional[str] = None  # X-Next-Cursor of the previous page, replaces `page`
     favorites_only: bool = False
+    fields: Optional[str] = None  # Comma-separated fields to return instead of the defaults
+    include: Optional[str] = None  # Comma-separated fields to add to the defaults, e.g. "panels_data"
 
 class WorldStatsResponse(BaseModel):
     world_type: WorldType
@@ -8,7 +8,9 @@ from api.ai.schemas import (
     ScenarioSchema2, Dialogue, DetailedScenarioSchema, DetailedScenarioChapter
 )
 
+from api.ai.moderation import prompt_moderator
 from api.utils.image_utils import create_comic_sheet, add_dialogues_and_sfx_to_panel, extract_character_details
+from api.utils.metrics import metrics
 from dotenv import load_dotenv
 import asyncio
 import aiohttp
@@ -356,12 +358,15 @@ async def generate_image_from_prompt(session: aiohttp.ClientSession, prompt: str
             "seed": seed
         }
 
+        metrics.incr("stability.requests")
         # THIS IS YOUR ERROR LINE. IT MUST HAVE 8 SPACES IN FRONT OF IT.
         async with session.post(STABILITY_API_URL, headers=headers, json=payload, timeout=90) as response:
             # 12 spaces for the code inside this 'async with' block
             if response.status != 200:
                 error_text = await response.text()
                 print(f"❌ Stability AI async request failed with status {response.status}: {error_text}")
+                if response.status == 400 and "invalid_prompts" in error_text:
+                    metrics.incr("moderation.stability_rejections")
                 raise Exception(f"Stability AI request failed: {response.status}")
 
             data = await response.json()
@@ -575,6 +580,7 @@ async def generate_complete_comic(concept: str, genre: str = None, art_style: st
 
     async with aiohttp.ClientSession() as session:
         tasks = []
+        negative_prompts = []
         for i, frame in enumerate(scenario.frames):
             panel_number = i + 1
             # Get genre/art style info
@@ -670,13 +676,22 @@ async def generate_complete_comic(concept: str, genre: str = None, art_style: st
             negative_prompt = f"{base_negative}, {genre_specific_negative}" if genre_specific_negative else base_negative
 
             print(f"  - Panel {panel_number}: Preparing task for '{frame.description[:30]}...'")
+            negative_prompts.append(negative_prompt)
+
+        # Moderation stage: sanitize or rewrite risky prompts before they cost a Stability round-trip
+        full_image_prompts = list(await asyncio.gather(
+            *(prompt_moderator.prepare(image_prompt) for image_prompt in full_image_prompts)
+        ))
+
+        for i, image_prompt in enumerate(full_image_prompts):
+            panel_number = i + 1
             task = asyncio.create_task(
                 generate_image_from_prompt(
                     session=session,
                     prompt=image_prompt,
                     width=get_frame_dimensions(panel_number, len(scenario.frames))[0],
                     height=get_frame_dimensions(panel_number, len(scenario.frames))[1],
-                    negative_prompt=negative_prompt,
+                    negative_prompt=negative_prompts[i],
                     seed=global_image_seed
                 )
             )
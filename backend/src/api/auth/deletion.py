@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, update, delete, func
+
+from api.db import engine
+from api.auth.models import AccountDeletionJob, User
+from api.chat.models import ComicsPage, ComicCollection, ComicCollectionItem, DetailedScenario, WorldStats, UserDataVersion
+from api.chat.deletion import delete_comic_rows, delete_storage_objects
+from api.ai.analyses import AnalyticsEntry, AnalyticsInsight, ComicDailyRollup, ConceptDigest, InsightPrecomputeJob
+from api.storage.models import ImageUploadOutbox
+from api.storage.usage import delete_storage_usage
+from api.utils.scheduler import scheduler
+
+# Accounts with more comics than this are deleted in a background job
+ACCOUNT_DELETION_JOB_THRESHOLD = int(os.environ.get("ACCOUNT_DELETION_JOB_THRESHOLD", "200"))
+
+# Finished jobs can be polled for this long, then they are dropped
+ACCOUNT_DELETION_JOB_TTL_SECONDS = float(os.environ.get("ACCOUNT_DELETION_JOB_TTL_SECONDS", "3600"))
+# A running job belongs to its worker for this long; if that worker stops, another one resumes the job afterwards.
+# Must exceed the time a deletion takes, or a slow job is run twice (harmless: the second run finds nothing left).
+ACCOUNT_DELETION_JOB_LEASE_SECONDS = float(os.environ.get("ACCOUNT_DELETION_JOB_LEASE_SECONDS", "1800"))
+ACCOUNT_DELETION_RESUME_SECONDS = float(os.environ.get("ACCOUNT_DELETION_RESUME_SECONDS", "60"))
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+# Background jobs started by this worker
+_running_jobs: Set[asyncio.Task] = set()
+
+
+def count_user_comics(session: Session, user_id: int) -> int:
+    return session.exec(select(func.count(ComicsPage.id)).where(ComicsPage.user_id == user_id)).one()
+
+
+def delete_account_rows(user_id: int) -> Dict:
+    """Delete every row of a user with set-based statements in one transaction. Also returns the image URLs to remove."""
+    with Session(engine) as session:
+        # Items of the user's own collections (the ones pointing at the user's comics go with the comics)
+        collection_items_deleted = session.exec(
+            delete(ComicCollectionItem).where(
+                ComicCollectionItem.collection_id.in_(select(ComicCollection.id).where(ComicCollection.user_id == user_id))
+            )
+        ).rowcount
+        counts, image_urls = delete_comic_rows(session, user_id)
+        counts["collection_items_deleted"] += collection_items_deleted
+        counts["scenarios_deleted"] += session.exec(
+            delete(DetailedScenario).where(DetailedScenario.user_id == user_id)
+        ).rowcount
+        counts["collections_deleted"] = session.exec(
+            delete(ComicCollection).where(ComicCollection.user_id == user_id)
+        ).rowcount
+        counts["world_stats_deleted"] = session.exec(
+            delete(WorldStats).where(WorldStats.user_id == user_id)
+        ).rowcount
+        session.exec(delete(AnalyticsEntry).where(AnalyticsEntry.user_id == user_id))
+        session.exec(delete(AnalyticsInsight).where(AnalyticsInsight.user_id == user_id))
+        session.exec(delete(ComicDailyRollup).where(ComicDailyRollup.user_id == user_id))
+        session.exec(delete(InsightPrecomputeJob).where(InsightPrecomputeJob.user_id == user_id))
+        session.exec(delete(ConceptDigest).where(ConceptDigest.user_id == user_id))
+        session.exec(delete(UserDataVersion).where(UserDataVersion.user_id == user_id))
+        session.exec(delete(ImageUploadOutbox).where(ImageUploadOutbox.user_id == user_id))
+        delete_storage_usage(session, user_id)
+        session.exec(delete(User).where(User.id == user_id))
+        session.commit()
+
+    counts["image_urls"] = image_urls
+    return counts
+
+
+async def delete_account(user_id: int, username: str) -> Dict:
+    """Delete a user's rows, then their images from storage in batches"""
+    print(f"🗑️ Starting account deletion for user: {username} (ID: {user_id})")
+    counts = await asyncio.to_thread(delete_account_rows, user_id)
+    image_urls = counts.pop("image_urls")
+
+    # Storage goes last: if it fails we leave orphaned objects, never comics without images
+    images_deleted, errors = await delete_storage_objects(image_urls)
+
+    print(f"✅ Account deletion completed for user: {username} ({counts['comics_deleted']} comics, {images_deleted} images)")
+    return {
+        "user_id": user_id,
+        "username": username,
+        **counts,
+        "images_deleted": images_deleted,
+        "storage_cleanup_errors": errors
+    }
+
+
+def _create_job(user_id: int, username: str) -> Tuple[AccountDeletionJob, bool]:
+    """The account's new job, leased to this worker, or its already active one (created=False)"""
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        statement = insert(AccountDeletionJob).values(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            username=username,
+            status="running",
+            created_at=now,
+            lease_until=now + timedelta(seconds=ACCOUNT_DELETION_JOB_LEASE_SECONDS)
+        )
+        created = session.exec(statement.on_conflict_do_nothing(
+            index_elements=["user_id"],
+            index_where=text("status IN ('queued', 'running')")
+        )).rowcount
+        session.commit()
+        job = session.exec(
+            select(AccountDeletionJob)
+            .where(AccountDeletionJob.user_id == user_id, AccountDeletionJob.status.in_(ACTIVE_JOB_STATUSES))
+        ).first()
+        return job, bool(created)
+
+
+def _finish_job(job_id: str, summary: Optional[Dict], error: Optional[str]) -> None:
+    with Session(engine) as session:
+        session.exec(
+            update(AccountDeletionJob)
+            .where(AccountDeletionJob.id == job_id)
+            .values(
+                status="failed" if error else "completed",
+                deletion_summary=json.dumps(summary) if summary is not None else None,
+                error=error,
+                finished_at=datetime.utcnow(),
+                lease_until=None
+            )
+        )
+        session.commit()
+
+
+async def _run_job(job_id: str, user_id: int, username: str) -> None:
+    try:
+        summary = await delete_account(user_id, username)
+        await asyncio.to_thread(_finish_job, job_id, summary, None)
+    except Exception as e:
+        print(f"❌ Account deletion job {job_id} failed: {e}")
+        await asyncio.to_thread(_finish_job, job_id, None, str(e))
+
+
+async def start_deletion_job(user_id: int, username: str) -> Tuple[Dict, bool]:
+    """
+    Run delete_account in the background and return the job record. When the account already has an active
+    job, that one is returned with created=False and nothing is started.
+    """
+    job, created = await asyncio.to_thread(_create_job, user_id, username)
+    if created:
+        # Referenced so the task is not garbage collected before it finishes
+        task = asyncio.create_task(_run_job(job.id, user_id, username))
+        _running_jobs.add(task)
+        task.add_done_callback(_running_jobs.discard)
+    return job_record(job), created
+
+
+def _claim_stale_jobs() -> List[Tuple[str, int, str]]:
+    """Lease the active jobs whose worker stopped (restart, crash) and drop long finished ones"""
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.exec(
+            delete(AccountDeletionJob)
+            .where(AccountDeletionJob.finished_at < now - timedelta(seconds=ACCOUNT_DELETION_JOB_TTL_SECONDS))
+        )
+        rows = session.exec(
+            select(AccountDeletionJob)
+            .where(
+                AccountDeletionJob.status.in_(ACTIVE_JOB_STATUSES),
+                or_(AccountDeletionJob.lease_until.is_(None), AccountDeletionJob.lease_until < now)
+            )
+            .with_for_update(skip_locked=True)
+        ).all()
+        jobs = [(row.id, row.user_id, row.username) for row in rows]
+        for row in rows:
+            row.status = "running"
+            row.lease_until = now + timedelta(seconds=ACCOUNT_DELETION_JOB_LEASE_SECONDS)
+            session.add(row)
+        session.commit()
+    return jobs
+
+
+async def resume_deletion_jobs() -> int:
+    """
+    Finish the deletions interrupted by a stopped worker. Rows go in one transaction, so a resumed job either
+    deletes them all or finds them gone; only the storage cleanup of an interrupted job can be left incomplete.
+    """
+    jobs = await asyncio.to_thread(_claim_stale_jobs)
+    for job_id, user_id, username in jobs:
+        print(f"🔁 Resuming account deletion job {job_id} of {username}")
+        await _run_job(job_id, user_id, username)
+    return len(jobs)
+
+
+def job_record(job: AccountDeletionJob) -> Dict:
+    return {
+        "job_id": job.id,
+        "user_id": job.user_id,
+        "username": job.username,
+        "status": job.status,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "deletion_summary": json.loads(job.deletion_summary) if job.deletion_summary else None,
+        "error": job.error
+    }
+
+
+def get_deletion_job(session: Session, job_id: str, username: str) -> Optional[Dict]:
+    """
+    A job as seen by its account's owner: the caller's token names the job's username and, while the account
+    exists, the account is the job's. None for unknown, expired or someone else's jobs.
+    """
+    job = session.get(AccountDeletionJob, job_id)
+    if not job or job.username != username:
+        return None
+    # A new account that took over the username after the deletion is not the owner
+    user_id = session.exec(select(User.id).where(User.username == username)).first()
+    if user_id is not None and user_id != job.user_id:
+        return None
+    return job_record(job)
+
+
+scheduler.add("account_deletion_resume", ACCOUNT_DELETION_RESUME_SECONDS, resume_deletion_jobs)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from pydantic import EmailStr
 from pydantic import constr
 if TYPE_CHECKING:
@@ -63,4 +64,23 @@ class TokenData(SQLModel):
 
 class ResetPasswordRequest(SQLModel):
     token: str
-    new_password: constr(min_length=8)
\ No newline at end of file
+    new_password: constr(min_length=8)
+
+
+class AccountDeletionJob(SQLModel, table=True):
+    """Background deletion of a large account (api.auth.deletion); outlives the account so its owner can poll it"""
+    __table_args__ = (
+        # One active deletion per account
+        Index("uq_accountdeletionjob_active_user", "user_id", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+    id: str = Field(primary_key=True, max_length=32)
+    user_id: int = Field(index=True)  # no foreign key: the user row is deleted by the job
+    username: str = Field(max_length=255)
+    status: str = Field(default="queued", max_length=20)  # queued, running, completed, failed
+    deletion_summary: Optional[str] = Field(default=None)  # JSON
+    error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = Field(default=None)
+    lease_until: Optional[datetime] = Field(default=None)  # the worker running it; another one resumes it afterwards
@@ -2,16 +2,19 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
-from api.db import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from api.db import get_session, get_async_session
 from .models import User, UserCreate, UserRead, Token, UserDeletionConfirmation, UserDeletionSummary,ResetPasswordRequest
 from .utils import (
     authenticate_user,
     create_access_token,
     get_password_hash,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    get_current_active_user
+    get_current_active_user,
+    get_token_username
 )
 from typing import List
+import asyncio
 import logging
 import os
 from fastapi.responses import JSONResponse
@@ -124,9 +127,9 @@ def register_user(user: UserCreate, session: Session = Depends(get_session)):
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -161,7 +164,7 @@ async def login_for_access_token(
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(request: Request, session: Session = Depends(get_session)):
+async def refresh_token(request: Request, session: AsyncSession = Depends(get_async_session)):
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
         raise HTTPException(status_code=401, detail="Missing refresh token")
@@ -175,7 +178,7 @@ async def refresh_token(request: Request, session: Session = Depends(get_session
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
     # Optional: verify user still exists
-    user = session.exec(select(User).where(User.username == username)).first()
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -199,7 +202,7 @@ def get_all_users(session: Session = Depends(get_session)):
 async def delete_user_account(
     confirmation: UserDeletionConfirmation,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Delete the current user's account and ALL associated data.
@@ -207,11 +210,14 @@ async def delete_user_account(
     This includes:
     - All comics created by the user
     - All detailed scenarios 
-    - All comic images in Supabase storage
+    - All comic images in object storage (removed in batches)
     - All collections
     - All world stats
     - The user account itself
     
+    Accounts with many comics are deleted in the background: the response is 202 with a job id
+    that can be polled at /delete-account/jobs/{job_id}.
+    
     WARNING: This action is IRREVERSIBLE!
     """
     # Validate deletion confirmation
@@ -235,157 +241,32 @@ async def delete_user_account(
         )
 
     try:
-        logger.info(f"🗑️ Starting account deletion for user: {current_user.username} (ID: {current_user.id})")
-        
-        # Import models here to avoid circular imports
-        from api.chat.models import ComicsPage, DetailedScenario, ComicCollection, ComicCollectionItem, WorldStats
-        
-        deletion_stats = {
-            "user_id": current_user.id,
-            "username": current_user.username,
-            "comics_deleted": 0,
-            "scenarios_deleted": 0,
-            "images_deleted": 0,
-            "collections_deleted": 0,
-            "collection_items_deleted": 0,
-            "world_stats_deleted": 0,
-            "storage_cleanup_errors": []
-        }
-        
-        # Step 1: Delete comic images from Supabase Storage
-        logger.info("🗑️ Step 1: Deleting comic images from Supabase Storage...")
-        try:
-            from api.supabase.client import supabase_client
-            
-            # Get all user's comics first to see what we're working with
-            user_comics = session.exec(
-                select(ComicsPage).where(ComicsPage.user_id == current_user.id)
-            ).all()
-            
-            logger.info(f"📊 Found {len(user_comics)} total comics for user {current_user.username}")
-            
-            # Count comics with URLs vs base64 only
-            comics_with_urls = [comic for comic in user_comics if comic.image_url]
-            comics_base64_only = [comic for comic in user_comics if not comic.image_url and comic.image_base64]
-            
-            logger.info(f"   📁 Comics with Supabase URLs: {len(comics_with_urls)}")
-            logger.info(f"   💾 Comics with base64 only: {len(comics_base64_only)}")
-            
-            if supabase_client:
-                logger.info("✅ Supabase client is available")
-                
-                if comics_with_urls:
-                    logger.info(f"🗑️ Attempting to delete {len(comics_with_urls)} images from Supabase Storage...")
-                    
-                    for i, comic in enumerate(comics_with_urls, 1):
-                        logger.info(f"   🗑️ Deleting image {i}/{len(comics_with_urls)}: {comic.image_url}")
-                        try:
-                            success = supabase_client.delete_comic_image(comic.image_url)
-                            if success:
-                                deletion_stats["images_deleted"] += 1
-                                logger.info(f"   ✅ Successfully deleted image {i}: {comic.image_url}")
-                            else:
-                                error_msg = f"Failed to delete image {i}: {comic.image_url}"
-                                deletion_stats["storage_cleanup_errors"].append(error_msg)
-                                logger.warning(f"   ⚠️ {error_msg}")
-                        except Exception as img_error:
-                            error_msg = f"Error deleting image {i} ({comic.image_url}): {str(img_error)}"
-                            deletion_stats["storage_cleanup_errors"].append(error_msg)
-                            logger.error(f"   ❌ {error_msg}")
-                    
-                    logger.info(f"📊 Supabase deletion summary: {deletion_stats['images_deleted']} deleted, {len(deletion_stats['storage_cleanup_errors'])} errors")
-                else:
-                    logger.info("📭 No comics with Supabase URLs found - nothing to delete from storage")
-                    
-            else:
-                logger.warning("❌ Supabase client not available! This indicates a configuration issue.")
-                logger.warning("   Check your SUPABASE_URL, SUPABASE_ANON_KEY, and SUPABASE_SERVICE_ROLE_KEY environment variables")
-                deletion_stats["storage_cleanup_errors"].append("Supabase client not initialized - check environment variables")
-            
-            # Log what will happen to base64-only comics
-            if comics_base64_only:
-                logger.info(f"💾 {len(comics_base64_only)} comics with base64-only data will be deleted from database (no Supabase cleanup needed)")
-                
-        except Exception as storage_error:
-            logger.error(f"❌ Critical storage cleanup error: {storage_error}")
-            logger.error(f"   This may indicate Supabase import or initialization issues")
-            deletion_stats["storage_cleanup_errors"].append(f"Critical error: {str(storage_error)}")
-            
-            # Try to get more debug info
-            try:
-                import traceback
-                logger.error(f"   Full traceback: {traceback.format_exc()}")
-            except:
-                pass
-        
-        # Step 2: Delete collection items (junction table)
-        logger.info("🗑️ Step 2: Deleting collection items...")
-        collection_items = session.exec(
-            select(ComicCollectionItem).join(ComicCollection).where(ComicCollection.user_id == current_user.id)
-        ).all()
-        
-        for item in collection_items:
-            session.delete(item)
-            deletion_stats["collection_items_deleted"] += 1
-        
-        logger.info(f"✅ Deleted {deletion_stats['collection_items_deleted']} collection items")
-        
-        # Step 3: Delete collections
-        logger.info("🗑️ Step 3: Deleting collections...")
-        collections = session.exec(
-            select(ComicCollection).where(ComicCollection.user_id == current_user.id)
-        ).all()
-        
-        for collection in collections:
-            session.delete(collection)
-            deletion_stats["collections_deleted"] += 1
-        
-        logger.info(f"✅ Deleted {deletion_stats['collections_deleted']} collections")
-        
-        # Step 4: Delete detailed scenarios
-        logger.info("🗑️ Step 4: Deleting detailed scenarios...")
-        scenarios = session.exec(
-            select(DetailedScenario).where(DetailedScenario.user_id == current_user.id)
-        ).all()
-        
-        for scenario in scenarios:
-            session.delete(scenario)
-            deletion_stats["scenarios_deleted"] += 1
-        
-        logger.info(f"✅ Deleted {deletion_stats['scenarios_deleted']} scenarios")
-        
-        # Step 5: Delete comics (this will automatically handle foreign key constraints)
-        logger.info("🗑️ Step 5: Deleting comics...")
-        comics = session.exec(
-            select(ComicsPage).where(ComicsPage.user_id == current_user.id)
-        ).all()
-        
-        for comic in comics:
-            session.delete(comic)
-            deletion_stats["comics_deleted"] += 1
-        
-        logger.info(f"✅ Deleted {deletion_stats['comics_deleted']} comics")
-        
-        # Step 6: Delete world stats
-        logger.info("🗑️ Step 6: Deleting world stats...")
-        world_stats = session.exec(
-            select(WorldStats).where(WorldStats.user_id == current_user.id)
-        ).all()
-        
-        for stat in world_stats:
-            session.delete(stat)
-            deletion_stats["world_stats_deleted"] += 1
-        
-        logger.info(f"✅ Deleted {deletion_stats['world_stats_deleted']} world stats")
-        
-        # Step 7: Delete the user account
-        logger.info("🗑️ Step 7: Deleting user account...")
-        session.delete(current_user)
-        
-        # Commit all deletions
-        session.commit()
+        # Import here to avoid circular imports
+        from api.auth.deletion import delete_account, start_deletion_job, count_user_comics, ACCOUNT_DELETION_JOB_THRESHOLD
+        
+        comics_count = await session.run_sync(count_user_comics, current_user.id)
+        if comics_count > ACCOUNT_DELETION_JOB_THRESHOLD:
+            # Large accounts are deleted in the background, the client polls the job
+            job, created = await start_deletion_job(current_user.id, current_user.username)
+            if not created:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Deletion of this account is already in progress: /api/auth/delete-account/jobs/{job['job_id']}"
+                )
+            logger.info(f"🗑️ Account deletion for {current_user.username} ({comics_count} comics) started as job {job['job_id']}")
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={
+                    "success": True,
+                    "username": current_user.username,
+                    "message": f"Deletion of account '{current_user.username}' ({comics_count} comics) has started.",
+                    "job_id": job["job_id"],
+                    "status": job["status"],
+                    "status_url": f"/api/auth/delete-account/jobs/{job['job_id']}"
+                }
+            )
         
-        logger.info(f"✅ Account deletion completed successfully for user: {current_user.username}")
+        deletion_stats = await delete_account(current_user.id, current_user.username)
         
         return UserDeletionSummary(
             success=True,
@@ -395,36 +276,50 @@ async def delete_user_account(
             warning="This action was irreversible. All your comics, stories, and account data have been permanently removed."
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error during account deletion: {e}")
-        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete account: {str(e)}. No data was deleted due to this error."
         )
 
+@router.get("/delete-account/jobs/{job_id}")
+async def get_account_deletion_job(
+    job_id: str,
+    username: str = Depends(get_token_username),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Status of a background account deletion, for the account's owner only.
+    The account no longer exists once it completes, so the caller's token is checked against the job instead.
+    """
+    from api.auth.deletion import get_deletion_job
+    
+    job = await session.run_sync(get_deletion_job, job_id, username)
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job
+
 @router.get("/supabase-status")
-async def get_supabase_status(current_user: User = Depends(get_current_active_user)):
+async def get_supabase_status(
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
     """
     Check Supabase connection status and storage configuration.
     Useful for debugging why account deletion might not work properly.
     """
     try:
         from api.supabase.client import supabase_client
-        from api.chat.models import ComicsPage
-        from sqlmodel import func
-        
-        # Get session for counting
-        session = next(get_session())
+        from api.storage.usage import get_storage_usage
         
-        # Count user's comics and their storage types
-        user_comics = session.exec(
-            select(ComicsPage).where(ComicsPage.user_id == current_user.id)
-        ).all()
-        
-        comics_with_urls = len([c for c in user_comics if c.image_url])
-        comics_base64_only = len([c for c in user_comics if not c.image_url and c.image_base64])
-        comics_no_image = len([c for c in user_comics if not c.image_url and not c.image_base64])
+        # User's comics by storage type, from the maintained usage counters
+        usage = await session.run_sync(get_storage_usage, current_user.id)
+        comics_with_urls = usage["total_files"]
+        comics_base64_only = usage["base64_only_count"]
+        comics_no_image = usage["comics_no_image"]
         
         # Check Supabase client status
         supabase_status = {
@@ -440,7 +335,7 @@ async def get_supabase_status(current_user: User = Depends(get_current_active_us
         
         if supabase_client:
             try:
-                connection_test = supabase_client.test_connection()
+                connection_test = await asyncio.to_thread(supabase_client.test_connection)
                 supabase_status["connection_test"] = connection_test
                 supabase_status["bucket_exists"] = connection_test.get("bucket_exists", False)
             except Exception as e:
@@ -455,7 +350,7 @@ async def get_supabase_status(current_user: User = Depends(get_current_active_us
                 "user_id": current_user.id
             },
             "comics_storage_breakdown": {
-                "total_comics": len(user_comics),
+                "total_comics": usage["total_comics"],
                 "comics_with_supabase_urls": comics_with_urls,
                 "comics_base64_only": comics_base64_only,
                 "comics_no_image": comics_no_image,
@@ -507,42 +402,36 @@ def _get_supabase_recommendations(supabase_status: dict, comics_with_urls: int)
     return recommendations
 
 @router.get("/deletion-info")
-async def get_deletion_info(current_user: User = Depends(get_current_active_user)):
+async def get_deletion_info(
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
     """
     Get information about what will be deleted if the user deletes their account.
     This allows users to see the scope of deletion before confirming.
     """
     try:
-        from api.chat.models import ComicsPage, DetailedScenario, ComicCollection, WorldStats
+        from api.chat.models import DetailedScenario, ComicCollection, WorldStats
+        from api.storage.usage import get_storage_usage
         from sqlmodel import func
         
-        # Get session for counting
-        session = next(get_session())
+        # Comic and image counts come from the maintained usage counters
+        usage = await session.run_sync(get_storage_usage, current_user.id)
+        comics_count = usage["total_comics"]
         
-        # Count user's data
-        comics_count = session.exec(
-            select(func.count(ComicsPage.id)).where(ComicsPage.user_id == current_user.id)
-        ).one()
-        
-        scenarios_count = session.exec(
+        scenarios_count = (await session.exec(
             select(func.count(DetailedScenario.id)).where(DetailedScenario.user_id == current_user.id)
-        ).one()
+        )).one()
         
-        collections_count = session.exec(
+        collections_count = (await session.exec(
             select(func.count(ComicCollection.id)).where(ComicCollection.user_id == current_user.id)
-        ).one()
+        )).one()
         
-        world_stats_count = session.exec(
+        world_stats_count = (await session.exec(
             select(func.count(WorldStats.id)).where(WorldStats.user_id == current_user.id)
-        ).one()
+        )).one()
         
-        # Count images in storage
-        comics_with_images = session.exec(
-            select(func.count(ComicsPage.id)).where(
-                ComicsPage.user_id == current_user.id,
-                ComicsPage.image_url.isnot(None)
-            )
-        ).one()
+        comics_with_images = usage["total_files"]
         
         return {
             "user_info": {
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -5,8 +6,9 @@ from passlib.context import CryptContext
 from .models import TokenData, User
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
-from api.db import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from api.db import get_async_session
 
 
 # to get a string like this run:
@@ -24,11 +26,12 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def authenticate_user(session: Session, username: str, password: str) -> Optional[User]:
-    user = session.exec(select(User).where(User.username == username)).first()
+async def authenticate_user(session: AsyncSession, username: str, password: str) -> Optional[User]:
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is deliberately slow, keep it off the event loop
+    if not await asyncio.to_thread(verify_password, password, user.hashed_password):
         return None
     return user
 
@@ -49,15 +52,14 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None)
     return encoded_jwt
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+async def get_token_username(token: str = Depends(oauth2_scheme)) -> str:
+    """Username of a valid token, without requiring the account to still exist"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -66,8 +68,13 @@ async def get_current_user(
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    
-    user = session.exec(select(User).where(User.username == token_data.username)).first()
+    return token_data.username
+
+async def get_current_user(
+    username: str = Depends(get_token_username),
+    session: AsyncSession = Depends(get_async_session)
+) -> User:
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select, delete
+
+from api.chat.models import ComicsPage, DetailedScenario, ComicCollectionItem
+from api.chat.images import release_comic_images
+from api.ai.analyses import AnalyticsEntry
+from api.ai.rollups import record_comics_rollup_removed
+from api.storage.models import ImageUploadOutbox
+from api.storage.backends import storage_backend
+from api.storage.usage import record_comics_removed
+from api.chat.stats import record_world_comics_removed, release_collection_items
+
+STORAGE_DELETE_CHUNK_SIZE = int(os.environ.get("STORAGE_DELETE_CHUNK_SIZE", "100"))
+STORAGE_DELETE_CONCURRENCY = int(os.environ.get("STORAGE_DELETE_CONCURRENCY", "4"))
+
+
+def comic_ids_query(user_id: int, comic_ids: Optional[List[int]] = None):
+    """Subquery selecting the ids of a user's comics (optionally restricted to comic_ids)"""
+    query = select(ComicsPage.id).where(ComicsPage.user_id == user_id)
+    if comic_ids is not None:
+        query = query.where(ComicsPage.id.in_(comic_ids))
+    return query
+
+
+def delete_comic_rows(
+    session: Session,
+    user_id: int,
+    comic_ids: Optional[List[int]] = None
+) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Set-based delete of a user's comics and every row that references them (caller commits).
+    Deletes all of the user's comics when comic_ids is None.
+    Returns the deleted row counts and the storage URLs no other comic references anymore.
+    """
+    record_comics_removed(session, user_id, comic_ids)
+    comics = comic_ids_query(user_id, comic_ids)
+    record_world_comics_removed(session, user_id, comics)
+    record_comics_rollup_removed(session, comics)
+    release_collection_items(session, comics)
+    counts = {
+        "collection_items_deleted": session.exec(
+            delete(ComicCollectionItem).where(ComicCollectionItem.comic_id.in_(comics))
+        ).rowcount,
+        "scenarios_deleted": session.exec(
+            delete(DetailedScenario).where(DetailedScenario.comic_id.in_(comics))
+        ).rowcount,
+    }
+    session.exec(delete(AnalyticsEntry).where(AnalyticsEntry.comic_id.in_(comics)))
+    session.exec(delete(ImageUploadOutbox).where(ImageUploadOutbox.comic_id.in_(comics)))
+    image_urls = release_comic_images(session, comics)
+
+    comics_delete = delete(ComicsPage).where(ComicsPage.user_id == user_id)
+    if comic_ids is not None:
+        comics_delete = comics_delete.where(ComicsPage.id.in_(comic_ids))
+    counts["comics_deleted"] = session.exec(comics_delete).rowcount
+    return counts, image_urls
+
+
+async def delete_storage_objects(urls: List[str]) -> Tuple[int, List[str]]:
+    """
+    Delete objects from storage in chunks (one bulk request per chunk), with bounded concurrency.
+    Returns the number of deleted objects and the errors.
+    """
+    if not urls or storage_backend is None:
+        return 0, []
+
+    semaphore = asyncio.Semaphore(STORAGE_DELETE_CONCURRENCY)
+    chunks = [urls[i:i + STORAGE_DELETE_CHUNK_SIZE] for i in range(0, len(urls), STORAGE_DELETE_CHUNK_SIZE)]
+
+    async def delete_chunk(chunk: List[str]) -> Tuple[int, Optional[str]]:
+        async with semaphore:
+            try:
+                deleted = await asyncio.to_thread(storage_backend.delete_many, chunk)
+                if deleted < len(chunk):
+                    return deleted, f"Only {deleted}/{len(chunk)} images deleted from {storage_backend.name} storage"
+                return deleted, None
+            except Exception as e:
+                return 0, f"Error deleting {len(chunk)} images: {str(e)}"
+
+    results = await asyncio.gather(*(delete_chunk(chunk) for chunk in chunks))
+    deleted = sum(count for count, _ in results)
+    errors = [error for _, error in results if error]
+    print(f"🗑️ Deleted {deleted}/{len(urls)} images from storage in {len(chunks)} batches")
+    return deleted, errors
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, delete
+
+from api.db import engine
+from api.chat.models import ComicsPage, PublicFeedRank
+from api.utils.http_cache import etag_matches
+from api.utils.metrics import metrics
+from api.utils.pagination import NEXT_CURSOR_HEADER
+from api.utils.scheduler import scheduler
+
+PUBLIC_FEED_REFRESH_SECONDS = float(os.environ.get("PUBLIC_FEED_REFRESH_SECONDS", "300"))
+# Score = (views + 1) / (age in hours + 2) ^ gravity: higher gravity makes old comics sink faster
+PUBLIC_FEED_GRAVITY = float(os.environ.get("PUBLIC_FEED_GRAVITY", "1.5"))
+# Pages starting within the top PUBLIC_FEED_CACHED_RANKS are kept in memory for PUBLIC_FEED_CACHE_SECONDS
+PUBLIC_FEED_CACHED_RANKS = int(os.environ.get("PUBLIC_FEED_CACHED_RANKS", "1000"))
+PUBLIC_FEED_CACHE_SECONDS = float(os.environ.get("PUBLIC_FEED_CACHE_SECONDS", "60"))
+PUBLIC_FEED_CACHE_SIZE = int(os.environ.get("PUBLIC_FEED_CACHE_SIZE", "256"))
+
+FEED_CHANGED_KEY = "public_feed_changed"
+
+# Run after emptying the table in the same transaction: readers keep seeing the previous ranking until it commits
+REFRESH_PUBLIC_FEED_SQL = """
+    INSERT INTO publicfeedrank (comic_id, rank, score, refreshed_at)
+    SELECT id, row_number() OVER (ORDER BY score DESC, id DESC), score, now()
+    FROM (
+        SELECT id,
+               (view_count + 1) / power(GREATEST(EXTRACT(EPOCH FROM now() - created_at) / 3600, 0) + 2, :gravity) AS score
+        FROM comicspage
+        WHERE is_public
+    ) scored
+"""
+
+
+def feed_score(view_count: int, created_at: datetime) -> float:
+    """The score REFRESH_PUBLIC_FEED_SQL gives a comic right now"""
+    age_hours = max((datetime.utcnow() - created_at).total_seconds() / 3600, 0)
+    return (view_count + 1) / (age_hours + 2) ** PUBLIC_FEED_GRAVITY
+
+
+def sync_public_feed_rank(session: Session, comic: ComicsPage) -> None:
+    """
+    Add a just published comic to the feed at its current score, or drop an unpublished one (caller commits).
+    Its rank stays empty until the next refresh; the feed pages by score.
+    """
+    if comic.is_public:
+        statement = insert(PublicFeedRank).values(
+            comic_id=comic.id,
+            rank=None,
+            score=feed_score(comic.view_count, comic.created_at),
+            refreshed_at=datetime.utcnow()
+        )
+        session.exec(statement.on_conflict_do_update(
+            index_elements=["comic_id"],
+            set_={"score": statement.excluded.score}
+        ))
+    else:
+        session.exec(delete(PublicFeedRank).where(PublicFeedRank.comic_id == comic.id))
+    # Cleared once committed (clear_feed_cache_on_commit), so no request re-caches the old rows in between
+    session.info[FEED_CHANGED_KEY] = True
+
+
+def refresh_public_feed(force: bool = False) -> Optional[int]:
+    """Recompute the public feed ranking; returns the number of ranked comics (None when skipped)"""
+    with engine.begin() as conn:
+        # Every worker schedules the refresh; the lock and the freshness check let one of them do it per interval
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('publicfeedrank'))")).scalar():
+            return None
+        if not force:
+            age = conn.execute(text("SELECT EXTRACT(EPOCH FROM now() - MAX(refreshed_at)) FROM publicfeedrank")).scalar()
+            if age is not None and age < PUBLIC_FEED_REFRESH_SECONDS / 2:
+                return None
+        conn.execute(text("DELETE FROM publicfeedrank"))
+        conn.execute(text(REFRESH_PUBLIC_FEED_SQL), {"gravity": PUBLIC_FEED_GRAVITY})
+        ranked = conn.execute(text("SELECT COUNT(*) FROM publicfeedrank")).scalar()
+
+    feed_cache.clear()
+    metrics.incr("feed.refreshes")
+    print(f"📰 Public feed refreshed: {ranked} comics ranked")
+    return ranked
+
+
+class FeedPage(NamedTuple):
+    body: bytes
+    etag: str
+    next_cursor: Optional[str]
+    expires_at: float
+
+    def to_response(self, request: Request) -> Response:
+        """The page as JSON, or 304 when the client already has it"""
+        headers = {"ETag": self.etag, "Cache-Control": "public, no-cache"}
+        if self.next_cursor:
+            headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        if etag_matches(request.headers.get("if-none-match", ""), self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class FeedPageCache:
+    """LRU of serialized feed pages, cleared whenever this worker refreshes the ranking"""
+
+    def __init__(self, max_pages: int = PUBLIC_FEED_CACHE_SIZE, ttl_seconds: float = PUBLIC_FEED_CACHE_SECONDS):
+        self.max_pages = max_pages
+        self.ttl_seconds = ttl_seconds
+        self._pages: "OrderedDict[Hashable, FeedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[FeedPage]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None or page.expires_at < time.monotonic():
+                self._pages.pop(key, None)
+                metrics.incr("feed.cache_misses")
+                return None
+            self._pages.move_to_end(key)
+        metrics.incr("feed.cache_hits")
+        return page
+
+    def build(self, body: bytes, next_cursor: Optional[str]) -> FeedPage:
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        return FeedPage(body, etag, next_cursor, time.monotonic() + self.ttl_seconds)
+
+    def put(self, key: Hashable, page: FeedPage) -> None:
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+# Global instance
+feed_cache = FeedPageCache()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def clear_feed_cache_on_commit(session: OrmSession) -> None:
+    """
+    A published or unpublished comic shows in this worker's feed at once; other workers' cached pages
+    keep the previous feed for at most PUBLIC_FEED_CACHE_SECONDS
+    """
+    if session.info.pop(FEED_CHANGED_KEY, None):
+        feed_cache.clear()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def discard_feed_change(session: OrmSession) -> None:
+    session.info.pop(FEED_CHANGED_KEY, None)
+
+scheduler.add("public_feed_refresh", PUBLIC_FEED_REFRESH_SECONDS, refresh_public_feed)
+metrics.register_gauge("feed.cached_pages", lambda: len(feed_cache))
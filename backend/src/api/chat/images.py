@@ -0,0 +1,182 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, update, delete, func
+
+from api.db import engine
+from api.chat.models import ComicsPage, ComicImage, ImageBlob
+from api.utils.metrics import metrics, cached_gauge
+
+# Formats the image endpoint can serve; the stored format is always preferred on a tie
+IMAGE_FORMATS = {"image/png": "PNG", "image/webp": "WEBP", "image/jpeg": "JPEG"}
+CONVERTED_CACHE_SIZE = 64
+
+
+def encode_png(image: Image.Image) -> bytes:
+    """Serialize a PIL image to PNG bytes"""
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def add_comic_image(session: Session, comic_id: int, data: bytes, content_type: str = "image/png") -> Optional[str]:
+    """
+    Link a comic to the blob of its image, creating the blob or taking another reference on it (caller commits).
+    Returns the storage URL when identical bytes were already uploaded.
+    """
+    digest = content_hash(data)
+    statement = insert(ImageBlob).values(
+        content_hash=digest,
+        data=data,
+        content_type=content_type,
+        size_bytes=len(data),
+        ref_count=1,
+        created_at=datetime.utcnow()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ImageBlob.content_hash],
+        set_={"ref_count": ImageBlob.ref_count + 1}
+    ).returning(ImageBlob.ref_count, ImageBlob.storage_url)
+    ref_count, storage_url = session.exec(statement).one()
+    if ref_count > 1:
+        metrics.incr("storage.dedup_hits")
+
+    session.add(ComicImage(comic_id=comic_id, content_hash=digest))
+    return storage_url
+
+
+def get_comic_image(session: Session, comic_id: int) -> Optional[ImageBlob]:
+    """Load the image blob of a comic - the only place image bytes are read from the database"""
+    return session.exec(
+        select(ImageBlob)
+        .join(ComicImage, ComicImage.content_hash == ImageBlob.content_hash)
+        .where(ComicImage.comic_id == comic_id)
+    ).first()
+
+
+def get_comic_image_info(session: Session, comic_id: int) -> Optional[Tuple[str, str]]:
+    """(content_hash, content_type) of a comic's image, without loading the bytes"""
+    return session.exec(
+        select(ImageBlob.content_hash, ImageBlob.content_type)
+        .join(ComicImage, ComicImage.content_hash == ImageBlob.content_hash)
+        .where(ComicImage.comic_id == comic_id)
+    ).first()
+
+
+def release_comic_images(session: Session, comic_ids) -> List[str]:
+    """
+    Drop the image links of the given comics (a list or a subquery of ids) and release their blob references
+    (caller commits). Returns the storage URLs that nothing references anymore and can be deleted.
+    """
+    # Comics uploaded before deduplication may have their own object next to the blob's one
+    unshared_urls = [
+        image_url for image_url, storage_url in session.exec(
+            select(ComicsPage.image_url, ImageBlob.storage_url)
+            .select_from(ComicsPage)
+            .outerjoin(ComicImage, ComicImage.comic_id == ComicsPage.id)
+            .outerjoin(ImageBlob, ImageBlob.content_hash == ComicImage.content_hash)
+            .where(ComicsPage.id.in_(comic_ids), ComicsPage.image_url.isnot(None))
+        ).all()
+        if image_url != storage_url
+    ]
+
+    released = (
+        select(ComicImage.content_hash, func.count(ComicImage.id).label("references"))
+        .where(ComicImage.comic_id.in_(comic_ids))
+        .group_by(ComicImage.content_hash)
+        .subquery()
+    )
+    # Read before the links are deleted: only these blobs can have lost their last reference here
+    released_hashes = [
+        content_hash for content_hash in session.exec(select(released.c.content_hash)).all() if content_hash
+    ]
+    session.exec(
+        update(ImageBlob)
+        .where(ImageBlob.content_hash == released.c.content_hash)
+        .values(ref_count=ImageBlob.ref_count - released.c.references)
+    )
+    session.exec(delete(ComicImage).where(ComicImage.comic_id.in_(comic_ids)))
+    if not released_hashes:
+        return unshared_urls
+    orphaned_urls = session.exec(
+        delete(ImageBlob)
+        .where(ImageBlob.content_hash.in_(released_hashes), ImageBlob.ref_count <= 0)
+        .returning(ImageBlob.storage_url)
+    ).scalars().all()
+
+    return unshared_urls + [url for url in orphaned_urls if url]
+
+
+def dedup_stats() -> Dict[str, float]:
+    """References per stored blob and bytes saved by sharing blobs"""
+    with Session(engine) as session:
+        blobs, references, saved_bytes = session.exec(
+            select(
+                func.count(ImageBlob.content_hash),
+                func.coalesce(func.sum(ImageBlob.ref_count), 0),
+                func.coalesce(func.sum((ImageBlob.ref_count - 1) * ImageBlob.size_bytes), 0)
+            )
+        ).one()
+    return {
+        "ratio": round(references / blobs, 4) if blobs else 1.0,
+        "saved_bytes": saved_bytes
+    }
+
+
+class ConvertedImageCache:
+    """Small LRU of images converted to another format, keyed by (content hash, media type)"""
+
+    def __init__(self, max_items: int = CONVERTED_CACHE_SIZE):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return None
+
+    def put(self, key: Tuple[str, str], data: bytes) -> None:
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+converted_images = ConvertedImageCache()
+
+
+def convert_image(data: bytes, digest: str, media_type: str) -> bytes:
+    """Re-encode image bytes to media_type (cached by content hash)"""
+    key = (digest, media_type)
+    cached = converted_images.get(key)
+    if cached is not None:
+        return cached
+
+    image = Image.open(io.BytesIO(data))
+    if media_type == "image/jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format=IMAGE_FORMATS[media_type], quality=85)
+    converted = output.getvalue()
+    converted_images.put(key, converted)
+    return converted
+
+
+# One aggregate over imageblob serves both gauges
+cached_dedup_stats = cached_gauge(dedup_stats)
+metrics.register_gauge("storage.dedup_ratio", lambda: cached_dedup_stats()["ratio"])
+metrics.register_gauge("storage.dedup_saved_bytes", lambda: cached_dedup_stats()["saved_bytes"])
@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional, Sequence
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import exists, false, func
+
+from api.chat.models import ComicsPage, DetailedScenario, PublicFeedRank
+from api.storage.backends import STORAGE_SIGNED_URL_SECONDS
+from api.utils.pagination import NEXT_CURSOR_HEADER
+
+# Same URL as routing.comic_image_url: the stored URL once uploaded, the image endpoint while the upload is pending
+# (or failed, or the comic is DB-only). With signed URLs the stored (unsigned) URL is useless to clients, so it is
+# always the endpoint, which redirects to a signed one.
+IMAGE_ENDPOINT_URL = func.concat("/api/chats/comic/", ComicsPage.id, "/image")
+IMAGE_URL_COLUMN = (
+    IMAGE_ENDPOINT_URL if STORAGE_SIGNED_URL_SECONDS > 0 else func.coalesce(ComicsPage.image_url, IMAGE_ENDPOINT_URL)
+).label("image_url")
+
+# Everything a comic list item can carry, by field name (the `fields=` / `include=` vocabulary)
+COMIC_FIELDS = {
+    "id": ComicsPage.id,
+    "title": ComicsPage.title,
+    "concept": ComicsPage.concept,
+    "genre": ComicsPage.genre,
+    "art_style": ComicsPage.art_style,
+    "world_type": ComicsPage.world_type,
+    "image_url": IMAGE_URL_COLUMN,
+    "panels_data": ComicsPage.panels_data,
+    "created_at": ComicsPage.created_at,
+    "updated_at": ComicsPage.updated_at,
+    "is_favorite": ComicsPage.is_favorite,
+    "is_public": ComicsPage.is_public,
+    "view_count": ComicsPage.view_count,
+    "has_detailed_scenario": exists().where(DetailedScenario.comic_id == ComicsPage.id).label("has_detailed_scenario"),
+}
+
+# /public-comics: is_favorite is the viewer's own flag, so it does not apply there; rank is the feed position
+# as of the last refresh, score the feed's sort key
+PUBLIC_COMIC_FIELDS = {**COMIC_FIELDS, "is_favorite": false().label("is_favorite"), "rank": PublicFeedRank.rank,
+                       "score": PublicFeedRank.score}
+
+# Default fields of each list (what ComicListResponse / ComicGenerationResponse describe, minus panels_data:
+# a grid of thumbnails does not need the panels, clients ask for them with include=panels_data)
+COMIC_LIST_FIELDS = ("id", "title", "concept", "genre", "art_style", "created_at", "is_favorite", "is_public", "view_count")
+WORLD_COMIC_FIELDS = (
+    "id", "title", "concept", "genre", "art_style", "world_type", "image_url",
+    "created_at", "is_favorite", "is_public", "has_detailed_scenario"
+)
+
+
+def _field_names(value: Optional[str]) -> List[str]:
+    return [name.strip() for name in value.split(",") if name.strip()] if value else []
+
+
+def comic_columns(
+    fields: Optional[str],
+    include: Optional[str],
+    default: Sequence[str],
+    sort_keys: Sequence[str] = ("created_at", "id"),
+    available: Dict = COMIC_FIELDS
+) -> List:
+    """
+    Columns to select for a comic list: `fields` (comma-separated) replaces the endpoint's default fields,
+    `include` adds to them. The sort keys are always selected since the next page's cursor is built from them.
+    """
+    names = _field_names(fields) or list(default)
+    names += _field_names(include)
+    unknown = sorted(set(names) - available.keys())
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}"
+        )
+    names += [key for key in sort_keys if key not in names]
+    return [available[name] for name in dict.fromkeys(names)]
+
+
+SCENARIO_COLUMNS = list(DetailedScenario.__table__.columns)
+
+
+def row_to_item(row) -> Dict:
+    """JSON-ready dict of a projected row. panels_data is already JSON and is embedded without re-parsing."""
+    item = row._asdict()
+    if "panels_data" in item:
+        item["panels_data"] = orjson.Fragment(item["panels_data"]) if item["panels_data"] else {}
+    return item
+
+
+def list_response(rows, next_cursor: Optional[str] = None) -> ORJSONResponse:
+    """
+    Serialize projected rows straight to JSON with orjson (no per-item pydantic models),
+    with the next page's cursor in the X-Next-Cursor header
+    """
+    items: List[Dict] = [row_to_item(row) for row in rows]
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(items, headers=headers)
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field, DateTime, JSON, Column, Relationship
 from typing import Optional, List
-from sqlalchemy import JSON as SA_JSON
+from sqlalchemy import JSON as SA_JSON, LargeBinary, UniqueConstraint
 from api.auth.models import User
 from enum import Enum
 
@@ -42,6 +42,13 @@ class WorldType(str, Enum):
     MIND_WORLD = "mind_world"
     IMAGINATION_WORLD = "imagination_world"
 
+class StorageState(str, Enum):
+    """Where the image of a comic currently lives"""
+    PENDING = "pending"      # bytes in ImageBlob, upload to object storage queued
+    UPLOADED = "uploaded"    # image_url points to object storage
+    FAILED = "failed"        # upload gave up after retries, bytes only in ImageBlob
+    DB_ONLY = "db_only"      # no object storage configured
+
 class ComicsPage(SQLModel, table=True):
     """Model for storing user's created comics"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -57,7 +64,8 @@ class ComicsPage(SQLModel, table=True):
     
     # Comic content
     image_url: Optional[str] = Field(default=None)  # Store the comic image URL from Supabase Storage (optional)
-    image_base64: Optional[str] = Field(default=None)  # Store the comic image as base64 (alternative to URL)
+    storage_state: str = Field(default=StorageState.PENDING.value, max_length=20)  # StorageState value
+    # Image bytes live in ImageBlob (via ComicImage) so list/analytics queries never load them
     panels_data: str = Field()  # JSON string of panel information
     
     # User relationship
@@ -76,6 +84,36 @@ class ComicsPage(SQLModel, table=True):
     class Config:
         from_attributes = True
 
+class ImageBlob(SQLModel, table=True):
+    """Image bytes stored once per distinct content, shared by every comic with the same image"""
+    content_hash: str = Field(primary_key=True, max_length=64)  # sha256 hex, used as ETag
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    content_type: str = Field(default="image/png", max_length=50)
+    size_bytes: int = Field(default=0)
+    storage_url: Optional[str] = Field(default=None)  # the single object storage copy, once uploaded
+    ref_count: int = Field(default=0)  # number of ComicImage rows pointing at this blob
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ComicImage(SQLModel, table=True):
+    """Link from a comic to its image blob, kept apart from ComicsPage so list queries never touch image data"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    comic_id: int = Field(foreign_key="comicspage.id", unique=True, index=True)
+    content_hash: Optional[str] = Field(default=None, max_length=64, index=True)  # ImageBlob.content_hash
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class PublicFeedRank(SQLModel, table=True):
+    """Precomputed order of the public feed, rebuilt periodically by api.chat.feed"""
+    comic_id: int = Field(foreign_key="comicspage.id", primary_key=True, ondelete="CASCADE")
+    rank: Optional[int] = Field(default=None, unique=True, index=True)  # 1 = top of the feed, None until the next refresh
+    score: float = Field(default=0.0)  # time-decayed popularity
+    refreshed_at: datetime = Field(default_factory=datetime.utcnow)
+
+class UserDataVersion(SQLModel, table=True):
+    """Bumped with every create/update/delete of a user's comics (api.chat.versions); keys cached analytics responses"""
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 class ComicsPageCreate(SQLModel):
     user_message: str
     genre: str
@@ -85,7 +123,9 @@ class ComicsPageCreate(SQLModel):
     sheet_url: str
 
 class WorldStats(SQLModel, table=True):
-    """Model for tracking statistics per world per user"""
+    """Model for tracking statistics per world per user (maintained by api.chat.stats)"""
+    __table_args__ = (UniqueConstraint("user_id", "world_type", name="uq_worldstats_user_world"),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     
     # User and world
@@ -96,6 +136,7 @@ class WorldStats(SQLModel, table=True):
     total_comics: int = Field(default=0)
     favorite_comics: int = Field(default=0)
     public_comics: int = Field(default=0)
+    total_collections: int = Field(default=0)
     
     # Timestamps
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -117,6 +158,8 @@ class ComicCollection(SQLModel, table=True):
     user_id: int = Field(foreign_key="user.id")
     user: Optional[User] = Relationship()
     
+    comic_count: int = Field(default=0)  # number of ComicCollectionItem rows, maintained by api.chat.stats
+    
     # Metadata
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = Field(default=None)
@@ -1,12 +1,26 @@
 from typing import Optional, List
 from fastapi import APIRouter, Depends, Body, HTTPException, status
-from fastapi.responses import JSONResponse, StreamingResponse
-from sqlmodel import Session, select, func
-from .models import ComicsPage, ComicCollection, ComicCollectionItem, WorldType
-from api.db import get_session
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse, Response
+from sqlmodel import Session, select
+from .models import ComicsPage, ComicCollection, WorldStats, WorldType, PublicFeedRank
+from .images import encode_png, get_comic_image, get_comic_image_info, convert_image, IMAGE_FORMATS
+from .deletion import delete_comic_rows, delete_storage_objects
+from .stats import adjust_world_stats, record_comic_added, record_comic_flags_changed
+from .views import view_counter
+from .feed import feed_cache, sync_public_feed_rank, PUBLIC_FEED_CACHED_RANKS
+from .listing import COMIC_LIST_FIELDS, PUBLIC_COMIC_FIELDS, WORLD_COMIC_FIELDS, SCENARIO_COLUMNS, comic_columns, list_response
+from api.storage.uploader import image_uploader, store_comic_image
+from api.storage.backends import storage_backend, STORAGE_SIGNED_URL_SECONDS
+from api.utils.http_cache import etag_matches, negotiate_media_type
+from api.utils.pagination import after_cursor, page_limit, split_page
+from api.db import get_session, get_async_session, get_read_session, get_async_read_session
 from api.auth.models import User
 from api.auth.utils import get_current_user
 from api.ai.schemas import ScenarioSchema, ComicsPageSchema, ScenarioSchema2, ComicGenerationRequest, ComicSaveRequest, ComicGenerationResponse, WorldComicsRequest, WorldStatsResponse, ComicCollectionRequest, ComicCollectionResponse, ScenarioSaveRequest, DetailedScenarioSchema
+from api.ai.rollups import record_comic_rollup
+from api.ai.precompute import enqueue_insight_precompute, insight_precomputer
+from api.ai.digest import concept_digests
 from api.ai.services import generate_scenario, generate_comic_scenario, generate_complete_comic, generate_image_from_prompt
 from pydantic import BaseModel
 from datetime import datetime
@@ -19,7 +33,6 @@ import asyncio
 from sqlalchemy.future import select
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession # Use AsyncSess
-from api.supabase.client import supabase_client
 router = APIRouter()
 
 # Request/Response models
@@ -42,7 +55,7 @@ class ComicResponse(BaseModel):
     concept: str
     genre: str
     art_style: str
-    image_base64: str
+    image_url: str  # Storage URL, or the binary image endpoint while the upload is pending
     panels_data: str
     created_at: datetime
     is_favorite: bool
@@ -61,6 +74,9 @@ class ComicListResponse(BaseModel):
     view_count: int
     # Excluding image_base64 for list view to reduce payload size
 
+class BulkDeleteRequest(BaseModel):
+    comic_ids: List[int]
+
 class ScenarioRequest(BaseModel):
     concept: str
     genre: Optional[str] = None
@@ -80,7 +96,7 @@ class ChatMessagePayload(BaseModel):
 async def generate_comic_endpoint(
     request: ComicRequest, 
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Generate a complete comic from a text concept and automatically save it
@@ -96,27 +112,9 @@ async def generate_comic_endpoint(
         art_style=request.art_style,
         include_detailed_scenario=request.include_detailed_scenario
     )
-            
-        # Upload comic image to Supabase Storage
-        from api.supabase.client import supabase_client
         
-        try:
-            if supabase_client:
-                # Upload to Supabase Storage
-                supabase_image_url = supabase_client.upload_comic_image(current_user.id, comic_image)
-                print(f"✅ Comic uploaded to Supabase Storage: {supabase_image_url}")
-            else:
-                supabase_image_url = None
-                print("⚠️ Supabase client not available, saving base64 locally")
-        except Exception as upload_error:
-            print(f"⚠️ Failed to upload to Supabase: {upload_error}")
-            supabase_image_url = None
-        
-        # Convert image to base64 as backup
-        img_byte_arr = io.BytesIO()
-        comic_image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        img_base64 = base64.b64encode(img_byte_arr.getvalue()).decode()
+        # Image bytes go to ImageBlob; the upload to object storage happens in the background (outbox)
+        image_bytes = await asyncio.to_thread(encode_png, comic_image)
         
         # Save comic to database using AI-determined values
         try:
@@ -125,14 +123,20 @@ async def generate_comic_endpoint(
                 concept=request.concept,
                 genre=comic_page.genre,  # Use AI-determined genre
                 art_style=comic_page.art_style,  # Use AI-determined art_style
-                image_url=supabase_image_url,  # Store Supabase URL
-                image_base64=img_base64,  # Always store base64 as backup (database requires NOT NULL)
                 panels_data=json.dumps([panel.dict() for panel in comic_page.panels]),
                 user_id=current_user.id
             )
             session.add(new_comic)
-            session.commit()
-            session.refresh(new_comic)
+            await session.flush()
+            await session.run_sync(store_comic_image, new_comic, image_bytes)
+            await session.run_sync(record_comic_added, new_comic)
+            await session.run_sync(record_comic_rollup, new_comic)
+            await session.run_sync(enqueue_insight_precompute, new_comic)
+            await session.commit()
+            image_uploader.notify()
+            insight_precomputer.notify()
+            concept_digests.schedule(new_comic.user_id, new_comic.world_type)
+            await session.refresh(new_comic)
             print(f"✅ Comic saved to database with ID: {new_comic.id}")
             
             # Analytics are now performed on existing comics data automatically
@@ -153,20 +157,19 @@ async def generate_comic_endpoint(
                     user_id=current_user.id
                 )
                 session.add(new_scenario)
-                session.commit()
-                session.refresh(new_scenario)
+                await session.commit()
+                await session.refresh(new_scenario)
                 print(f"✅ Detailed scenario saved to database with ID: {new_scenario.id}")
             else:
                 print("⏭️ No detailed scenario to save (not requested)")
             
-            if supabase_image_url:
-                print(f"🌐 Comic accessible via Supabase URL: {supabase_image_url}")
+            print(f"📤 Comic {new_comic.id} image storage: {new_comic.storage_state}")
         except Exception as save_error:
             print(f"⚠️ Failed to save comic to database: {save_error}")
             # Continue with image response even if saving fails
         
         # Prepare image response
-        img_byte_arr.seek(0)
+        img_byte_arr = io.BytesIO(image_bytes)
         
         # Add headers with comic metadata
         headers = {
@@ -192,7 +195,7 @@ async def generate_comic_endpoint(
 async def generate_comic_with_data_endpoint(
     request: ComicSaveRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """
     Generate a complete comic and return both the image and metadata (iOS-friendly)
@@ -208,29 +211,14 @@ async def generate_comic_with_data_endpoint(
         include_detailed_scenario=request.include_detailed_scenario
     )
         
-        # Upload comic image to Supabase Storage
-        from api.supabase.client import supabase_client
-        
-        try:
-            if supabase_client:
-                # Upload to Supabase Storage
-                supabase_image_url = supabase_client.upload_comic_image(current_user.id, comic_image)
-                print(f"✅ Comic uploaded to Supabase Storage: {supabase_image_url}")
-            else:
-                supabase_image_url = None
-                print("⚠️ Supabase client not available, saving base64 locally")
-        except Exception as upload_error:
-            print(f"⚠️ Failed to upload to Supabase: {upload_error}")
-            supabase_image_url = None
-        
-        # Convert image to base64 as backup
-        img_byte_arr = io.BytesIO()
-        comic_image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        img_base64 = base64.b64encode(img_byte_arr.getvalue()).decode()
-        
-        # Use provided image_base64 if available, otherwise use generated one
-        final_image_base64 = request.image_base64 if request.image_base64 else img_base64
+        # The upload to object storage happens in the background (outbox)
+        # Use provided image_base64 if it decodes, otherwise the generated image
+        image_bytes = await asyncio.to_thread(encode_png, comic_image)
+        if request.image_base64:
+            try:
+                image_bytes = base64.b64decode(request.image_base64, validate=True)
+            except ValueError:
+                print("⚠️ Provided image_base64 is not valid base64, keeping generated image")
         
         # Save comic to database with world type using AI-determined values
         new_comic = ComicsPage(
@@ -239,16 +227,24 @@ async def generate_comic_with_data_endpoint(
             genre=comic_page.genre,  # Use AI-determined genre
             art_style=comic_page.art_style,  # Use AI-determined art_style
             world_type=request.world_type,  # NEW: Add world type
-            image_url=supabase_image_url,  # Store Supabase URL
-            image_base64=final_image_base64,  # Use final image base64
             panels_data=json.dumps([panel.dict() for panel in comic_page.panels]),
             user_id=current_user.id,
             is_favorite=request.is_favorite or False,
             is_public=request.is_public or False
         )
         session.add(new_comic)
-        session.commit()
-        session.refresh(new_comic)
+        await session.flush()
+        await session.run_sync(store_comic_image, new_comic, image_bytes)
+        await session.run_sync(record_comic_added, new_comic)
+        await session.run_sync(record_comic_rollup, new_comic)
+        await session.run_sync(enqueue_insight_precompute, new_comic)
+        if new_comic.is_public:
+            await session.run_sync(sync_public_feed_rank, new_comic)
+        await session.commit()
+        image_uploader.notify()
+        insight_precomputer.notify()
+        concept_digests.schedule(new_comic.user_id, new_comic.world_type)
+        await session.refresh(new_comic)
         
         # Analytics are now performed on existing comics data automatically
         print(f"✅ Comic {new_comic.id} ready for analytics analysis")
@@ -268,16 +264,16 @@ async def generate_comic_with_data_endpoint(
                 user_id=current_user.id
             )
             session.add(new_scenario)
-            session.commit()
-            session.refresh(new_scenario)
+            await session.commit()
+            await session.refresh(new_scenario)
             print(f"✅ Detailed scenario saved to database with ID: {new_scenario.id}")
         else:
             print("⏭️ No detailed scenario to save (not requested)")
         
         # Check if a detailed scenario exists for this comic
-        has_detailed_scenario = session.exec(
+        has_detailed_scenario = (await session.exec(
             select(DetailedScenario).where(DetailedScenario.comic_id == new_comic.id)
-        ).first() is not None
+        )).first() is not None
         
         return {
             "id": new_comic.id,
@@ -290,7 +286,8 @@ async def generate_comic_with_data_endpoint(
             "is_favorite": new_comic.is_favorite,
             "is_public": new_comic.is_public,
             "has_detailed_scenario": has_detailed_scenario,
-            "image_url": supabase_image_url # <-- ADD THIS LINE
+            "image_url": comic_image_url(new_comic),  # the image endpoint until the background upload completes
+            "storage_state": new_comic.storage_state
             
         }
         
@@ -302,16 +299,25 @@ async def generate_comic_with_data_endpoint(
 @router.get("/my-comics", response_model=List[ComicListResponse])
 async def get_my_comics(
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
     genre: Optional[str] = None,
     art_style: Optional[str] = None,
-    is_favorite: Optional[bool] = None
+    is_favorite: Optional[bool] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
-    """Get current user's comics with optional filtering"""
+    """
+    Get current user's comics with optional filtering, newest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one (`offset` is kept for older clients).
+    `fields=a,b` returns only those fields, `include=panels_data` adds fields to the default ones.
+    """
     try:
-        query = select(ComicsPage).where(ComicsPage.user_id == current_user.id)
+        limit = page_limit(limit)
+        columns = comic_columns(fields, include, COMIC_LIST_FIELDS)
+        query = select(*columns).where(ComicsPage.user_id == current_user.id)
         
         # Apply filters
         if genre:
@@ -321,26 +327,18 @@ async def get_my_comics(
         if is_favorite is not None:
             query = query.where(ComicsPage.is_favorite == is_favorite)
         
-        # Apply pagination and ordering
-        query = query.order_by(ComicsPage.created_at.desc()).offset(offset).limit(limit)
-        
-        comics = session.exec(query).all()
-        
-        return [
-            ComicListResponse(
-                id=comic.id,
-                title=comic.title,
-                concept=comic.concept,
-                genre=comic.genre,
-                art_style=comic.art_style,
-                created_at=comic.created_at,
-                is_favorite=comic.is_favorite,
-                is_public=comic.is_public,
-                view_count=comic.view_count
-            )
-            for comic in comics
-        ]
+        # Apply pagination and ordering; one extra row tells whether there is a next page
+        if cursor:
+            query = after_cursor(query, (ComicsPage.created_at, ComicsPage.id), cursor, datetime, int)
+        elif offset:
+            query = query.offset(offset)
+        query = query.order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc()).limit(limit + 1)
+        
+        comics, next_cursor = split_page((await session.exec(query)).all(), limit, lambda comic: (comic.created_at, comic.id))
+        return list_response(comics, next_cursor)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error fetching user comics: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch comics")
@@ -350,11 +348,11 @@ async def get_my_comics(
 async def get_comic(
     comic_id: int,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get a specific comic by ID"""
     try:
-        comic = session.get(ComicsPage, comic_id)
+        comic = await session.get(ComicsPage, comic_id)
         
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found")
@@ -363,10 +361,8 @@ async def get_comic(
         if comic.user_id != current_user.id and not comic.is_public:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Increment view count
-        comic.view_count += 1
-        session.add(comic)
-        session.commit()
+        # Views are buffered and written in batches; the read itself stays read-only
+        view_counter.record(comic.id)
         
         return ComicResponse(
             id=comic.id,
@@ -374,12 +370,12 @@ async def get_comic(
             concept=comic.concept,
             genre=comic.genre,
             art_style=comic.art_style,
-            image_base64=comic.image_base64,
+            image_url=comic_image_url(comic),
             panels_data=comic.panels_data,
             created_at=comic.created_at,
             is_favorite=comic.is_favorite,
             is_public=comic.is_public,
-            view_count=comic.view_count
+            view_count=comic.view_count + view_counter.pending(comic.id)
         )
         
     except HTTPException:
@@ -388,6 +384,74 @@ async def get_comic(
         print(f"❌ Error fetching comic: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch comic")
 
+def comic_image_url(comic: ComicsPage) -> str:
+    """Where clients load a comic's image; with signed URLs the image endpoint redirects to a fresh one"""
+    if comic.image_url and STORAGE_SIGNED_URL_SECONDS <= 0:
+        return comic.image_url
+    return f"/api/chats/comic/{comic.id}/image"
+
+async def storage_redirect(image_url: str) -> RedirectResponse:
+    """Redirect to a comic's object in storage, through a signed URL when those are enabled"""
+    if STORAGE_SIGNED_URL_SECONDS > 0 and storage_backend:
+        url = await asyncio.to_thread(storage_backend.signed_url, image_url, STORAGE_SIGNED_URL_SECONDS)
+        cache_control = f"private, max-age={STORAGE_SIGNED_URL_SECONDS // 2}"
+    else:
+        url, cache_control = image_url, "private, max-age=86400"
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers={"Cache-Control": cache_control, "Vary": "Accept"})
+
+# Get the image of a comic as binary
+@router.get("/comic/{comic_id}/image")
+async def get_comic_image_binary(
+    comic_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """
+    Get the image of a comic in the format negotiated from the Accept header (png, webp or jpeg).
+    Responses carry a strong content-hash ETag, a private Cache-Control and 304 on If-None-Match. Images already in object storage are served by redirecting there.
+    """
+    comic = (await session.exec(
+        select(ComicsPage.user_id, ComicsPage.is_public, ComicsPage.image_url).where(ComicsPage.id == comic_id)
+    )).first()
+    if not comic:
+        raise HTTPException(status_code=404, detail="Comic not found")
+    if comic.user_id != current_user.id and not comic.is_public:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    image_info = await session.run_sync(get_comic_image_info, comic_id)
+    if not image_info:
+        if comic.image_url:
+            return await storage_redirect(comic.image_url)
+        raise HTTPException(status_code=404, detail="Comic image not found")
+    digest, stored_type = image_info
+    
+    available = [stored_type] + [media_type for media_type in IMAGE_FORMATS if media_type != stored_type]
+    media_type = negotiate_media_type(request.headers.get("accept"), available)
+    if not media_type:
+        raise HTTPException(status_code=406, detail=f"Available image formats: {', '.join(available)}")
+    
+    # Object storage already has the stored format
+    if media_type == stored_type and comic.image_url:
+        return await storage_redirect(comic.image_url)
+    
+    etag = f'"{digest}-{IMAGE_FORMATS[media_type].lower()}"'
+    headers = {
+        "ETag": etag,
+        # Private even for public comics: the URL is keyed by comic id, and a comic made private must not linger
+        # in shared caches. Browsers revalidate with the ETag once the hour is up.
+        "Cache-Control": "private, max-age=3600",
+        "Vary": "Accept"
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    comic_image = await session.run_sync(get_comic_image, comic_id)
+    data = comic_image.data
+    if media_type != stored_type:
+        data = await asyncio.to_thread(convert_image, data, digest, media_type)
+    return Response(content=data, media_type=media_type, headers=headers)
+
 # Update comic
 @router.put("/comic/{comic_id}")
 async def update_comic(
@@ -396,11 +460,12 @@ async def update_comic(
     is_favorite: Optional[bool] = None,
     is_public: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Update comic metadata"""
     try:
-        comic = session.get(ComicsPage, comic_id)
+        # Locked so concurrent toggles see each other's flags when adjusting the world stats
+        comic = await session.get(ComicsPage, comic_id, with_for_update=True)
         
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found")
@@ -409,6 +474,7 @@ async def update_comic(
             raise HTTPException(status_code=403, detail="Access denied")
         
         # Update fields
+        was_favorite, was_public = comic.is_favorite, comic.is_public
         if title is not None:
             comic.title = title
         if is_favorite is not None:
@@ -419,7 +485,10 @@ async def update_comic(
         comic.updated_at = datetime.utcnow()
         
         session.add(comic)
-        session.commit()
+        await session.run_sync(record_comic_flags_changed, comic, was_favorite, was_public)
+        if comic.is_public != was_public:
+            await session.run_sync(sync_public_feed_rank, comic)
+        await session.commit()
         
         return {"success": True, "message": "Comic updated successfully"}
         
@@ -434,11 +503,11 @@ async def update_comic(
 async def delete_comic(
     comic_id: int,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    """Delete a comic and its image from Supabase Storage if present"""
+    """Delete a comic and its image from object storage if present"""
     try:
-        comic = session.get(ComicsPage, comic_id)
+        comic = await session.get(ComicsPage, comic_id)
         
         if not comic:
             raise HTTPException(status_code=404, detail="Comic not found")
@@ -446,19 +515,14 @@ async def delete_comic(
         if comic.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Delete comic image from Supabase Storage if it exists
-        if comic.image_url and supabase_client:
-            try:
-                image_deleted = supabase_client.delete_comic_image(comic.image_url)
-                if image_deleted:
-                    print(f"✅ Comic image deleted from Supabase Storage: {comic.image_url}")
-                else:
-                    print(f"⚠️ Failed to delete comic image from Supabase Storage: {comic.image_url}")
-            except Exception as e:
-                print(f"⚠️ Exception during Supabase image deletion: {e}")
+        _, image_urls = await session.run_sync(delete_comic_rows, current_user.id, [comic.id])
+        await session.commit()
         
-        session.delete(comic)
-        session.commit()
+        # Delete the image from object storage unless another comic shares it
+        if image_urls:
+            images_deleted, errors = await delete_storage_objects(image_urls)
+            for error in errors:
+                print(f"⚠️ {error}")
         
         return {"success": True, "message": "Comic deleted successfully"}
         
@@ -468,50 +532,91 @@ async def delete_comic(
         print(f"❌ Error deleting comic: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete comic")
 
+# Delete several comics at once
+@router.post("/comics/bulk-delete")
+async def bulk_delete_comics(
+    request: BulkDeleteRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Delete several of the user's comics in one transaction, then their images in storage batches"""
+    try:
+        comic_ids = list(set(request.comic_ids))
+        counts, image_urls = await session.run_sync(delete_comic_rows, current_user.id, comic_ids)
+        await session.commit()
+        
+        images_deleted, errors = await delete_storage_objects(image_urls)
+        
+        return {
+            "success": True,
+            "message": f"Deleted {counts['comics_deleted']} comics",
+            **counts,
+            "images_deleted": images_deleted,
+            "storage_cleanup_errors": errors
+        }
+        
+    except Exception as e:
+        await session.rollback()
+        print(f"❌ Error deleting comics: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete comics: {str(e)}")
+
 # Get public comics (for browsing)
 @router.get("/public-comics", response_model=List[ComicListResponse])
 async def get_public_comics(
-    session: Session = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_async_read_session),
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
     genre: Optional[str] = None,
-    art_style: Optional[str] = None
+    art_style: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
-    """Get public comics for browsing"""
+    """
+    Get public comics for browsing, best ranked first (cursor pagination and fields/include like /my-comics).
+    The ranking (views decayed by age) is precomputed by api.chat.feed; the top pages are served from memory with ETags.
+    """
     try:
-        query = select(ComicsPage).where(ComicsPage.is_public == True)
-        
-        # Apply filters
-        if genre:
-            query = query.where(ComicsPage.genre == genre)
-        if art_style:
-            query = query.where(ComicsPage.art_style == art_style)
-        
-        # Apply pagination and ordering
-        query = query.order_by(ComicsPage.view_count.desc(), ComicsPage.created_at.desc()).offset(offset).limit(limit)
-        
-        comics = session.exec(query).all()
-        
-        return [
-            ComicListResponse(
-                id=comic.id,
-                title=comic.title,
-                concept=comic.concept,
-                genre=comic.genre,
-                art_style=comic.art_style,
-                created_at=comic.created_at,
-                is_favorite=False,  # Not applicable for public view
-                is_public=comic.is_public,
-                view_count=comic.view_count
+        limit = page_limit(limit)
+        key = (limit, offset, cursor, genre, art_style, fields, include)
+        page = feed_cache.get(key)
+        if page is None:
+            columns = comic_columns(fields, include, COMIC_LIST_FIELDS, ("rank", "score", "id"), PUBLIC_COMIC_FIELDS)
+            query = (
+                select(*columns)
+                .join(PublicFeedRank, PublicFeedRank.comic_id == ComicsPage.id)
+                .where(ComicsPage.is_public == True)
             )
-            for comic in comics
-        ]
+            
+            # Apply filters
+            if genre:
+                query = query.where(ComicsPage.genre == genre)
+            if art_style:
+                query = query.where(ComicsPage.art_style == art_style)
+            
+            # Walk the ranking from the cursor, a (score, id) key that stays valid across refreshes;
+            # one extra row tells whether there is a next page
+            feed_order = (PublicFeedRank.score, PublicFeedRank.comic_id)
+            if cursor:
+                query = after_cursor(query, feed_order, cursor, float, int)
+            elif offset:
+                query = query.offset(offset)
+            query = query.order_by(*(column.desc() for column in feed_order)).limit(limit + 1)
+            
+            comics, next_cursor = split_page((await session.exec(query)).all(), limit, lambda comic: (comic.score, comic.id))
+            page = feed_cache.build(list_response(comics).body, next_cursor)
+            # Only the top of the feed is cached (comics published since the last refresh have no rank yet)
+            if comics and (comics[0].rank or PUBLIC_FEED_CACHED_RANKS) < PUBLIC_FEED_CACHED_RANKS:
+                feed_cache.put(key, page)
+        return page.to_response(request)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error fetching public comics: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch public comics")
 
-# Story scenario generation endpoint
 @router.post("/generate-scenario", response_model=ScenarioSchema2)
 async def generate_scenario_endpoint(request: ScenarioRequest):
     """
@@ -675,18 +780,17 @@ async def chat_router_info():
 @router.post("/world-comics", response_model=List[ComicGenerationResponse])
 async def get_world_comics(
     request: WorldComicsRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     current_user: User = Depends(get_current_user)
 ) -> List[ComicGenerationResponse]:
-    """Get comics from a specific world for the current user (Optimized & Fixed)"""
+    """
+    Get comics from a specific world for the current user (Optimized & Fixed).
+    panels_data is left out unless asked for with `include: "panels_data"` (or listed in `fields`).
+    """
     try:
-        # The query remains the same to keep the N+1 performance fix
+        # Only the requested columns; has_detailed_scenario is an EXISTS, so no N+1 and no duplicate rows
         query = (
-            select(
-                ComicsPage,
-                (DetailedScenario.id != None).label("has_detailed_scenario")
-            )
-            .join(DetailedScenario, ComicsPage.id == DetailedScenario.comic_id, isouter=True)
+            select(*comic_columns(request.fields, request.include, WORLD_COMIC_FIELDS))
             .where(
                 ComicsPage.user_id == current_user.id,
                 ComicsPage.world_type == request.world_type
@@ -699,36 +803,22 @@ async def get_world_comics(
         # STEP 2: Remove the unnecessary count query
         # (The code for total_comics has been deleted)
 
-        # Apply pagination and ordering
-        offset = (request.page - 1) * request.per_page
-        data_query = query.order_by(ComicsPage.created_at.desc()).offset(offset).limit(request.per_page)
+        # Apply pagination and ordering; one extra row tells whether there is a next page
+        per_page = page_limit(request.per_page)
+        if request.cursor:
+            query = after_cursor(query, (ComicsPage.created_at, ComicsPage.id), request.cursor, datetime, int)
+        else:
+            query = query.offset((request.page - 1) * per_page)
+        data_query = query.order_by(ComicsPage.created_at.desc(), ComicsPage.id.desc()).limit(per_page + 1)
 
-        results = session.exec(data_query).all()
-        
-        # Format the response list
-        comics_list = []
-        for row in results:
-            comic = row.ComicsPage
-            has_scenario = row.has_detailed_scenario
-            
-            comics_list.append(ComicGenerationResponse(
-                id=comic.id,
-                title=comic.title,
-                concept=comic.concept,
-                genre=comic.genre,
-                art_style=comic.art_style,
-                world_type=comic.world_type,
-                image_url=comic.image_url, 
-                panels_data=json.loads(comic.panels_data) if comic.panels_data else {},
-                created_at=comic.created_at.isoformat(),
-                is_favorite=comic.is_favorite,
-                is_public=comic.is_public,
-                has_detailed_scenario=has_scenario
-            ))
-        
-        # STEP 3: Return the simple list directly
-        return comics_list
+        results, next_cursor = split_page(
+            (await session.exec(data_query)).all(), per_page,
+            lambda row: (row.created_at, row.id)
+        )
+        return list_response(results, next_cursor)
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"❌ Error fetching world comics: {str(e)}")
@@ -741,51 +831,24 @@ async def get_world_comics(
 @router.get("/world-stats/{world_type}", response_model=WorldStatsResponse)
 async def get_world_stats(
     world_type: WorldType,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Get statistics for a specific world"""
+    """Get statistics for a specific world (a single lookup of the maintained WorldStats row)"""
     try:
-        # Count comics in this world
-        total_comics = session.exec(
-            select(func.count(ComicsPage.id)).where(
-                ComicsPage.user_id == current_user.id,
-                ComicsPage.world_type == world_type
-            )
-        ).one()[0]
-        
-        # Count favorite comics
-        favorite_comics = session.exec(
-            select(func.count(ComicsPage.id)).where(
-                ComicsPage.user_id == current_user.id,
-                ComicsPage.world_type == world_type,
-                ComicsPage.is_favorite == True
-            )
-        ).one()[0]
-        
-        # Count public comics
-        public_comics = session.exec(
-            select(func.count(ComicsPage.id)).where(
-                ComicsPage.user_id == current_user.id,
-                ComicsPage.world_type == world_type,
-                ComicsPage.is_public == True
+        stats = (await session.exec(
+            select(WorldStats).where(
+                WorldStats.user_id == current_user.id,
+                WorldStats.world_type == world_type
             )
-        ).one()[0]
-        
-        # Count collections for this world
-        total_collections = session.exec(
-            select(func.count(ComicCollection.id)).where(
-                ComicCollection.user_id == current_user.id,
-                ComicCollection.world_type == world_type
-            )
-        ).one()[0]
+        )).scalars().first() or WorldStats(user_id=current_user.id, world_type=world_type)
         
         return WorldStatsResponse(
             world_type=world_type,
-            total_comics=total_comics,
-            favorite_comics=favorite_comics,
-            public_comics=public_comics,
-            total_collections=total_collections
+            total_comics=stats.total_comics,
+            favorite_comics=stats.favorite_comics,
+            public_comics=stats.public_comics,
+            total_collections=stats.total_collections
         )
         
     except Exception as e:
@@ -798,7 +861,7 @@ async def get_world_stats(
 @router.post("/collections", response_model=ComicCollectionResponse)
 async def create_collection(
     request: ComicCollectionRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new comic collection in a specific world"""
@@ -811,8 +874,9 @@ async def create_collection(
         )
         
         session.add(collection)
-        session.commit()
-        session.refresh(collection)
+        await session.run_sync(adjust_world_stats, current_user.id, request.world_type, collections=1)
+        await session.commit()
+        await session.refresh(collection)
         
         return ComicCollectionResponse(
             id=collection.id,
@@ -833,33 +897,26 @@ async def create_collection(
 @router.get("/collections/{world_type}", response_model=List[ComicCollectionResponse])
 async def get_world_collections(
     world_type: WorldType,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all collections for a specific world"""
+    """Get all collections for a specific world, with their maintained comic counts"""
     try:
-        collections = session.exec(
+        collections = (await session.exec(
             select(ComicCollection).where(
                 ComicCollection.user_id == current_user.id,
                 ComicCollection.world_type == world_type
             ).order_by(ComicCollection.created_at.desc())
-        ).all()
+        )).scalars().all()
         
         result = []
         for collection in collections:
-            # Count comics in this collection
-            comic_count = session.exec(
-                select(func.count(ComicCollectionItem.id)).where(
-                    ComicCollectionItem.collection_id == collection.id
-                )
-            ).one()
-            
             result.append(ComicCollectionResponse(
                 id=collection.id,
                 name=collection.name,
                 description=collection.description,
                 world_type=collection.world_type,
-                comic_count=comic_count,
+                comic_count=collection.comic_count,
                 created_at=collection.created_at.isoformat()
             ))
         
@@ -1041,7 +1098,7 @@ def save_scenario(
 @router.get("/scenarios/comic/{comic_id}")
 def get_scenario_by_comic(
     comic_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ) -> DetailedScenario:
     """Get the detailed scenario for a specific comic"""
@@ -1063,16 +1120,21 @@ def get_scenario_by_comic(
 def get_user_scenarios(
     limit: int = 20,
     offset: int = 0,
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ) -> List[DetailedScenario]:
-    """Get all scenarios for the current user"""
+    """Get all scenarios for the current user, newest first (cursor pagination like /my-comics)"""
+    limit = page_limit(limit)
+    query = select(*SCENARIO_COLUMNS).where(DetailedScenario.user_id == current_user.id)
+    if cursor:
+        query = after_cursor(query, (DetailedScenario.created_at, DetailedScenario.id), cursor, datetime, int)
+    elif offset:
+        query = query.offset(offset)
+    rows = session.exec(query.order_by(DetailedScenario.created_at.desc(), DetailedScenario.id.desc()).limit(limit + 1)).all()
     
-    scenarios = session.query(DetailedScenario).filter(
-        DetailedScenario.user_id == current_user.id
-    ).order_by(DetailedScenario.created_at.desc()).offset(offset).limit(limit).all()
-    
-    return scenarios
+    scenarios, next_cursor = split_page(rows, limit, lambda scenario: (scenario.created_at, scenario.id))
+    return list_response(scenarios, next_cursor)
 
 @router.put("/scenarios/{scenario_id}")
 def update_scenario(
@@ -1142,7 +1204,7 @@ def delete_scenario(
 @router.get("/scenarios/{scenario_id}/with-comic")
 def get_scenario_with_comic(
     scenario_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ) -> dict:
     """Get scenario along with its linked comic data"""
@@ -0,0 +1,151 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, update, func
+
+from api.db import engine
+from api.chat.models import ComicsPage, ComicCollection, ComicCollectionItem, WorldStats, WorldType
+from api.chat.versions import bump_data_version
+from api.utils.metrics import metrics
+from api.utils.scheduler import scheduler
+
+WORLD_STATS_RECONCILE_SECONDS = float(os.environ.get("WORLD_STATS_RECONCILE_SECONDS", "86400"))
+
+# Recomputes every (user, world) row from comicspage/comiccollection and only rewrites rows that drifted
+RECONCILE_WORLD_STATS_SQL = """
+    INSERT INTO worldstats (user_id, world_type, total_comics, favorite_comics, public_comics, total_collections, created_at, updated_at)
+    SELECT k.user_id, k.world_type,
+           COALESCE(c.comics, 0), COALESCE(c.favorites, 0), COALESCE(c.publics, 0), COALESCE(col.collections, 0),
+           now(), now()
+    FROM (
+        SELECT user_id, world_type FROM comicspage
+        UNION SELECT user_id, world_type FROM comiccollection
+        UNION SELECT user_id, world_type FROM worldstats
+    ) k
+    LEFT JOIN (
+        SELECT user_id, world_type,
+               COUNT(*) AS comics,
+               COUNT(*) FILTER (WHERE is_favorite) AS favorites,
+               COUNT(*) FILTER (WHERE is_public) AS publics
+        FROM comicspage GROUP BY user_id, world_type
+    ) c ON c.user_id = k.user_id AND c.world_type = k.world_type
+    LEFT JOIN (
+        SELECT user_id, world_type, COUNT(*) AS collections
+        FROM comiccollection GROUP BY user_id, world_type
+    ) col ON col.user_id = k.user_id AND col.world_type = k.world_type
+    ON CONFLICT (user_id, world_type) DO UPDATE SET
+        total_comics = EXCLUDED.total_comics,
+        favorite_comics = EXCLUDED.favorite_comics,
+        public_comics = EXCLUDED.public_comics,
+        total_collections = EXCLUDED.total_collections,
+        updated_at = EXCLUDED.updated_at
+    WHERE (worldstats.total_comics, worldstats.favorite_comics, worldstats.public_comics, worldstats.total_collections)
+          IS DISTINCT FROM
+          (EXCLUDED.total_comics, EXCLUDED.favorite_comics, EXCLUDED.public_comics, EXCLUDED.total_collections)
+"""
+
+RECONCILE_COLLECTION_COUNTS_SQL = """
+    UPDATE comiccollection cc SET comic_count = COALESCE(i.items, 0)
+    FROM comiccollection c
+    LEFT JOIN (
+        SELECT collection_id, COUNT(*) AS items FROM comiccollectionitem GROUP BY collection_id
+    ) i ON i.collection_id = c.id
+    WHERE cc.id = c.id AND cc.comic_count IS DISTINCT FROM COALESCE(i.items, 0)
+"""
+
+
+def adjust_world_stats(
+    session: Session,
+    user_id: int,
+    world_type: WorldType,
+    comics: int = 0,
+    favorites: int = 0,
+    public: int = 0,
+    collections: int = 0
+) -> None:
+    """Add deltas to a user's counters for one world in the current transaction (caller commits)"""
+    now = datetime.utcnow()
+    statement = insert(WorldStats).values(
+        user_id=user_id,
+        world_type=world_type,
+        total_comics=comics,
+        favorite_comics=favorites,
+        public_comics=public,
+        total_collections=collections,
+        created_at=now,
+        updated_at=now
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[WorldStats.user_id, WorldStats.world_type],
+        set_={
+            "total_comics": WorldStats.total_comics + statement.excluded.total_comics,
+            "favorite_comics": WorldStats.favorite_comics + statement.excluded.favorite_comics,
+            "public_comics": WorldStats.public_comics + statement.excluded.public_comics,
+            "total_collections": WorldStats.total_collections + statement.excluded.total_collections,
+            "updated_at": statement.excluded.updated_at
+        }
+    )
+    session.exec(statement)
+
+
+def record_comic_added(session: Session, comic: ComicsPage) -> None:
+    adjust_world_stats(session, comic.user_id, comic.world_type, 1, int(comic.is_favorite), int(comic.is_public))
+    bump_data_version(session, comic.user_id)
+
+
+def record_comic_flags_changed(session: Session, comic: ComicsPage, was_favorite: bool, was_public: bool) -> None:
+    """Apply a favorite/public toggle of a comic to its world's counters (called on every comic update)"""
+    bump_data_version(session, comic.user_id)
+    favorites = int(comic.is_favorite) - int(was_favorite)
+    public = int(comic.is_public) - int(was_public)
+    if favorites or public:
+        adjust_world_stats(session, comic.user_id, comic.world_type, favorites=favorites, public=public)
+
+
+def record_world_comics_removed(session: Session, user_id: int, comics) -> None:
+    """Subtract the comics about to be deleted (a subquery of ids) from their worlds' counters"""
+    removed = session.exec(
+        select(
+            ComicsPage.world_type,
+            func.count(ComicsPage.id),
+            func.count(ComicsPage.id).filter(ComicsPage.is_favorite),
+            func.count(ComicsPage.id).filter(ComicsPage.is_public)
+        )
+        .where(ComicsPage.id.in_(comics))
+        .group_by(ComicsPage.world_type)
+    ).all()
+    for world_type, count, favorites, public in removed:
+        adjust_world_stats(session, user_id, world_type, -count, -favorites, -public)
+    if removed:
+        bump_data_version(session, user_id)
+
+
+def release_collection_items(session: Session, comics) -> None:
+    """Decrement the comic counts of the collections holding the comics about to be deleted"""
+    released = (
+        select(ComicCollectionItem.collection_id, func.count(ComicCollectionItem.id).label("item_count"))
+        .where(ComicCollectionItem.comic_id.in_(comics))
+        .group_by(ComicCollectionItem.collection_id)
+        .subquery()
+    )
+    session.exec(
+        update(ComicCollection)
+        .where(ComicCollection.id == released.c.collection_id)
+        .values(comic_count=ComicCollection.comic_count - released.c.item_count)
+    )
+
+
+def reconcile_world_stats() -> int:
+    """Fix drift in world stats and collection counts; returns the number of corrected rows"""
+    with engine.begin() as conn:
+        corrected = conn.execute(text(RECONCILE_WORLD_STATS_SQL)).rowcount
+        corrected += conn.execute(text(RECONCILE_COLLECTION_COUNTS_SQL)).rowcount
+    metrics.incr("world_stats.rows_reconciled", corrected)
+    if corrected:
+        print(f"🔧 Reconciled {corrected} world stats and collection count rows")
+    return corrected
+
+
+scheduler.add("world_stats_reconcile", WORLD_STATS_RECONCILE_SECONDS, reconcile_world_stats)
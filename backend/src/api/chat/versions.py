@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from api.db import async_session_factory
+from api.chat.models import UserDataVersion
+from api.utils.metrics import metrics
+
+# Other workers' writes are seen after at most this long (the writing worker and the writing client see them at once)
+DATA_VERSION_CACHE_SECONDS = float(os.environ.get("DATA_VERSION_CACHE_SECONDS", "5"))
+
+BUMPED_USERS_KEY = "bumped_data_versions"
+
+
+def bump_data_version(session: Session, user_id: int) -> None:
+    """Mark a user's comic data as changed (caller commits)"""
+    statement = insert(UserDataVersion).values(user_id=user_id, version=1, updated_at=datetime.utcnow())
+    session.exec(statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": UserDataVersion.version + 1, "updated_at": statement.excluded.updated_at}
+    ))
+    session.info.setdefault(BUMPED_USERS_KEY, set()).add(user_id)
+
+
+class DataVersions:
+    """Per-user data versions, read from userdataversion and kept briefly in this worker"""
+
+    def __init__(self, ttl_seconds: float = DATA_VERSION_CACHE_SECONDS, max_users: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._versions: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, user_id: int, fresh: bool = False) -> int:
+        """A user's data version; fresh=True skips the worker's copy (e.g. right after the client wrote)"""
+        if not fresh:
+            with self._lock:
+                cached = self._versions.get(user_id)
+            if cached is not None and cached[1] > time.monotonic():
+                metrics.incr("data_versions.hits")
+                return cached[0]
+
+        # Primary: a lagging replica would hand out a version older than the client's own write
+        async with async_session_factory() as session:
+            version = (await session.exec(
+                select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+            )).first() or 0
+        metrics.incr("data_versions.reads")
+        with self._lock:
+            if len(self._versions) >= self.max_users:
+                now = time.monotonic()
+                self._versions = {key: value for key, value in self._versions.items() if value[1] > now}
+            self._versions[user_id] = (version, time.monotonic() + self.ttl_seconds)
+        return version
+
+    def forget(self, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._versions.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+
+# Global instance
+data_versions = DataVersions()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def forget_committed_versions(session: OrmSession) -> None:
+    """A worker's own writes are visible to its next read right away"""
+    user_ids = session.info.pop(BUMPED_USERS_KEY, None)
+    if user_ids:
+        data_versions.forget(user_ids)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def discard_rolled_back_versions(session: OrmSession) -> None:
+    session.info.pop(BUMPED_USERS_KEY, None)
+
+
+metrics.register_gauge("data_versions.cached_users", lambda: len(data_versions))
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import threading
+from typing import Dict
+
+from sqlalchemy import Integer, column, values
+from sqlmodel import Session, update
+
+from api.db import engine
+from api.chat.models import ComicsPage
+from api.utils.metrics import metrics
+from api.utils.scheduler import scheduler
+
+# Views are lost only if the process dies: at most VIEW_COUNT_FLUSH_SECONDS worth of them, never more than
+# about VIEW_COUNT_MAX_PENDING (reaching it triggers an early flush). While the database is failing the buffer
+# stops at VIEW_COUNT_MAX_PENDING and further views are dropped (views.dropped).
+VIEW_COUNT_FLUSH_SECONDS = float(os.environ.get("VIEW_COUNT_FLUSH_SECONDS", "10"))
+VIEW_COUNT_MAX_PENDING = int(os.environ.get("VIEW_COUNT_MAX_PENDING", "1000"))
+
+
+class ViewCounter:
+    """Write-behind buffer of comic views, flushed as one batched UPDATE"""
+
+    def __init__(self, max_pending: int = VIEW_COUNT_MAX_PENDING):
+        self.max_pending = max_pending
+        self._pending: Dict[int, int] = {}
+        self._pending_views = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._early_flush = False  # an early flush is running, or flushes are failing: no more early flushes
+        self._failing = False
+
+    def record(self, comic_id: int) -> None:
+        """Count one view (called from the event loop)"""
+        with self._lock:
+            # Full while the database is failing: the buffer keeps its bound instead of growing
+            dropped = self._failing and self._pending_views >= self.max_pending
+            if not dropped:
+                self._pending[comic_id] = self._pending.get(comic_id, 0) + 1
+                self._pending_views += 1
+            flush_now = not dropped and self._pending_views >= self.max_pending and not self._early_flush
+            if flush_now:
+                self._early_flush = True
+        if dropped:
+            metrics.incr("views.dropped")
+            return
+        metrics.incr("views.recorded")
+        if flush_now:
+            asyncio.get_running_loop().run_in_executor(None, self._flush_in_background)
+
+    def pending(self, comic_id: int) -> int:
+        """Views of a comic that are not in the database yet"""
+        with self._lock:
+            return self._pending.get(comic_id, 0)
+
+    @property
+    def pending_views(self) -> int:
+        return self._pending_views
+
+    def _flush_in_background(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Early view count flush failed: {e}")
+
+    def flush(self) -> int:
+        """Write the buffered views in one UPDATE ... FROM (VALUES ...); returns the number of comics updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._pending_views = self._pending, {}, 0
+            if not batch:
+                return 0
+
+            # Sorted ids: concurrent flushes from several workers lock rows in the same order
+            deltas = values(column("id", Integer), column("delta", Integer), name="view_deltas").data(sorted(batch.items()))
+            try:
+                with Session(engine) as session:
+                    session.exec(
+                        update(ComicsPage)
+                        .where(ComicsPage.id == deltas.c.id)
+                        .values(view_count=ComicsPage.view_count + deltas.c.delta)
+                    )
+                    session.commit()
+            except Exception:
+                # Put the views back so a transient database error loses nothing, up to the buffer's bound.
+                # Early flushes stay off until a scheduled flush gets through, so an outage causes no flush storm.
+                dropped = 0
+                with self._lock:
+                    for comic_id, delta in batch.items():
+                        kept = max(0, min(delta, self.max_pending - self._pending_views))
+                        if kept:
+                            self._pending[comic_id] = self._pending.get(comic_id, 0) + kept
+                            self._pending_views += kept
+                        dropped += delta - kept
+                    self._early_flush = True
+                    self._failing = True
+                metrics.incr("views.flush_failures")
+                if dropped:
+                    metrics.incr("views.dropped", dropped)
+                raise
+
+            with self._lock:
+                self._early_flush = False
+                self._failing = False
+
+        metrics.incr("views.flushes")
+        metrics.incr("views.flushed_comics", len(batch))
+        return len(batch)
+
+
+# Global instance
+view_counter = ViewCounter()
+
+scheduler.add("view_count_flush", VIEW_COUNT_FLUSH_SECONDS, view_counter.flush)
+metrics.register_gauge("views.pending", lambda: view_counter.pending_views)
@@ -1,13 +1,116 @@
 import os
+import time
 from sqlmodel import SQLModel, Session, create_engine
-from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from fastapi import Request
+
+from api.utils.metrics import metrics
+from api.utils.consistency import reads_from_primary
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
 if not DATABASE_URL:
     raise NotImplementedError("`DATABASE_URL` environment variable is not set")
 
-engine = create_engine(DATABASE_URL)
+# Optional read replica for read-only routes (get_read_session / get_async_read_session)
+DATABASE_URL_READ = os.environ.get("DATABASE_URL_READ")
+
+# Pool sizing. The async engine serves the routes and gets DB_POOL_SIZE + DB_MAX_OVERFLOW connections; the sync
+# engine (migrations, background workers, the few sync routes) gets DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW.
+# Each worker process opens at most DB_MAX_CONNECTIONS_PER_WORKER connections to the primary (and as many to the
+# replica when DATABASE_URL_READ is set): keep workers x that below the server's max_connections.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_SYNC_POOL_SIZE = int(os.environ.get("DB_SYNC_POOL_SIZE", "5"))
+DB_SYNC_MAX_OVERFLOW = int(os.environ.get("DB_SYNC_MAX_OVERFLOW", "5"))
+DB_MAX_CONNECTIONS_PER_WORKER = DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+def async_database_url(url: str) -> str:
+    """Point a postgres URL at the async psycopg (v3) driver"""
+    scheme, _, rest = url.partition("://")
+    return f"postgresql+psycopg://{rest}" if scheme.startswith("postgres") else url
+
+
+class TimedPoolMixin:
+    """Records how long callers wait for a pooled connection, in db.<name>.* metrics"""
+
+    metrics_name = "pool"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.incr(f"db.{self.metrics_name}.checkout_timeouts")
+            raise
+        metrics.incr(f"db.{self.metrics_name}.checkouts")
+        metrics.incr(f"db.{self.metrics_name}.checkout_wait_seconds", time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    metrics_name = "sync_pool"
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async_pool"
+
+
+class TimedReadQueuePool(TimedPoolMixin, QueuePool):
+    metrics_name = "read_sync_pool"
+
+
+class TimedReadAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_name = "read_async_pool"
+
+
+pool_settings = {
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+sync_pool_settings = {"pool_size": DB_SYNC_POOL_SIZE, "max_overflow": DB_SYNC_MAX_OVERFLOW, **pool_settings}
+async_pool_settings = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, **pool_settings}
+
+# Sync engine: migrations, background workers and the remaining sync (threadpool) routes
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **sync_pool_settings)
+
+# Async engine for `async def` routes, so queries never block the event loop
+async_engine = create_async_engine(async_database_url(DATABASE_URL), poolclass=TimedAsyncQueuePool, **async_pool_settings)
+# Objects stay loaded after commit: lazy refreshes are not possible outside the session's greenlet
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Replica engines, with their own pools; without DATABASE_URL_READ reads share the primary engines
+if DATABASE_URL_READ:
+    read_engine = create_engine(DATABASE_URL_READ, poolclass=TimedReadQueuePool, **sync_pool_settings)
+    read_async_engine = create_async_engine(
+        async_database_url(DATABASE_URL_READ), poolclass=TimedReadAsyncQueuePool, **async_pool_settings
+    )
+else:
+    read_engine, read_async_engine = engine, async_engine
+read_async_session_factory = async_sessionmaker(read_async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def register_pool_gauges(name: str, pool, capacity: int) -> None:
+    metrics.register_gauge(f"db.{name}.size", pool.size)
+    metrics.register_gauge(f"db.{name}.checked_out", pool.checkedout)
+    metrics.register_gauge(f"db.{name}.overflow", lambda: max(pool.overflow(), 0))
+    metrics.register_gauge(f"db.{name}.utilization", lambda: round(pool.checkedout() / capacity, 4))
+
+
+register_pool_gauges("sync_pool", engine.pool, DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW)
+register_pool_gauges("async_pool", async_engine.pool, DB_POOL_SIZE + DB_MAX_OVERFLOW)
+if DATABASE_URL_READ:
+    register_pool_gauges("read_sync_pool", read_engine.pool, DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW)
+    register_pool_gauges("read_async_pool", read_async_engine.pool, DB_POOL_SIZE + DB_MAX_OVERFLOW)
 
 def recreate_tables():
     """Drop and recreate all tables - use with caution as this destroys data"""
@@ -29,3 +132,23 @@ def init_db():
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    async with async_session_factory() as session:
+        yield session
+
+def _use_replica(request: Request) -> bool:
+    # The route only reads, so the request does not open a read-your-writes window (see api.utils.consistency)
+    request.state.read_only = True
+    return DATABASE_URL_READ is not None and not reads_from_primary(request)
+
+def get_read_session(request: Request):
+    """Session for read-only routes: the replica, unless the client wrote within READ_YOUR_WRITES_SECONDS"""
+    with Session(read_engine if _use_replica(request) else engine) as session:
+        yield session
+
+async def get_async_read_session(request: Request):
+    """Async session for read-only routes, routed like get_read_session"""
+    factory = read_async_session_factory if _use_replica(request) else async_session_factory
+    async with factory() as session:
+        yield session
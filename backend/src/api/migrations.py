@@ -0,0 +1,338 @@
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel, Field
+
+from api.db import engine
+
+
+class SchemaMigration(SQLModel, table=True):
+    """Versions of the data/schema migrations that have been applied"""
+    version: str = Field(primary_key=True, max_length=100)
+    description: str = Field(max_length=500)
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# Ordered list of (version, description, function). Versions are applied once, in order.
+MIGRATIONS: List[Tuple[str, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: str, description: str):
+    """Register a migration function"""
+    def decorator(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+@migration("0001_move_comic_images", "Move ComicsPage.image_base64 into the comicimage table")
+def move_comic_images(conn: Connection, batch_size: int = 500) -> None:
+    if "image_base64" not in _columns(conn, "comicspage"):
+        return
+
+    # Bytes are staged on comicimage itself; 0005 moves them into imageblob
+    conn.execute(text("""
+        ALTER TABLE comicimage
+            ADD COLUMN IF NOT EXISTS data BYTEA,
+            ADD COLUMN IF NOT EXISTS content_type VARCHAR(50) NOT NULL DEFAULT 'image/png',
+            ADD COLUMN IF NOT EXISTS size_bytes INTEGER NOT NULL DEFAULT 0
+    """))
+
+    max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM comicspage")).scalar()
+    # One statement per id batch so a large table is never decoded at once; all batches share the migration's
+    # transaction, so a failure leaves image_base64 untouched
+    for start in range(0, max_id, batch_size):
+        conn.execute(text("""
+            INSERT INTO comicimage (comic_id, data, content_type, size_bytes, created_at)
+            SELECT id, decode(payload, 'base64'), content_type, length(decode(payload, 'base64')), created_at
+            FROM (
+                SELECT
+                    id,
+                    COALESCE(created_at, now()) AS created_at,
+                    COALESCE(substring(image_base64 from '^data:(image/[A-Za-z0-9.+-]+);base64,'), 'image/png') AS content_type,
+                    regexp_replace(regexp_replace(image_base64, '^data:image/[A-Za-z0-9.+-]+;base64,', ''), '\\s', '', 'g') AS payload
+                FROM comicspage
+                WHERE id > :start AND id <= :end AND image_base64 IS NOT NULL
+            ) AS source
+            WHERE payload ~ '^[A-Za-z0-9+/=]+$' AND length(payload) % 4 = 0
+            ON CONFLICT (comic_id) DO NOTHING
+        """), {"start": start, "end": start + batch_size})
+        print(f"   📦 Moved comic images {start + 1}-{min(start + batch_size, max_id)} of {max_id}")
+
+    unmigrated = conn.execute(text("""
+        SELECT c.id FROM comicspage c
+        WHERE btrim(c.image_base64) <> ''
+          AND NOT EXISTS (SELECT 1 FROM comicimage ci WHERE ci.comic_id = c.id)
+        ORDER BY c.id
+    """)).scalars().all()
+    if unmigrated:
+        # Dropping the column would lose these images: fix or clear them by hand, then restart
+        raise RuntimeError(
+            f"{len(unmigrated)} comic images could not be decoded (comic ids {unmigrated[:20]}), "
+            "image_base64 was not dropped"
+        )
+
+    conn.execute(text("ALTER TABLE comicspage DROP COLUMN image_base64"))
+
+
+@migration("0002_comic_storage_state", "Add ComicsPage.storage_state for the image upload outbox")
+def add_comic_storage_state(conn: Connection) -> None:
+    if "storage_state" in _columns(conn, "comicspage"):
+        return
+
+    conn.execute(text("ALTER TABLE comicspage ADD COLUMN storage_state VARCHAR(20) NOT NULL DEFAULT 'pending'"))
+    conn.execute(text("""
+        UPDATE comicspage
+        SET storage_state = CASE WHEN image_url IS NOT NULL THEN 'uploaded' ELSE 'db_only' END
+    """))
+
+
+@migration("0003_user_storage_usage", "Backfill the per-user storage usage counters")
+def backfill_storage_usage(conn: Connection) -> None:
+    # Image sizes are still on comicimage at this point (a table created after 0005 has none: 0005 is a no-op there too)
+    if "size_bytes" not in _columns(conn, "comicimage"):
+        return
+
+    conn.execute(text("""
+        INSERT INTO userstorageusage (user_id, comic_count, object_count, total_bytes, base64_only_count, updated_at)
+        SELECT u.id,
+               COUNT(c.id),
+               COUNT(c.image_url),
+               COALESCE(SUM(ci.size_bytes) FILTER (WHERE c.image_url IS NOT NULL), 0),
+               COUNT(ci.id) FILTER (WHERE c.image_url IS NULL),
+               now()
+        FROM "user" u
+        LEFT JOIN comicspage c ON c.user_id = u.id
+        LEFT JOIN comicimage ci ON ci.comic_id = c.id
+        GROUP BY u.id
+        ON CONFLICT (user_id) DO UPDATE SET
+            comic_count = EXCLUDED.comic_count,
+            object_count = EXCLUDED.object_count,
+            total_bytes = EXCLUDED.total_bytes,
+            base64_only_count = EXCLUDED.base64_only_count,
+            updated_at = EXCLUDED.updated_at
+    """))
+
+
+@migration("0004_comic_image_content_hash", "Add and backfill ComicImage.content_hash")
+def add_comic_image_content_hash(conn: Connection) -> None:
+    columns = _columns(conn, "comicimage")
+    if "content_hash" not in columns:
+        conn.execute(text("ALTER TABLE comicimage ADD COLUMN content_hash VARCHAR(64)"))
+    if "data" in columns:
+        conn.execute(text("UPDATE comicimage SET content_hash = encode(sha256(data), 'hex') WHERE content_hash IS NULL"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_comicimage_content_hash ON comicimage (content_hash)"))
+
+
+@migration("0005_image_blobs", "Deduplicate comic image bytes into reference counted imageblob rows")
+def move_images_to_blobs(conn: Connection) -> None:
+    if "data" not in _columns(conn, "comicimage"):
+        return
+
+    conn.execute(text("""
+        INSERT INTO imageblob (content_hash, data, content_type, size_bytes, ref_count, created_at)
+        SELECT DISTINCT ON (content_hash) content_hash, data, content_type, size_bytes, 0, created_at
+        FROM comicimage
+        WHERE content_hash IS NOT NULL AND data IS NOT NULL
+        ORDER BY content_hash, id
+        ON CONFLICT (content_hash) DO NOTHING
+    """))
+    conn.execute(text("""
+        UPDATE imageblob b SET ref_count = r.reference_count
+        FROM (SELECT content_hash, COUNT(*) AS reference_count FROM comicimage GROUP BY content_hash) r
+        WHERE r.content_hash = b.content_hash
+    """))
+    # One of the already uploaded copies becomes the shared object; the others stay owned by their comic
+    conn.execute(text("""
+        UPDATE imageblob b SET storage_url = s.image_url
+        FROM (
+            SELECT ci.content_hash, MIN(c.image_url) AS image_url
+            FROM comicimage ci JOIN comicspage c ON c.id = ci.comic_id
+            WHERE c.image_url IS NOT NULL
+            GROUP BY ci.content_hash
+        ) s
+        WHERE s.content_hash = b.content_hash AND b.storage_url IS NULL
+    """))
+    conn.execute(text("ALTER TABLE comicimage DROP COLUMN data, DROP COLUMN content_type, DROP COLUMN size_bytes"))
+
+    # Sizes now come from the blobs
+    conn.execute(text("""
+        INSERT INTO userstorageusage (user_id, comic_count, object_count, total_bytes, base64_only_count, updated_at)
+        SELECT u.id,
+               COUNT(c.id),
+               COUNT(c.image_url),
+               COALESCE(SUM(b.size_bytes) FILTER (WHERE c.image_url IS NOT NULL), 0),
+               COUNT(b.content_hash) FILTER (WHERE c.image_url IS NULL),
+               now()
+        FROM "user" u
+        LEFT JOIN comicspage c ON c.user_id = u.id
+        LEFT JOIN comicimage ci ON ci.comic_id = c.id
+        LEFT JOIN imageblob b ON b.content_hash = ci.content_hash
+        GROUP BY u.id
+        ON CONFLICT (user_id) DO UPDATE SET
+            comic_count = EXCLUDED.comic_count,
+            object_count = EXCLUDED.object_count,
+            total_bytes = EXCLUDED.total_bytes,
+            base64_only_count = EXCLUDED.base64_only_count,
+            updated_at = EXCLUDED.updated_at
+    """))
+
+
+
+# Indexes behind the hot query paths (name -> table, columns and optional partial predicate)
+HOT_PATH_INDEXES = {
+    # /my-comics: a user's comics, newest first
+    "ix_comicspage_user_created": "comicspage (user_id, created_at DESC, id DESC)",
+    # /world-comics and /world-stats: a user's comics in one world, newest first
+    "ix_comicspage_user_world_created": "comicspage (user_id, world_type, created_at DESC, id DESC)",
+    # favorites_only listings and favorite counts only ever touch the favorites
+    "ix_comicspage_user_world_favorites": "comicspage (user_id, world_type, created_at DESC, id DESC) WHERE is_favorite",
+    # /public-comics ranking: most viewed public comics first
+    "ix_comicspage_public_ranking": "comicspage (view_count DESC, created_at DESC, id DESC) WHERE is_public",
+    "ix_detailedscenario_comic_id": "detailedscenario (comic_id)",
+    # /scenarios/user: a user's scenarios, newest first
+    "ix_detailedscenario_user_created": "detailedscenario (user_id, created_at DESC, id DESC)",
+    "ix_comiccollectionitem_collection_id": "comiccollectionitem (collection_id)",
+    "ix_analyticsinsight_user_type": "analyticsinsight (user_id, insight_type)",
+}
+
+
+@migration("0006_hot_path_indexes", "Composite and partial indexes for the comic listing, scenario, collection and insight queries")
+def create_hot_path_indexes(conn: Connection) -> None:
+    for name, definition in HOT_PATH_INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+    conn.execute(text("ANALYZE comicspage, detailedscenario, comiccollectionitem, analyticsinsight"))
+
+
+# Keyset pagination sorts on (..., created_at, id): listing indexes carry id as the tie-breaker
+KEYSET_INDEXES = [
+    "ix_comicspage_user_created",
+    "ix_comicspage_user_world_created",
+    "ix_comicspage_user_world_favorites",
+    "ix_comicspage_public_ranking",
+    "ix_detailedscenario_user_created",
+]
+
+
+@migration("0007_keyset_indexes", "Add id as tie-breaker to the listing indexes for cursor pagination")
+def create_keyset_indexes(conn: Connection) -> None:
+    for name in KEYSET_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text(f"CREATE INDEX {name} ON {HOT_PATH_INDEXES[name]}"))
+
+
+@migration("0008_world_stats", "Maintained world stats per (user, world) and collection comic counts")
+def create_world_stats(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE worldstats ADD COLUMN IF NOT EXISTS total_collections INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text("ALTER TABLE comiccollection ADD COLUMN IF NOT EXISTS comic_count INTEGER NOT NULL DEFAULT 0"))
+    # Nothing maintained the table before, the reconcile below rebuilds every row
+    conn.execute(text("DELETE FROM worldstats"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_worldstats_user_world ON worldstats (user_id, world_type)"))
+
+    conn.execute(text("""
+        INSERT INTO worldstats (user_id, world_type, total_comics, favorite_comics, public_comics, total_collections, created_at, updated_at)
+        SELECT k.user_id, k.world_type,
+               COALESCE(c.comics, 0), COALESCE(c.favorites, 0), COALESCE(c.publics, 0), COALESCE(col.collections, 0),
+               now(), now()
+        FROM (
+            SELECT user_id, world_type FROM comicspage
+            UNION SELECT user_id, world_type FROM comiccollection
+        ) k
+        LEFT JOIN (
+            SELECT user_id, world_type,
+                   COUNT(*) AS comics,
+                   COUNT(*) FILTER (WHERE is_favorite) AS favorites,
+                   COUNT(*) FILTER (WHERE is_public) AS publics
+            FROM comicspage GROUP BY user_id, world_type
+        ) c ON c.user_id = k.user_id AND c.world_type = k.world_type
+        LEFT JOIN (
+            SELECT user_id, world_type, COUNT(*) AS collections
+            FROM comiccollection GROUP BY user_id, world_type
+        ) col ON col.user_id = k.user_id AND col.world_type = k.world_type
+    """))
+    conn.execute(text("""
+        UPDATE comiccollection cc SET comic_count = i.items
+        FROM (SELECT collection_id, COUNT(*) AS items FROM comiccollectionitem GROUP BY collection_id) i
+        WHERE i.collection_id = cc.id
+    """))
+
+
+@migration("0009_public_feed_rank", "Precomputed public feed ranking")
+def create_public_feed_rank(conn: Connection) -> None:
+    # The feed now reads publicfeedrank; this index only slowed down view count updates
+    conn.execute(text("DROP INDEX IF EXISTS ix_comicspage_public_ranking"))
+
+    # First ranking with the default gravity; the public_feed_refresh job takes over from there
+    conn.execute(text("DELETE FROM publicfeedrank"))
+    conn.execute(text("""
+        INSERT INTO publicfeedrank (comic_id, rank, score, refreshed_at)
+        SELECT id, row_number() OVER (ORDER BY score DESC, id DESC), score, now()
+        FROM (
+            SELECT id, (view_count + 1) / power(GREATEST(EXTRACT(EPOCH FROM now() - created_at) / 3600, 0) + 2, 1.5) AS score
+            FROM comicspage
+            WHERE is_public
+        ) scored
+    """))
+
+
+@migration("0010_comic_daily_rollup", "Daily analytics rollups, backfilled in the background")
+def create_comic_daily_rollup(conn: Connection) -> None:
+    # Comics up to high_water_id are counted by the rollup_backfill job, newer ones when they are saved
+    conn.execute(text("""
+        INSERT INTO analyticsrollupstate (id, high_water_id, backfilled_id, completed_at)
+        SELECT 1, COALESCE(MAX(id), 0), 0, CASE WHEN COUNT(*) = 0 THEN now() END FROM comicspage
+        ON CONFLICT (id) DO NOTHING
+    """))
+
+
+@migration("0011_insight_fingerprint", "Cache LLM insight results in analyticsinsight")
+def add_insight_fingerprint(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE analyticsinsight ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_analyticsinsight_fingerprint ON analyticsinsight (fingerprint)"))
+
+
+@migration("0012_public_feed_score_order", "Page the public feed by (score, comic_id) and rank published comics at once")
+def add_public_feed_score_order(conn: Connection) -> None:
+    # Comics published between two refreshes are in the feed without a rank
+    conn.execute(text("ALTER TABLE publicfeedrank ALTER COLUMN rank DROP NOT NULL"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_publicfeedrank_score_comic ON publicfeedrank (score DESC, comic_id DESC)"
+    ))
+
+
+@migration("0013_concept_digest_lease", "Lease concept digest folds instead of holding a row lock across the LLM call")
+def add_concept_digest_lease(conn: Connection) -> None:
+    conn.execute(text("ALTER TABLE conceptdigest ADD COLUMN IF NOT EXISTS lease_until TIMESTAMP WITH TIME ZONE"))
+
+
+@migration("0014_rollup_verification", "Verify the analytics rollups against the comics before reading from them")
+def add_rollup_verification(conn: Connection) -> None:
+    # Left NULL even where the backfill completed: the rollup_backfill job re-checks (and repairs) those rollups first
+    conn.execute(text("ALTER TABLE analyticsrollupstate ADD COLUMN IF NOT EXISTS verified_at TIMESTAMP WITH TIME ZONE"))
+
+
+def run_migrations(target: Optional[str] = None) -> None:
+    """Apply every pending migration (up to and including `target`), each in its own transaction"""
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        applied = set(conn.execute(text("SELECT version FROM schemamigration")).scalars())
+
+    for version, description, fn in MIGRATIONS:
+        if version not in applied:
+            print(f"🔧 Applying migration {version}: {description}")
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(
+                    text("INSERT INTO schemamigration (version, description, applied_at) VALUES (:version, :description, now())"),
+                    {"version": version, "description": description}
+                )
+            print(f"✅ Migration {version} applied")
+        if version == target:
+            break
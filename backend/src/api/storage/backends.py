@@ -0,0 +1,36 @@
+import os
+from typing import Optional
+
+from api.storage.base import StorageBackend
+from api.storage.local import LocalStorageBackend, CachingStorageBackend
+from api.supabase.client import supabase_client
+
+# "supabase", "local" or "cached" (local write-through cache in front of Supabase).
+# Defaults to Supabase when it is configured, local disk otherwise.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase" if supabase_client else "local")
+LOCAL_STORAGE_ROOT = os.environ.get("LOCAL_STORAGE_ROOT", "./media")
+LOCAL_STORAGE_PUBLIC_URL = os.environ.get("LOCAL_STORAGE_PUBLIC_URL", "/storage/files")
+# When > 0, image redirects use signed URLs valid for this many seconds instead of public URLs
+STORAGE_SIGNED_URL_SECONDS = int(os.environ.get("STORAGE_SIGNED_URL_SECONDS", "0"))
+
+
+def create_storage_backend() -> Optional[StorageBackend]:
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "local":
+        return LocalStorageBackend(LOCAL_STORAGE_ROOT, LOCAL_STORAGE_PUBLIC_URL)
+
+    if STORAGE_BACKEND == "cached":
+        local = LocalStorageBackend(LOCAL_STORAGE_ROOT, LOCAL_STORAGE_PUBLIC_URL)
+        if supabase_client:
+            return CachingStorageBackend(supabase_client, local)
+        print("⚠️ STORAGE_BACKEND=cached but Supabase is not configured, using local storage only")
+        return local
+
+    if STORAGE_BACKEND != "supabase":
+        print(f"⚠️ Unknown STORAGE_BACKEND '{STORAGE_BACKEND}', falling back to Supabase")
+    return supabase_client
+
+
+# Global instance (None when Supabase is selected but not configured)
+storage_backend = create_storage_backend()
+print(f"🗄️ Image storage backend: {storage_backend.name if storage_backend else 'none (database only)'}")
@@ -0,0 +1,42 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+
+class StorageBackend(ABC):
+    """Object store for comic images (Supabase Storage, local disk, ...)"""
+
+    name: str = "storage"
+
+    @abstractmethod
+    def upload(self, user_id: int, data: bytes, content_type: str = "image/png") -> str:
+        """Store image bytes for a user and return the URL they are served from"""
+
+    @abstractmethod
+    def delete(self, url: str) -> bool:
+        """Delete the object behind a URL returned by upload()"""
+
+    def delete_many(self, urls: List[str]) -> int:
+        """Delete several objects, returns how many were deleted"""
+        return sum(1 for url in urls if self.delete(url))
+
+    def signed_url(self, url: str, expires_in: int) -> str:
+        """Time-limited URL for a private object; public backends return the URL unchanged"""
+        return url
+
+    @abstractmethod
+    def list(self, user_id: int) -> List[Dict]:
+        """List the stored images of a user"""
+
+    @abstractmethod
+    def usage(self, user_id: int) -> Dict:
+        """Storage usage statistics for a user"""
+
+
+def storage_usage(user_id: int, total_files: int, total_size: int) -> Dict:
+    """Usage dictionary shared by all backends"""
+    return {
+        "user_id": user_id,
+        "total_files": total_files,
+        "total_size_bytes": total_size,
+        "total_size_mb": round(total_size / (1024 * 1024), 2)
+    }
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from api.storage.base import StorageBackend, storage_usage
+
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+CONTENT_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+FILE_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp)$")
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Stores images on local disk.
+    Objects are content addressed (sha256) under sharded directories: objects/ab/cd/<sha256>.png
+    Every user gets a hard link to the object in users/<user_id>/, so identical images are stored once
+    and an object is removed from disk when its last link goes away.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, public_url: str):
+        self.root = os.path.abspath(root)
+        self.public_url = public_url.rstrip("/")
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "users"), exist_ok=True)
+
+    def object_path(self, file_name: str) -> str:
+        return os.path.join(self.root, "objects", file_name[:2], file_name[2:4], file_name)
+
+    def user_path(self, user_id: int, file_name: str) -> str:
+        return os.path.join(self.root, "users", str(user_id), file_name)
+
+    def url_for(self, user_id: int, file_name: str) -> str:
+        return f"{self.public_url}/users/{user_id}/{file_name}"
+
+    def parse_url(self, url: str) -> Optional[tuple]:
+        """(user_id, file_name) of a URL returned by upload(), None for foreign URLs"""
+        match = re.search(r"/users/(\d+)/([^/?]+)(?:\?.*)?$", url or "")
+        if not match or not url.startswith(self.public_url) or not FILE_NAME_PATTERN.match(match.group(2)):
+            return None
+        return int(match.group(1)), match.group(2)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """Write to a temp file in the target directory and rename it into place"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _link_atomic(self, source: str, path: str) -> None:
+        """Hard link under a unique temp name in the target directory and rename it into place"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        while True:
+            # os.link cannot overwrite, so the name comes from mktemp; a name taken meanwhile is just retried
+            tmp_path = tempfile.mktemp(dir=directory, prefix=".tmp-")
+            try:
+                os.link(source, tmp_path)
+                break
+            except FileExistsError:
+                continue
+        try:
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def store(self, user_id: int, data: bytes, content_type: str = "image/png") -> str:
+        """Write the object (if new) and the user's link to it, returns the file name"""
+        file_name = f"{hashlib.sha256(data).hexdigest()}.{EXTENSIONS.get(content_type, 'png')}"
+        object_path = self.object_path(file_name)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, data)
+        user_path = self.user_path(user_id, file_name)
+        if not os.path.exists(user_path):
+            self._link_atomic(object_path, user_path)
+        return file_name
+
+    def upload(self, user_id: int, data: bytes, content_type: str = "image/png") -> str:
+        return self.url_for(user_id, self.store(user_id, data, content_type))
+
+    def remove(self, user_id: int, file_name: str) -> bool:
+        """Remove the user's link and the object once nobody links to it anymore"""
+        user_path = self.user_path(user_id, file_name)
+        if not os.path.exists(user_path):
+            return False
+        os.unlink(user_path)
+        object_path = self.object_path(file_name)
+        try:
+            if os.stat(object_path).st_nlink <= 1:
+                os.unlink(object_path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def fetch(self, user_id: int, file_name: str) -> Optional[str]:
+        """Local path of a stored file, None if it does not exist"""
+        path = self.user_path(user_id, file_name)
+        return path if os.path.exists(path) else None
+
+    def delete(self, url: str) -> bool:
+        parsed = self.parse_url(url)
+        if not parsed:
+            print(f"⚠️ Not a local storage URL: {url}")
+            return False
+        return self.remove(*parsed)
+
+    def list(self, user_id: int) -> List[Dict]:
+        directory = os.path.join(self.root, "users", str(user_id))
+        if not os.path.isdir(directory):
+            return []
+
+        comics = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not FILE_NAME_PATTERN.match(entry.name):
+                    continue
+                stat = entry.stat()
+                comics.append({
+                    "filename": entry.name,
+                    "path": f"users/{user_id}/{entry.name}",
+                    "url": self.url_for(user_id, entry.name),
+                    "size": stat.st_size,
+                    "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+                    "updated_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+                })
+        return comics
+
+    def usage(self, user_id: int) -> Dict:
+        files = self.list(user_id)
+        return storage_usage(user_id, len(files), sum(file["size"] for file in files))
+
+
+class CachingStorageBackend(StorageBackend):
+    """
+    Write-through cache: every upload goes to the local disk and to the primary backend.
+    Files are served from the local copy; a missing copy (e.g. on another node) is fetched
+    from the primary once and kept. The primary object uses the same content-addressed name.
+    """
+
+    def __init__(self, primary, cache: LocalStorageBackend):
+        self.primary = primary
+        self.cache = cache
+        self.name = f"{primary.name}+local"
+
+    def upload(self, user_id: int, data: bytes, content_type: str = "image/png") -> str:
+        file_name = self.cache.store(user_id, data, content_type)
+        # Same bytes, same name: re-uploading an image the primary already has must not fail
+        self.primary.upload_comic_bytes(user_id, data, content_type, file_name=file_name, upsert=True)
+        return self.cache.url_for(user_id, file_name)
+
+    def fetch(self, user_id: int, file_name: str) -> Optional[str]:
+        """Local path of a cached file, downloading it from the primary on a miss"""
+        path = self.cache.user_path(user_id, file_name)
+        if os.path.exists(path):
+            return path
+        data = self.primary.download(user_id, file_name)
+        if not data:
+            return None
+        content_type = CONTENT_TYPES.get(file_name.rsplit(".", 1)[-1], "image/png")
+        self.cache.store(user_id, data, content_type)
+        return path
+
+    def delete(self, url: str) -> bool:
+        parsed = self.cache.parse_url(url)
+        if not parsed:
+            # URLs stored before the cache was enabled point straight to the primary
+            return self.primary.delete(url)
+        user_id, file_name = parsed
+        self.cache.remove(user_id, file_name)
+        return self.primary.delete(self.primary.public_url_for(user_id, file_name))
+
+    def delete_many(self, urls: List[str]) -> int:
+        primary_urls = []
+        for url in urls:
+            parsed = self.cache.parse_url(url)
+            if parsed:
+                self.cache.remove(*parsed)
+                primary_urls.append(self.primary.public_url_for(*parsed))
+            else:
+                primary_urls.append(url)
+        return self.primary.delete_many(primary_urls)
+
+    def list(self, user_id: int) -> List[Dict]:
+        return self.primary.list(user_id)
+
+    def usage(self, user_id: int) -> Dict:
+        return self.primary.usage(user_id)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger
+from sqlmodel import SQLModel, Field
+
+
+class ImageUploadOutbox(SQLModel, table=True):
+    """Pending upload of a comic image to object storage, written in the same transaction as the comic"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    comic_id: int = Field(foreign_key="comicspage.id", unique=True, index=True)
+    user_id: int = Field(foreign_key="user.id")
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_error: Optional[str] = Field(default=None, max_length=1000)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class UserStorageUsage(SQLModel, table=True):
+    """Per-user image storage counters, kept up to date with every comic upload and delete"""
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    comic_count: int = Field(default=0)
+    object_count: int = Field(default=0)  # images in object storage
+    total_bytes: int = Field(default=0, sa_type=BigInteger)  # size of the images in object storage
+    base64_only_count: int = Field(default=0)  # images only stored in the database
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
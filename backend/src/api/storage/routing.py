@@ -0,0 +1,29 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from api.storage.backends import storage_backend
+from api.storage.local import FILE_NAME_PATTERN, CONTENT_TYPES
+from api.utils.http_cache import etag_matches
+
+router = APIRouter()
+
+
+@router.get("/files/users/{user_id}/{file_name}")
+async def get_stored_file(user_id: int, file_name: str, request: Request):
+    """Serve a comic image from local storage (supports ETag / If-None-Match and Range requests)"""
+    if not FILE_NAME_PATTERN.match(file_name) or not hasattr(storage_backend, "fetch"):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    path = await asyncio.to_thread(storage_backend.fetch, user_id, file_name)
+    if not path:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # File names are content hashes, so the ETag never changes and the file can be cached forever
+    etag = f'"{file_name.split(".")[0]}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=CONTENT_TYPES[file_name.rsplit(".", 1)[-1]], headers=headers)
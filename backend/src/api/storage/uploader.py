@@ -0,0 +1,236 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlmodel import Session, select, update, delete, func
+
+from api.db import engine
+from api.chat.models import ComicsPage, ImageBlob, StorageState
+from api.chat.images import add_comic_image, get_comic_image
+from api.storage.models import ImageUploadOutbox
+from api.storage.backends import storage_backend
+from api.storage.usage import adjust_storage_usage
+from api.utils.metrics import metrics, cached_gauge
+
+UPLOAD_CONCURRENCY = int(os.environ.get("IMAGE_UPLOAD_CONCURRENCY", "4"))
+UPLOAD_MAX_ATTEMPTS = int(os.environ.get("IMAGE_UPLOAD_MAX_ATTEMPTS", "6"))
+UPLOAD_RETRY_BASE_SECONDS = float(os.environ.get("IMAGE_UPLOAD_RETRY_BASE_SECONDS", "5"))
+UPLOAD_RETRY_MAX_SECONDS = 3600
+UPLOAD_POLL_SECONDS = float(os.environ.get("IMAGE_UPLOAD_POLL_SECONDS", "30"))
+# A claimed row is hidden from other workers for this long; if we crash it becomes due again
+UPLOAD_LEASE_SECONDS = 300
+
+
+def enqueue_image_upload(session: Session, comic: ComicsPage) -> Optional[ImageUploadOutbox]:
+    """Stage the upload of a comic's image in the same transaction as the comic (caller commits)"""
+    if storage_backend is None:
+        comic.storage_state = StorageState.DB_ONLY.value
+        session.add(comic)
+        return None
+
+    comic.storage_state = StorageState.PENDING.value
+    session.add(comic)
+    outbox = ImageUploadOutbox(comic_id=comic.id, user_id=comic.user_id)
+    session.add(outbox)
+    return outbox
+
+
+def store_comic_image(session: Session, comic: ComicsPage, data: bytes, content_type: str = "image/png") -> None:
+    """
+    Save the image of a new comic and queue its upload (caller commits).
+    When identical bytes are already in object storage the comic points at that object instead.
+    """
+    storage_url = add_comic_image(session, comic.id, data, content_type)
+    if storage_url:
+        comic.image_url = storage_url
+        comic.storage_state = StorageState.UPLOADED.value
+        session.add(comic)
+        adjust_storage_usage(session, comic.user_id, comics=1, objects=1, size_bytes=len(data))
+        metrics.incr("storage.uploads_deduplicated")
+        return
+
+    enqueue_image_upload(session, comic)
+    adjust_storage_usage(session, comic.user_id, comics=1, base64_only=1)
+
+
+def delete_pending_uploads(session: Session, *comic_ids: int) -> None:
+    """Drop queued uploads of comics that are being deleted (caller commits)"""
+    if comic_ids:
+        session.exec(delete(ImageUploadOutbox).where(ImageUploadOutbox.comic_id.in_(comic_ids)))
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff: base, 2x base, 4x base ... capped at one hour"""
+    return min(UPLOAD_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), UPLOAD_RETRY_MAX_SECONDS)
+
+
+class ImageUploader:
+    """
+    Drains the image upload outbox in the background.
+    Uploads run with bounded concurrency; blocking storage and DB calls are moved off the event loop.
+    """
+
+    def __init__(self, concurrency: int = UPLOAD_CONCURRENCY):
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task or storage_backend is None:
+            return
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        print(f"📤 Image uploader started (concurrency {self.concurrency})")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        print("📤 Image uploader stopped")
+
+    def notify(self) -> None:
+        """Wake the uploader right away instead of waiting for the next poll"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                jobs = await asyncio.to_thread(self._claim_due, self.concurrency * 2)
+                if jobs:
+                    await asyncio.gather(*(self._upload(*job) for job in jobs))
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Image uploader loop error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=UPLOAD_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim_due(self, limit: int) -> List[Tuple[int, int, int, int]]:
+        """Lease due outbox rows so concurrent workers never upload the same image twice"""
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            rows = session.exec(
+                select(ImageUploadOutbox)
+                .where(ImageUploadOutbox.next_attempt_at <= now)
+                .order_by(ImageUploadOutbox.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            ).all()
+            jobs = [(row.id, row.comic_id, row.user_id, row.attempts) for row in rows]
+            for row in rows:
+                row.next_attempt_at = now + timedelta(seconds=UPLOAD_LEASE_SECONDS)
+                session.add(row)
+            session.commit()
+        return jobs
+
+    async def _upload(self, outbox_id: int, comic_id: int, user_id: int, attempts: int) -> None:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                blob = await asyncio.to_thread(self._load_image, comic_id)
+                if blob is None:
+                    raise ValueError(f"No stored image bytes for comic {comic_id}")
+                if blob.storage_url:
+                    # An identical image was uploaded for another comic in the meantime
+                    image_url = blob.storage_url
+                    metrics.incr("storage.uploads_deduplicated")
+                else:
+                    image_url = await asyncio.to_thread(storage_backend.upload, user_id, blob.data, blob.content_type)
+                    metrics.incr("storage.uploads_succeeded")
+                await asyncio.to_thread(
+                    self._mark_uploaded, outbox_id, comic_id, user_id, blob.content_hash, image_url, blob.size_bytes
+                )
+            except Exception as e:
+                metrics.incr("storage.upload_failures")
+                print(f"⚠️ Upload of comic {comic_id} failed (attempt {attempts + 1}): {e}")
+                await asyncio.to_thread(self._mark_failed, outbox_id, comic_id, attempts + 1, str(e))
+            finally:
+                self.in_flight -= 1
+
+    def _load_image(self, comic_id: int) -> Optional[ImageBlob]:
+        with Session(engine, expire_on_commit=False) as session:
+            return get_comic_image(session, comic_id)
+
+    def _mark_uploaded(
+        self,
+        outbox_id: int,
+        comic_id: int,
+        user_id: int,
+        digest: str,
+        image_url: str,
+        size_bytes: int
+    ) -> None:
+        orphaned_url = None
+        with Session(engine) as session:
+            # The first upload of a blob becomes its shared object
+            session.exec(
+                update(ImageBlob)
+                .where(ImageBlob.content_hash == digest, ImageBlob.storage_url.is_(None))
+                .values(storage_url=image_url)
+            )
+            shared_url = session.exec(select(ImageBlob.storage_url).where(ImageBlob.content_hash == digest)).first()
+            if shared_url != image_url:
+                # Another worker uploaded the same bytes first, or the blob is gone because the comic was deleted
+                orphaned_url = image_url
+
+            if shared_url:
+                result = session.exec(
+                    update(ComicsPage)
+                    .where(ComicsPage.id == comic_id, ComicsPage.image_url.is_(None))
+                    .values(image_url=shared_url, storage_state=StorageState.UPLOADED.value)
+                )
+                if result.rowcount:
+                    adjust_storage_usage(session, user_id, objects=1, size_bytes=size_bytes, base64_only=-1)
+            session.exec(delete(ImageUploadOutbox).where(ImageUploadOutbox.id == outbox_id))
+            session.commit()
+
+        if orphaned_url:
+            storage_backend.delete(orphaned_url)
+
+    def _mark_failed(self, outbox_id: int, comic_id: int, attempts: int, error: str) -> None:
+        with Session(engine) as session:
+            if attempts >= UPLOAD_MAX_ATTEMPTS:
+                session.exec(delete(ImageUploadOutbox).where(ImageUploadOutbox.id == outbox_id))
+                session.exec(
+                    update(ComicsPage)
+                    .where(ComicsPage.id == comic_id)
+                    .values(storage_state=StorageState.FAILED.value)
+                )
+                metrics.incr("storage.uploads_abandoned")
+            else:
+                session.exec(
+                    update(ImageUploadOutbox)
+                    .where(ImageUploadOutbox.id == outbox_id)
+                    .values(
+                        attempts=attempts,
+                        last_error=error[:1000],
+                        next_attempt_at=datetime.utcnow() + timedelta(seconds=retry_delay(attempts))
+                    )
+                )
+            session.commit()
+
+
+def pending_upload_count() -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count(ImageUploadOutbox.id))).one()
+
+
+# Global instance
+image_uploader = ImageUploader()
+metrics.register_gauge("storage.uploads_in_flight", lambda: image_uploader.in_flight)
+metrics.register_gauge("storage.upload_queue_depth", cached_gauge(pending_upload_count))
@@ -0,0 +1,124 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, delete, func
+
+from api.db import engine
+from api.chat.models import ComicsPage, ComicImage, ImageBlob
+from api.storage.models import UserStorageUsage
+from api.utils.metrics import metrics
+from api.utils.scheduler import scheduler
+
+STORAGE_USAGE_RECONCILE_SECONDS = float(os.environ.get("STORAGE_USAGE_RECONCILE_SECONDS", "21600"))
+
+# Recomputes every user's counters from comicspage/comicimage and only rewrites rows that drifted
+RECONCILE_STORAGE_USAGE_SQL = """
+    INSERT INTO userstorageusage (user_id, comic_count, object_count, total_bytes, base64_only_count, updated_at)
+    SELECT u.id,
+           COUNT(c.id),
+           COUNT(c.image_url),
+           COALESCE(SUM(b.size_bytes) FILTER (WHERE c.image_url IS NOT NULL), 0),
+           COUNT(b.content_hash) FILTER (WHERE c.image_url IS NULL),
+           now()
+    FROM "user" u
+    LEFT JOIN comicspage c ON c.user_id = u.id
+    LEFT JOIN comicimage ci ON ci.comic_id = c.id
+    LEFT JOIN imageblob b ON b.content_hash = ci.content_hash
+    GROUP BY u.id
+    ON CONFLICT (user_id) DO UPDATE SET
+        comic_count = EXCLUDED.comic_count,
+        object_count = EXCLUDED.object_count,
+        total_bytes = EXCLUDED.total_bytes,
+        base64_only_count = EXCLUDED.base64_only_count,
+        updated_at = EXCLUDED.updated_at
+    WHERE (userstorageusage.comic_count, userstorageusage.object_count,
+           userstorageusage.total_bytes, userstorageusage.base64_only_count)
+          IS DISTINCT FROM
+          (EXCLUDED.comic_count, EXCLUDED.object_count, EXCLUDED.total_bytes, EXCLUDED.base64_only_count)
+"""
+
+
+def adjust_storage_usage(
+    session: Session,
+    user_id: int,
+    comics: int = 0,
+    objects: int = 0,
+    size_bytes: int = 0,
+    base64_only: int = 0
+) -> None:
+    """Add deltas to a user's storage counters in the current transaction (caller commits)"""
+    statement = insert(UserStorageUsage).values(
+        user_id=user_id,
+        comic_count=comics,
+        object_count=objects,
+        total_bytes=size_bytes,
+        base64_only_count=base64_only,
+        updated_at=datetime.utcnow()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[UserStorageUsage.user_id],
+        set_={
+            "comic_count": UserStorageUsage.comic_count + statement.excluded.comic_count,
+            "object_count": UserStorageUsage.object_count + statement.excluded.object_count,
+            "total_bytes": UserStorageUsage.total_bytes + statement.excluded.total_bytes,
+            "base64_only_count": UserStorageUsage.base64_only_count + statement.excluded.base64_only_count,
+            "updated_at": statement.excluded.updated_at
+        }
+    )
+    session.exec(statement)
+
+
+def record_comics_removed(session: Session, user_id: int, comic_ids: Optional[List[int]] = None) -> None:
+    """Subtract the comics about to be deleted from the user's counters (call before deleting them)"""
+    query = (
+        select(
+            func.count(ComicsPage.id),
+            func.count(ComicsPage.image_url),
+            func.coalesce(func.sum(ImageBlob.size_bytes).filter(ComicsPage.image_url.isnot(None)), 0),
+            func.count(ImageBlob.content_hash).filter(ComicsPage.image_url.is_(None))
+        )
+        .select_from(ComicsPage)
+        .outerjoin(ComicImage, ComicImage.comic_id == ComicsPage.id)
+        .outerjoin(ImageBlob, ImageBlob.content_hash == ComicImage.content_hash)
+        .where(ComicsPage.user_id == user_id)
+    )
+    if comic_ids is not None:
+        query = query.where(ComicsPage.id.in_(comic_ids))
+    comics, objects, size_bytes, base64_only = session.exec(query).one()
+    if comics:
+        adjust_storage_usage(session, user_id, -comics, -objects, -size_bytes, -base64_only)
+
+
+def delete_storage_usage(session: Session, user_id: int) -> None:
+    session.exec(delete(UserStorageUsage).where(UserStorageUsage.user_id == user_id))
+
+
+def get_storage_usage(session: Session, user_id: int) -> Dict:
+    """O(1) storage usage of a user, read from the maintained counters"""
+    usage = session.get(UserStorageUsage, user_id) or UserStorageUsage(user_id=user_id)
+    return {
+        "user_id": user_id,
+        "total_comics": usage.comic_count,
+        "total_files": usage.object_count,
+        "total_size_bytes": usage.total_bytes,
+        "total_size_mb": round(usage.total_bytes / (1024 * 1024), 2),
+        "base64_only_count": usage.base64_only_count,
+        "comics_no_image": max(usage.comic_count - usage.object_count - usage.base64_only_count, 0),
+        "updated_at": usage.updated_at.isoformat()
+    }
+
+
+def reconcile_storage_usage() -> int:
+    """Fix counter drift; returns the number of users whose counters were corrected"""
+    with engine.begin() as conn:
+        corrected = conn.execute(text(RECONCILE_STORAGE_USAGE_SQL)).rowcount
+    metrics.incr("storage.usage_rows_reconciled", corrected)
+    if corrected:
+        print(f"🔧 Reconciled storage usage counters of {corrected} users")
+    return corrected
+
+
+scheduler.add("storage_usage_reconcile", STORAGE_USAGE_RECONCILE_SECONDS, reconcile_storage_usage)
@@ -1,16 +1,19 @@
 import os
 from supabase import create_client, Client
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import io
 import uuid
 from PIL import Image
 import logging
+from api.storage.base import StorageBackend
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SupabaseClient:
+class SupabaseClient(StorageBackend):
+    name = "supabase"
+    
     def __init__(self):
         self.url = os.getenv("SUPABASE_URL")
         self.key = os.getenv("SUPABASE_ANON_KEY")
@@ -68,23 +71,36 @@ class SupabaseClient:
     
     def upload_comic_image(self, user_id: int, image: Image.Image) -> str:
         """Upload a comic image to Supabase Storage and return the public URL"""
+        # Convert PIL Image to bytes
+        img_byte_arr = io.BytesIO()
+        image.save(img_byte_arr, format='PNG', optimize=True, quality=85)
+        return self.upload_comic_bytes(user_id, img_byte_arr.getvalue())
+    
+    def upload_comic_bytes(
+        self,
+        user_id: int,
+        data: bytes,
+        content_type: str = "image/png",
+        file_name: Optional[str] = None,
+        upsert: bool = False
+    ) -> str:
+        """
+        Upload already encoded comic image bytes to Supabase Storage and return the public URL.
+        upsert=True overwrites an existing object of the same name instead of failing (content-addressed names).
+        """
         try:
-            # Generate unique filename
-            file_id = str(uuid.uuid4())
-            file_path = f"users/{user_id}/comics/{file_id}.png"
-            
-            # Convert PIL Image to bytes
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG', optimize=True, quality=85)
-            img_byte_arr.seek(0)
+            # Generate unique filename unless the caller chose one
+            file_name = file_name or f"{uuid.uuid4()}.png"
+            file_path = f"users/{user_id}/comics/{file_name}"
             
             # Upload to Supabase Storage
             response = self.client.storage.from_(self.bucket_name).upload(
                 path=file_path,
-                file=img_byte_arr.getvalue(),
+                file=data,
                 file_options={
-                    "content-type": "image/png",
-                    "cache-control": "3600"
+                    "content-type": content_type,
+                    "cache-control": "3600",
+                    "upsert": "true" if upsert else "false"
                 }
             )
             
@@ -113,9 +129,7 @@ class SupabaseClient:
             
             # Parse the file path from the URL
             try:
-                file_path = image_url.split(f"{self.bucket_name}/")[-1]
-                # Remove query parameters (like ?t=timestamp) from the file path
-                file_path = file_path.split('?')[0]
+                file_path = self._path_from_url(image_url)
                 logger.info(f"   📂 Extracted file path: {file_path}")
             except Exception as path_error:
                 logger.error(f"❌ Failed to extract file path from URL {image_url}: {path_error}")
@@ -163,6 +177,57 @@ class SupabaseClient:
             
             return False
     
+    def _path_from_url(self, image_url: str) -> str:
+        """Object path inside the bucket, without query parameters (like ?t=timestamp)"""
+        return image_url.split(f"{self.bucket_name}/")[-1].split('?')[0]
+    
+    def delete_many(self, urls: List[str]) -> int:
+        """Delete several comic images with a single Supabase Storage request"""
+        file_paths = [self._path_from_url(url) for url in urls if self.bucket_name in url]
+        if not file_paths:
+            return 0
+        try:
+            response = self.client.storage.from_(self.bucket_name).remove(file_paths)
+            deleted = len(response) if isinstance(response, list) else len(file_paths)
+            logger.info(f"✅ Deleted {deleted}/{len(file_paths)} comic images from Supabase Storage")
+            return deleted
+        except Exception as e:
+            logger.error(f"❌ Error deleting {len(file_paths)} comic images: {e}")
+            return 0
+    
+    def public_url_for(self, user_id: int, file_name: str) -> str:
+        return self.client.storage.from_(self.bucket_name).get_public_url(f"users/{user_id}/comics/{file_name}")
+    
+    def signed_url(self, url: str, expires_in: int) -> str:
+        """Signed URL for a comic image, falls back to the public URL"""
+        try:
+            response = self.client.storage.from_(self.bucket_name).create_signed_url(self._path_from_url(url), expires_in)
+            return response.get("signedURL") or response.get("signedUrl") or url
+        except Exception as e:
+            logger.error(f"Error signing comic image URL {url}: {e}")
+            return url
+    
+    def download(self, user_id: int, file_name: str) -> Optional[bytes]:
+        """Download a comic image from Supabase Storage"""
+        try:
+            return self.client.storage.from_(self.bucket_name).download(f"users/{user_id}/comics/{file_name}")
+        except Exception as e:
+            logger.error(f"Error downloading comic image {file_name} for user {user_id}: {e}")
+            return None
+    
+    # StorageBackend interface
+    def upload(self, user_id: int, data: bytes, content_type: str = "image/png") -> str:
+        return self.upload_comic_bytes(user_id, data, content_type)
+    
+    def delete(self, url: str) -> bool:
+        return self.delete_comic_image(url)
+    
+    def list(self, user_id: int) -> List[Dict]:
+        return self.list_user_comics(user_id)
+    
+    def usage(self, user_id: int) -> Dict:
+        return self.get_user_comics_storage_usage(user_id)
+    
     def get_user_comics_storage_usage(self, user_id: int) -> Dict:
         """Get storage usage statistics for a user"""
         try:
@@ -273,10 +338,22 @@ class SupabaseClient:
             logger.error(f"❌ Error retrieving scenario for comic {comic_id}: {e}")
             return None
     
-    def get_user_scenarios_from_database(self, user_id: int, limit: int = 20, offset: int = 0) -> List[Dict]:
-        """Get user's scenarios from Supabase database"""
+    def get_user_scenarios_from_database(
+        self,
+        user_id: int,
+        limit: int = 20,
+        offset: int = 0,
+        after: Optional[Tuple[str, int]] = None
+    ) -> List[Dict]:
+        """Get user's scenarios from Supabase database, newest first; `after` is the (created_at, id) of the previous page's last row"""
         try:
-            result = self.client.table('detailedscenario').select('*').eq('user_id', user_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+            query = self.client.table('detailedscenario').select('*').eq('user_id', user_id)
+            if after:
+                created_at, scenario_id = after
+                query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{scenario_id})').limit(limit)
+            else:
+                query = query.range(offset, offset + limit - 1)
+            result = query.order('created_at', desc=True).order('id', desc=True).execute()
             
             if result.data:
                 logger.info(f"✅ Retrieved {len(result.data)} scenarios for user {user_id}")
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlmodel import Session
 from typing import Dict, List, Optional
-from api.db import get_session
+from api.db import get_read_session
 from api.auth.utils import get_current_user
 from api.auth.models import User
 from api.supabase.client import supabase_client
+from api.storage.usage import get_storage_usage
+from api.utils.pagination import decode_cursor, page_limit, split_page, set_next_cursor
 from api.ai.schemas import ScenarioSaveRequest, DetailedScenarioSchema
 import json
 from datetime import datetime
@@ -33,7 +35,8 @@ def test_supabase_connection() -> Dict:
 @router.get("/storage/user/{user_id}/usage")
 def get_user_storage_usage(
     user_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session)
 ) -> Dict:
     """Get storage usage statistics for the current user"""
     # Users can only access their own storage stats
@@ -43,14 +46,8 @@ def get_user_storage_usage(
             detail="Access denied. You can only view your own storage usage."
         )
     
-    if not supabase_client:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Supabase client not available"
-        )
-    
-    usage_stats = supabase_client.get_user_comics_storage_usage(user_id)
-    return usage_stats
+    # Maintained counters instead of listing the user's storage folder
+    return get_storage_usage(session, user_id)
 
 @router.get("/storage/user/{user_id}/comics")
 def list_user_comics_storage(
@@ -190,11 +187,13 @@ def get_scenario_by_comic(
 @router.get("/scenarios/user/{user_id}")
 def get_user_scenarios(
     user_id: int,
+    response: Response,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ) -> List[Dict]:
-    """Get all scenarios for a specific user"""
+    """Get all scenarios for a specific user, newest first (the next page's cursor is in X-Next-Cursor)"""
     # Users can only access their own scenarios
     if current_user.id != user_id:
         raise HTTPException(
@@ -208,7 +207,12 @@ def get_user_scenarios(
             detail="Supabase client not available"
         )
     
-    scenarios = supabase_client.get_user_scenarios_from_database(user_id, limit, offset)
+    limit = page_limit(limit)
+    after = decode_cursor(cursor, str, int) if cursor else None
+    rows = supabase_client.get_user_scenarios_from_database(user_id, limit + 1, offset, after)
+    
+    scenarios, next_cursor = split_page(rows, limit, lambda scenario: (scenario["created_at"], scenario["id"]))
+    set_next_cursor(response, next_cursor)
     return scenarios
 
 @router.put("/scenarios/{scenario_id}")
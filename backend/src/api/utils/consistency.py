@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import Request
+
+from api.utils.metrics import metrics
+
+# After a write, a client's reads stay on the primary for this long (covers the replica's replication lag)
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", "5"))
+# Set on responses to writes, so the window also holds when the next request lands on another worker
+LAST_WRITE_COOKIE = "mt_last_write"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def client_key(request: Request) -> Optional[str]:
+    """Who is reading/writing: the bearer token of the request (None for anonymous requests)"""
+    return request.headers.get("authorization")
+
+
+class RecentWrites:
+    """Clients that wrote within the read-your-writes window, in this worker"""
+
+    def __init__(self, window_seconds: float = READ_YOUR_WRITES_SECONDS, max_clients: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_clients = max_clients
+        self._until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) >= self.max_clients:
+                self._until = {k: until for k, until in self._until.items() if until > now}
+            self._until[key] = now + self.window_seconds
+
+    def is_recent(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        with self._lock:
+            until = self._until.get(key)
+        return until is not None and until > time.monotonic()
+
+
+# Global instance
+recent_writes = RecentWrites()
+
+
+def recently_wrote(request: Request) -> bool:
+    """Whether the client is within its read-your-writes window"""
+    return LAST_WRITE_COOKIE in request.cookies or recent_writes.is_recent(client_key(request))
+
+
+def reads_from_primary(request: Request) -> bool:
+    """Whether a read-only route must still use the primary because the client has just written"""
+    primary = recently_wrote(request)
+    metrics.incr("db.reads_on_primary" if primary else "db.reads_on_replica")
+    return primary
+
+
+async def track_writes(request: Request, call_next):
+    """
+    HTTP middleware: a successful request with an unsafe method opens the client's read-your-writes window,
+    unless its route only reads (it took a read session, e.g. POST /world-comics)
+    """
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS and response.status_code < 400 and not getattr(request.state, "read_only", False):
+        key = client_key(request)
+        if key:
+            recent_writes.mark(key)
+        response.set_cookie(LAST_WRITE_COOKIE, "1", max_age=max(1, round(READ_YOUR_WRITES_SECONDS)), httponly=True, samesite="lax")
+    return response
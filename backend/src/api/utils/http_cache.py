@@ -0,0 +1,48 @@
+from typing import Dict, List, Optional
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def parse_accept(accept: str) -> Dict[str, float]:
+    """Media ranges of an Accept header with their q-values"""
+    ranges = {}
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranges[media_type.lower()] = q
+    return ranges
+
+
+def negotiate_media_type(accept: Optional[str], available: List[str]) -> Optional[str]:
+    """
+    Pick the best of `available` (ordered by our preference) for an Accept header.
+    Explicitly listed types beat wildcards with the same q-value. None when nothing is acceptable.
+    """
+    if not accept:
+        return available[0]
+
+    ranges = parse_accept(accept)
+    best, best_score = None, None
+    for index, media_type in enumerate(available):
+        if media_type in ranges:
+            q, explicit = ranges[media_type], 1
+        else:
+            q = ranges.get(media_type.split("/")[0] + "/*", ranges.get("*/*", 0.0))
+            explicit = 0
+        score = (q, explicit, -index)
+        if q > 0 and (best_score is None or score > best_score):
+            best, best_score = media_type, score
+    return best
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Gauges backed by database queries are recomputed at most this often, however often /metrics is scraped
+METRICS_QUERY_GAUGE_SECONDS = float(os.environ.get("METRICS_QUERY_GAUGE_SECONDS", "30"))
+
+
+class MetricsRegistry:
+    """Small in-process registry of counters and gauges, exposed on /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment a counter (created on first use)"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def register_gauge(self, name: str, getter: Callable[[], float]) -> None:
+        """Register a callable that is evaluated every time a snapshot is taken"""
+        with self._lock:
+            self._gauges[name] = getter
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the current value of every counter and gauge"""
+        with self._lock:
+            values = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        for name, getter in gauges.items():
+            try:
+                values[name] = getter()
+            except Exception as e:
+                print(f"⚠️ Failed to read gauge {name}: {e}")
+        return dict(sorted(values.items()))
+
+
+def cached_gauge(getter: Callable[[], Any], ttl_seconds: float = METRICS_QUERY_GAUGE_SECONDS) -> Callable[[], Any]:
+    """Wrap an expensive gauge getter (a query) so snapshots reuse its value for ttl_seconds"""
+    lock = threading.Lock()
+    cached: Optional[Tuple[Any, float]] = None
+
+    def get() -> Any:
+        nonlocal cached
+        with lock:
+            if cached is None or cached[1] < time.monotonic():
+                cached = (getter(), time.monotonic() + ttl_seconds)
+            return cached[0]
+    return get
+
+
+# Global instance
+metrics = MetricsRegistry()
@@ -0,0 +1,57 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# List endpoints return the cursor of the next page in this header (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "500"))
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque, URL-safe token holding the sort key of the last item of a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Callable[[Any], Any]) -> Tuple:
+    """Decode a cursor into its sort key values, converting each with the given types"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(payload) != len(types):
+            raise ValueError("cursor length")
+        return tuple(
+            datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value_type, value in zip(types, payload)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(query, columns: Sequence, cursor: str, *types: Callable[[Any], Any]):
+    """Restrict a query sorted by `columns` (all descending) to the rows after the cursor"""
+    return query.where(tuple_(*columns) < tuple_(*decode_cursor(cursor, *types)))
+
+
+def page_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def split_page(rows: List, limit: int, key: Callable[[Any], Tuple]) -> Tuple[List, Optional[str]]:
+    """
+    Split the `limit + 1` rows fetched for a page into the page itself and the cursor of the next page
+    (None when there is no next page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
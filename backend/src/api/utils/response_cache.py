@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import orjson
+from fastapi import Request, Response, status
+
+from api.utils.http_cache import etag_matches
+from api.utils.metrics import metrics
+
+RESPONSE_CACHE_SECONDS = float(os.environ.get("RESPONSE_CACHE_SECONDS", "300"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "2048"))
+# Optional shared store behind the in-process LRU, so workers reuse each other's responses (needs the redis package)
+RESPONSE_CACHE_REDIS_URL = os.environ.get("RESPONSE_CACHE_REDIS_URL")
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+    expires_at: float  # time.time(), comparable across processes
+
+    def to_response(self, request: Request) -> Response:
+        """The cached body, or 304 when the client already has it"""
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match", ""), self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
+
+
+class SharedResponseStore(ABC):
+    """Response storage shared by every worker (Redis, ...)"""
+
+    name: str = "shared"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """The stored response, None when missing or expired"""
+
+    @abstractmethod
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store a response until its expires_at"""
+
+
+class RedisResponseStore(SharedResponseStore):
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "mindtoon:response:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        data = orjson.loads(raw)
+        return CachedResponse(data["body"].encode("utf-8"), data["etag"], data["media_type"], data["expires_at"])
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        ttl = max(1, int(entry.expires_at - time.time()))
+        data = {"body": entry.body.decode("utf-8"), "etag": entry.etag, "media_type": entry.media_type,
+                "expires_at": entry.expires_at}
+        self.client.set(self.prefix + key, orjson.dumps(data), ex=ttl)
+
+
+class ResponseCache:
+    """
+    In-process LRU of serialized responses, optionally in front of a shared store.
+    Keys carry the version of the data they were built from, so stale entries are never looked up again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl_seconds: float = RESPONSE_CACHE_SECONDS,
+        shared: Optional[SharedResponseStore] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < time.time():
+                self._entries.pop(key, None)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.shared is not None:
+            try:
+                entry = self.shared.get(key)
+            except Exception as e:
+                print(f"⚠️ Shared response cache read failed: {e}")
+            if entry is not None:
+                metrics.incr("response_cache.shared_hits")
+                self._put_local(key, entry)
+        metrics.incr("response_cache.hits" if entry is not None else "response_cache.misses")
+        return entry
+
+    def build(self, body: bytes, media_type: str) -> CachedResponse:
+        # Strong validator: a hash of the exact bytes
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        return CachedResponse(body, etag, media_type, time.time() + self.ttl_seconds)
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        self._put_local(key, entry)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, entry)
+            except Exception as e:
+                print(f"⚠️ Shared response cache write failed: {e}")
+
+    def _put_local(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_shared_store() -> Optional[SharedResponseStore]:
+    """Shared store selected by RESPONSE_CACHE_REDIS_URL (None: in-process cache only)"""
+    if not RESPONSE_CACHE_REDIS_URL:
+        return None
+    try:
+        return RedisResponseStore(RESPONSE_CACHE_REDIS_URL)
+    except ImportError:
+        print("⚠️ RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed, using the in-process cache only")
+        return None
+
+
+# Global instance
+response_cache = ResponseCache(shared=create_shared_store())
+
+metrics.register_gauge("response_cache.entries", lambda: len(response_cache))
@@ -0,0 +1,58 @@
+import asyncio
+import inspect
+from typing import Callable, List, Optional, Tuple
+
+from api.utils.metrics import metrics
+
+
+class Scheduler:
+    """Runs periodic maintenance jobs in the background. Blocking jobs run in a worker thread."""
+
+    def __init__(self):
+        self.jobs: List[Tuple[str, float, Callable]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, interval_seconds: float, fn: Callable) -> None:
+        """Run fn every interval_seconds (first run one interval after startup)"""
+        self.jobs.append((name, interval_seconds, fn))
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for name, interval_seconds, fn in self.jobs:
+            self._tasks.append(asyncio.create_task(self._loop(name, interval_seconds, fn)))
+        print(f"⏰ Scheduler started with {len(self.jobs)} jobs")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(self, name: str) -> Optional[object]:
+        """Run a job right now (e.g. from an admin endpoint)"""
+        for job_name, _, fn in self.jobs:
+            if job_name == name:
+                return await self._call(fn)
+        raise KeyError(name)
+
+    async def _call(self, fn: Callable):
+        if inspect.iscoroutinefunction(fn):
+            return await fn()
+        return await asyncio.to_thread(fn)
+
+    async def _loop(self, name: str, interval_seconds: float, fn: Callable) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self._call(fn)
+                metrics.incr(f"scheduler.{name}.runs")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.incr(f"scheduler.{name}.failures")
+                print(f"⚠️ Scheduled job {name} failed: {e}")
+
+
+# Global instance
+scheduler = Scheduler()
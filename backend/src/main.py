@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from contextlib import asynccontextmanager
@@ -7,12 +8,22 @@ from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
-from api.db import init_db, get_session, engine, recreate_tables
+from api.db import init_db, get_session, engine, async_engine, read_async_engine, recreate_tables
+from api.migrations import run_migrations
+from api.storage.uploader import image_uploader
+from api.ai.precompute import insight_precomputer
+from api.storage.usage import reconcile_storage_usage  # registers the reconcile job
+from api.chat.stats import reconcile_world_stats  # registers the reconcile job
+from api.auth.deletion import resume_deletion_jobs  # registers the deletion resume job
+from api.chat.views import view_counter
+from api.utils.scheduler import scheduler
 from api.chat.routing import router as chat_router
 from api.auth.routing import router as auth_router
 from api.auth.models import User  # Import User model to create table
 from api.auth.utils import get_password_hash
 from api.ai.analyses import AnalyticsEntry, AnalyticsInsight  # Import analytics models
+from api.utils.metrics import metrics
+from api.utils.consistency import track_writes
 from sqlmodel import Session, select
 from typing import List
 
@@ -44,6 +55,7 @@ if len(sys.argv) > 1 and sys.argv[1] == "--reset-db":
 async def lifespan(app: FastAPI):
     #before app start
     init_db()
+    run_migrations()
     
     # Ensure admin user exists
     with Session(engine) as session:
@@ -59,8 +71,19 @@ async def lifespan(app: FastAPI):
             session.commit()
             print("Created admin user successfully")
     
+    image_uploader.start()
+    insight_precomputer.start()
+    scheduler.start()
+    
     yield
     #after app start
+    await scheduler.stop()
+    await image_uploader.stop()
+    await insight_precomputer.stop()
+    await asyncio.to_thread(view_counter.flush)
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
 
 
 app = FastAPI(
@@ -88,13 +111,18 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Reads of a client that just wrote stay on the primary (see get_read_session)
+app.middleware("http")(track_writes)
+
 # Include routers
 from api.supabase.routing import router as supabase_router
 from api.ai.routing import router as ai_router
+from api.storage.routing import router as storage_router
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(chat_router, prefix="/api/chats", tags=["Chat & Comics"])
 app.include_router(supabase_router, prefix="/api/supabase", tags=["Supabase"])
 app.include_router(ai_router, prefix="/api", tags=["AI Image Generation"])
+app.include_router(storage_router, prefix="/storage", tags=["Storage"])
 
 MY_PROJECT = os.environ.get("MY_PROJECT") or "this is my project"
 API_KEY = os.environ.get("API_KEY")
@@ -119,6 +147,11 @@ def read_index():
 def healthcheck():
     return {"status": "ok", "service": "mindtoon-api"}
 
+@app.get("/metrics")
+def get_metrics():
+    """In-process counters (moderation, storage, database pool, ...)"""
+    return {"service": "mindtoon-api", "metrics": metrics.snapshot()}
+
 @app.get("/api/ios/config")
 def get_ios_config():
     """Return iOS app configuration"""